@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app, db
 from app.models import Payroll, Employee, SalaryComponent
+from app.payroll_kernel import apply_payroll
 
 def add_dummy_payroll():
     """Add sample payroll records"""
@@ -27,6 +28,7 @@ def add_dummy_payroll():
         print(f"Found {len(employees)} employees")
         
         # Create payroll for each employee
+        new_payrolls = []
         for employee in employees:
             # Check if payroll already exists for January 2026
             pay_period_start = date(2026, 1, 1)
@@ -57,10 +59,6 @@ def add_dummy_payroll():
             pf = basic_salary * 0.12
             professional_tax = 200
             
-            total_earnings = base_salary
-            total_deductions = pf + professional_tax
-            net_salary = total_earnings - total_deductions
-            
             # Create payroll record
             payroll = Payroll(
                 employee_id=employee.id,
@@ -90,16 +88,18 @@ def add_dummy_payroll():
                 paid_leave_days=26,
                 overtime_hours=0.0,
                 overtime_rate=Decimal('0'),
-                gross_pay=Decimal(str(total_earnings)),
-                total_deductions=Decimal(str(total_deductions)),
-                net_pay=Decimal(str(net_salary)),
-                payment_status='Paid',
+                payment_status='paid',
                 payment_date=date(2026, 1, 31),
                 created_at=datetime.utcnow()
             )
             
+            new_payrolls.append((employee, payroll))
+        
+        # Calculate gross, deductions and net pay for all new records at once
+        apply_payroll([payroll for _, payroll in new_payrolls])
+        for employee, payroll in new_payrolls:
             db.session.add(payroll)
-            print(f"✓ Created payroll for {employee.full_name} - ₹{net_salary:,.2f}")
+            print(f"✓ Created payroll for {employee.full_name} - ₹{payroll.net_pay:,.2f}")
         
         # Commit all changes
         try:
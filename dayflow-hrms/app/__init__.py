@@ -11,13 +11,27 @@ db = SQLAlchemy()
 login_manager = LoginManager()
 migrate = Migrate()
 
-def create_app():
-    """Application factory pattern"""
+def create_app(config=None):
+    """Application factory pattern; config overrides the defaults below"""
     app = Flask(__name__, template_folder='templates', static_folder='static')
     app.config['SECRET_KEY'] = 'dayflow-hrms-secret-key-2026'
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///dayflow_hrms.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['UPLOAD_FOLDER'] = 'uploads'
+    app.config['KEYSET_PAGINATION_THRESHOLD'] = 1000  # Listings larger than this use cursor pagination
+    app.config['APPROX_COUNT_TTL'] = 60  # Seconds a cached listing total is reused
+    app.config['APPROX_COUNT_CACHE_SIZE'] = 512  # Cached listing totals; the least recently used are dropped
+    app.config['EMPLOYEE_SNAPSHOT_TTL'] = 300  # Seconds a dashboard snapshot is reused between writes
+    app.config['PAYSLIP_WORKERS'] = 2  # Processes rendering payslip PDFs
+    app.config['PAYSLIP_CACHE_DIR'] = None  # Rendered payslips; defaults to instance/payslips
+    app.config['ATTENDANCE_WRITE_MODE'] = 'direct'  # 'buffered' queues check-ins/outs behind a local event log
+    app.config['ATTENDANCE_FLUSH_INTERVAL_MS'] = 200  # Longest a buffered punch waits to be applied
+    app.config['ATTENDANCE_FLUSH_BATCH'] = 500  # Queued punches that trigger an early flush
+    app.config['ATTENDANCE_EVENT_LOG'] = None  # Buffered punch log; defaults to instance/attendance-events.log
+    app.config['LEAVE_ATTENDANCE_DAYS'] = 'working'  # 'calendar' marks weekends and holidays of approved leave too
+    app.config['HOLIDAYS'] = []  # Dates (or ISO strings) approved leave does not mark
+    app.config['ATTENDANCE_HOT_YEARS'] = 2  # Calendar years kept in attendance; older ones can be archived (min 2)
+    app.config.update(config or {})
 
     # Ensure upload directory exists
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
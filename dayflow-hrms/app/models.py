@@ -1,11 +1,15 @@
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import case, exists, and_
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime, date
 import random
 import string
 
 # Import db from __init__.py to avoid multiple instances
 from . import db
+from . import payroll_kernel
+from .salary_structure import salary_plan, component_amount
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -61,6 +65,10 @@ class User(UserMixin, db.Model):
 
 class Employee(db.Model):
     __tablename__ = 'employees'
+    __table_args__ = (
+        db.Index('ix_employees_user_id', 'user_id'),
+        db.Index('ix_employees_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -112,7 +120,7 @@ class Employee(db.Model):
     # Profile Picture
     profile_picture = db.Column(db.String(200))
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Listing cursor key
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
@@ -120,13 +128,15 @@ class Employee(db.Model):
     leave_requests = db.relationship('LeaveRequest', backref='employee', lazy=True, cascade='all, delete-orphan')
     payroll_records = db.relationship('Payroll', backref='employee', lazy=True, cascade='all, delete-orphan')
     salary_components = db.relationship('SalaryComponent', backref='employee', lazy=True, cascade='all, delete-orphan')
+    salary_revisions = db.relationship('SalaryRevision', backref='employee', lazy=True, cascade='all, delete-orphan',
+                                       order_by='SalaryRevision.effective_date.desc(), SalaryRevision.id.desc()')
     leave_allocations = db.relationship('LeaveAllocation', backref='employee', lazy=True, cascade='all, delete-orphan')
     
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
     
-    @property
+    @hybrid_property
     def current_status(self):
         """Get current status: present, absent, on_leave"""
         today = date.today()
@@ -153,11 +163,48 @@ class Employee(db.Model):
         
         return 'absent'
     
+    @current_status.expression
+    def current_status(cls):
+        """SQL form of current_status, usable in filters and GROUP BY"""
+        return cls.status_on(date.today())
+    
+    @classmethod
+    def status_on(cls, on_date):
+        """
+        CASE expression giving each employee's status on a date.
+        Same precedence as current_status: approved leave wins over attendance.
+        """
+        on_leave = exists().where(and_(
+            LeaveRequest.employee_id == cls.id,
+            LeaveRequest.status == 'approved',
+            LeaveRequest.start_date <= on_date,
+            LeaveRequest.end_date >= on_date
+        ))
+        return case(
+            (on_leave, 'on_leave'),
+            (cls.present_on(on_date), 'present'),
+            else_='absent'
+        )
+    
+    @classmethod
+    def present_on(cls, on_date):
+        """EXISTS expression: the employee is marked present on a date"""
+        return exists().where(and_(
+            Attendance.employee_id == cls.id,
+            Attendance.date == on_date,
+            Attendance.status == 'present'
+        ))
+    
     def __repr__(self):
         return f'<Employee {self.full_name}>'
 
 class Attendance(db.Model):
     __tablename__ = 'attendance'
+    __table_args__ = (
+        db.Index('uq_attendance_employee_date', 'employee_id', 'date', unique=True),  # One row per employee per day
+        db.Index('ix_attendance_date_status', 'date', 'status'),
+        {'sqlite_autoincrement': True},  # Archived rows keep their ids, so freed ids are never handed out again
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
@@ -184,6 +231,54 @@ class Attendance(db.Model):
     def __repr__(self):
         return f'<Attendance {self.employee.full_name} - {self.date}>'
 
+class DailyAttendanceSummary(db.Model):
+    """Rollup of attendance counts per date, department and status"""
+    __tablename__ = 'daily_attendance_summary'
+    __table_args__ = (
+        db.UniqueConstraint('date', 'department', 'status', name='uq_daily_attendance_summary'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    department = db.Column(db.String(100), nullable=False, default='')  # '' for unassigned
+    status = db.Column(db.String(20), nullable=False)  # same values as Attendance.status
+    headcount = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DailyAttendanceSummary {self.date} {self.department or "-"} {self.status}={self.headcount}>'
+
+class AttendanceBitmap(db.Model):
+    """One employee's attendance for a year packed as 2-bit status codes, for calendar views"""
+    __tablename__ = 'attendance_bitmaps'
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'year', name='uq_attendance_bitmap_employee_year'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id', ondelete='CASCADE'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    statuses = db.Column(db.LargeBinary(92), nullable=False)  # 4 days per byte, day of year order
+    recorded = db.Column(db.LargeBinary(46), nullable=False)  # 1 bit per day with an attendance row
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AttendanceBitmap {self.employee_id} {self.year}>'
+
+class AttendanceArchive(db.Model):
+    """A year of attendance moved out of the attendance table into its own archive table"""
+    __tablename__ = 'attendance_archives'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False, unique=True)
+    table_name = db.Column(db.String(64), nullable=False)  # attendance_archive_<year>
+    row_count = db.Column(db.Integer, nullable=False, default=0)  # Rows moved so far
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)  # Set once the year has no rows left in attendance
+    
+    def __repr__(self):
+        return f'<AttendanceArchive {self.year} ({self.row_count} rows)>'
+
 class TimeOffType(db.Model):
     """Model for different types of time off/leave"""
     __tablename__ = 'timeoff_types'
@@ -228,6 +323,12 @@ class LeaveAllocation(db.Model):
 
 class LeaveRequest(db.Model):
     __tablename__ = 'leave_requests'
+    __table_args__ = (
+        db.Index('ix_leave_requests_employee_status_start', 'employee_id', 'status', 'start_date'),
+        db.Index('ix_leave_requests_status_created', 'status', 'created_at'),
+        db.Index('ix_leave_requests_status_end', 'status', 'end_date'),  # Leave overlapping a window
+        db.Index('ix_leave_requests_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
@@ -241,7 +342,7 @@ class LeaveRequest(db.Model):
     admin_comment = db.Column(db.Text)
     approved_by = db.Column(db.Integer, db.ForeignKey('users.id'))
     days_requested = db.Column(db.Integer, default=1)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Listing cursor key
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship with admin who approved/rejected
@@ -258,6 +359,9 @@ class LeaveRequest(db.Model):
 class SalaryComponent(db.Model):
     """Model for salary components like Basic, HRA, PF, etc."""
     __tablename__ = 'salary_components'
+    __table_args__ = (
+        db.Index('ix_salary_components_employee_active', 'employee_id', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
@@ -271,24 +375,53 @@ class SalaryComponent(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def calculate_amount(self, monthly_wage, basic_salary=None):
-        """Calculate the component amount based on type and value"""
-        if self.computation_type == 'fixed':
-            self.calculated_amount = self.value
-        elif self.computation_type == 'percentage':
-            if self.base_component == 'wage':
-                self.calculated_amount = (float(monthly_wage) * float(self.value)) / 100
-            elif self.base_component == 'basic' and basic_salary:
-                self.calculated_amount = (float(basic_salary) * float(self.value)) / 100
-            else:
-                self.calculated_amount = 0
+    def calculate_amount(self, monthly_wage, basic_salary=None, amounts=None):
+        """
+        Calculate the component amount based on type and value.
+        amounts maps other component keys (e.g. 'hra') to their amounts for
+        percentages of components other than the wage and basic salary.
+        """
+        bases = {'wage': monthly_wage, 'basic': basic_salary}
+        bases.update(amounts or {})
+        self.calculated_amount = component_amount(
+            self.computation_type, self.value, bases.get(self.base_component)
+        )
         return self.calculated_amount
     
     def __repr__(self):
         return f'<SalaryComponent {self.component_name} - {self.employee.full_name}>'
 
+class SalaryRevision(db.Model):
+    """History of wage changes, one row per employee per revision"""
+    __tablename__ = 'salary_revisions'
+    __table_args__ = (
+        db.Index('ix_salary_revisions_employee_effective', 'employee_id', 'effective_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
+    previous_wage = db.Column(db.Numeric(10, 2))  # None when no wage was set
+    new_wage = db.Column(db.Numeric(10, 2), nullable=False)
+    increment_percentage = db.Column(db.Numeric(7, 2))  # Change relative to previous_wage
+    effective_date = db.Column(db.Date, nullable=False, default=date.today)
+    reason = db.Column(db.String(200))  # e.g. 'Annual appraisal 2026'
+    revised_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationship with admin who made the revision
+    reviser = db.relationship('User', foreign_keys=[revised_by])
+    
+    def __repr__(self):
+        return f'<SalaryRevision {self.employee_id} {self.previous_wage} -> {self.new_wage}>'
+
 class Payroll(db.Model):
     __tablename__ = 'payroll'
+    __table_args__ = (
+        db.Index('uq_payroll_employee_period', 'employee_id', 'pay_period_start', unique=True),  # One payroll per employee per period
+        db.Index('ix_payroll_period_start', 'pay_period_start'),
+        db.Index('ix_payroll_status_employee', 'payment_status', 'employee_id'),
+        db.Index('ix_payroll_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
@@ -331,60 +464,39 @@ class Payroll(db.Model):
     
     overtime_hours = db.Column(db.Float, default=0.0)
     overtime_rate = db.Column(db.Numeric(8, 2), default=0.00)
+    # Whether days_present / overtime_hours came from attendance (and follow it) or were entered by hand
+    days_present_derived = db.Column(db.Boolean, nullable=False, default=False)
+    overtime_derived = db.Column(db.Boolean, nullable=False, default=False)
     
     gross_pay = db.Column(db.Numeric(10, 2))
     total_deductions = db.Column(db.Numeric(10, 2), default=0.00)  # Sum of all deductions
     net_pay = db.Column(db.Numeric(10, 2))
     payment_status = db.Column(db.String(20), default='pending')  # pending, processed, paid
     payment_date = db.Column(db.Date)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Listing cursor key
     
     def calculate_gross_pay(self):
         """Calculate gross pay from all earning components"""
-        overtime_pay = float(self.overtime_hours) * float(self.overtime_rate)
-        self.gross_pay = (
-            float(self.basic_salary) + 
-            float(self.hra) + 
-            float(self.standard_allowance) + 
-            float(self.performance_bonus) + 
-            float(self.lta) + 
-            float(self.fixed_allowance) + 
-            float(self.allowances) +
-            float(self.increment_amount) +
-            float(self.special_bonus) +
-            float(self.festival_bonus) +
-            float(self.other_earnings) +
-            overtime_pay
-        )
+        self.gross_pay = payroll_kernel.gross_pay(payroll_kernel.PayrollColumns.from_records([self]))[0]
         return self.gross_pay
     
     def calculate_deductions(self):
         """Calculate total deductions"""
-        self.total_deductions = (
-            float(self.pf_deduction) + 
-            float(self.professional_tax) + 
-            float(self.deductions) + 
-            float(self.tax_deductions) +
-            float(self.unpaid_leave_deduction)
-        )
+        self.total_deductions = payroll_kernel.total_deductions(
+            payroll_kernel.PayrollColumns.from_records([self])
+        )[0]
         return self.total_deductions
     
     def calculate_unpaid_leave_deduction(self):
         """Calculate deduction for unpaid leaves"""
-        if self.total_working_days > 0 and self.unpaid_leave_days > 0:
-            # Calculate per day salary from base monthly salary
-            per_day_salary = float(self.base_monthly_salary) / self.total_working_days
-            self.unpaid_leave_deduction = per_day_salary * self.unpaid_leave_days
-        else:
-            self.unpaid_leave_deduction = 0.00
+        self.unpaid_leave_deduction = payroll_kernel.unpaid_leave_deduction(
+            payroll_kernel.PayrollColumns.from_records([self])
+        )[0]
         return self.unpaid_leave_deduction
     
     def calculate_net_pay(self):
         """Calculate net pay after all deductions"""
-        self.calculate_gross_pay()
-        self.calculate_unpaid_leave_deduction()
-        self.calculate_deductions()
-        self.net_pay = float(self.gross_pay) - float(self.total_deductions)
+        payroll_kernel.apply_payroll([self])
         return self.net_pay
     
     @property
@@ -401,6 +513,50 @@ class Payroll(db.Model):
         return f'<Payroll {self.employee.full_name} - {self.pay_period_start}>'
 
 
+class PayrollPeriodSummary(db.Model):
+    """Rollup of payroll totals per pay period (month) and department"""
+    __tablename__ = 'payroll_period_summary'
+    __table_args__ = (
+        db.UniqueConstraint('period_start', 'department', name='uq_payroll_period_summary'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    period_start = db.Column(db.Date, nullable=False)  # First day of the pay month
+    department = db.Column(db.String(100), nullable=False, default='')  # '' for unassigned
+    headcount = db.Column(db.Integer, nullable=False, default=0)  # Distinct employees
+    payroll_count = db.Column(db.Integer, nullable=False, default=0)  # Payroll rows
+    gross_total = db.Column(db.Numeric(14, 2), nullable=False, default=0.00)
+    deductions_total = db.Column(db.Numeric(14, 2), nullable=False, default=0.00)
+    net_total = db.Column(db.Numeric(14, 2), nullable=False, default=0.00)
+    paid_count = db.Column(db.Integer, nullable=False, default=0)
+    pending_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def period(self):
+        """Pay period in 'YYYY-MM' form"""
+        return self.period_start.strftime('%Y-%m')
+    
+    def __repr__(self):
+        return f'<PayrollPeriodSummary {self.period} {self.department or "-"}>'
+
+
+class StalePayroll(db.Model):
+    """Payroll rows whose attendance, leave or salary inputs changed after calculation"""
+    __tablename__ = 'stale_payroll'
+    __table_args__ = (
+        db.UniqueConstraint('payroll_id', 'source', name='uq_stale_payroll'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    payroll_id = db.Column(db.Integer, db.ForeignKey('payroll.id', ondelete='CASCADE'), nullable=False)
+    source = db.Column(db.String(20), nullable=False)  # 'attendance', 'leave', 'salary'
+    marked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<StalePayroll {self.payroll_id} {self.source}>'
+
+
 # Utility functions
 def initialize_timeoff_types():
     """Initialize default time off types if they don't exist"""
@@ -443,88 +599,16 @@ def initialize_timeoff_types():
     db.session.commit()
 
 
-def create_salary_components_for_employee(employee_id, monthly_wage):
+def create_salary_components_for_employee(employee_id, monthly_wage, values=None):
     """
-    Create default salary components for an employee based on monthly wage
-    Components:
-    - Basic Salary: 50% of wage
-    - HRA: 50% of basic salary
-    - Standard Allowance: Fixed amount (determined after other components)
-    - Performance Bonus: 8.33% of wage
-    - LTA: 8.33% of wage
-    - Fixed Allowance: Remaining amount to make up the wage
-    - PF Deduction: 12% of basic salary
-    - Professional Tax: Fixed ₹200
+    Create salary components for an employee from the standard salary
+    structure (see app/salary_structure.py). values overrides rule values,
+    e.g. {'standard_allowance': 5000, 'pf': 10}.
     """
-    components = [
-        {
-            'component_name': 'Basic Salary',
-            'component_type': 'earning',
-            'computation_type': 'percentage',
-            'value': 50.00,
-            'base_component': 'wage'
-        },
-        {
-            'component_name': 'House Rent Allowance',
-            'component_type': 'earning',
-            'computation_type': 'percentage',
-            'value': 50.00,
-            'base_component': 'basic'
-        },
-        {
-            'component_name': 'Performance Bonus',
-            'component_type': 'earning',
-            'computation_type': 'percentage',
-            'value': 8.33,
-            'base_component': 'wage'
-        },
-        {
-            'component_name': 'Leave Travel Allowance',
-            'component_type': 'earning',
-            'computation_type': 'percentage',
-            'value': 8.33,
-            'base_component': 'wage'
-        },
-        {
-            'component_name': 'Provident Fund',
-            'component_type': 'deduction',
-            'computation_type': 'percentage',
-            'value': 12.00,
-            'base_component': 'basic'
-        },
-        {
-            'component_name': 'Professional Tax',
-            'component_type': 'deduction',
-            'computation_type': 'fixed',
-            'value': 200.00,
-            'base_component': None
-        }
-    ]
-    
-    # Calculate basic salary first
-    basic_salary = (float(monthly_wage) * 50) / 100
-    
-    total_components = 0
-    for comp_data in components:
-        comp = SalaryComponent(employee_id=employee_id, **comp_data)
-        comp.calculate_amount(monthly_wage, basic_salary)
-        if comp.component_type == 'earning':
-            total_components += float(comp.calculated_amount)
-        db.session.add(comp)
-    
-    # Add standard/fixed allowance to make up the remaining wage
-    remaining = float(monthly_wage) - total_components
-    if remaining > 0:
-        fixed_comp = SalaryComponent(
-            employee_id=employee_id,
-            component_name='Standard Allowance',
-            component_type='earning',
-            computation_type='fixed',
-            value=remaining,
-            base_component=None
-        )
-        fixed_comp.calculated_amount = remaining
-        db.session.add(fixed_comp)
+    plan = salary_plan()
+    evaluated = plan.evaluate([monthly_wage], values=values)
+    for component in plan.components(evaluated, 0, values=values):
+        db.session.add(SalaryComponent(employee_id=employee_id, **component))
     
     db.session.commit()
 
@@ -0,0 +1,225 @@
+"""
+Minimal Parquet writer
+Enough of the Parquet format to stream flat tables without a third-party
+library: each call to write_rows adds one row group of optional columns,
+PLAIN-encoded and GZIP-compressed, and only close() writes the footer, so
+a file can be produced batch by batch with flat memory. Column kinds cover
+64-bit integers, doubles, exact decimals (stored as scaled integers),
+dates, UTC timestamps and UTF-8 strings.
+"""
+import struct
+import zlib
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+MAGIC = b'PAR1'
+
+# Thrift compact protocol type ids
+_I32, _I64, _BINARY, _LIST, _STRUCT = 5, 6, 8, 9, 12
+
+# Parquet enums
+_PLAIN, _RLE = 0, 3
+_GZIP = 2
+_DATA_PAGE = 0
+_OPTIONAL = 1
+_EPOCH = date(1970, 1, 1)
+
+DECIMAL_PRECISION = 18
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+class _Struct:
+    """Thrift compact encoding of one struct, fields added in id order"""
+
+    def __init__(self):
+        self.out = bytearray()
+        self.last = 0
+
+    def _field(self, field_id, type_id):
+        delta = field_id - self.last
+        if 0 < delta <= 15:
+            self.out.append(delta << 4 | type_id)
+        else:
+            self.out.append(type_id)
+            self.out += _varint(_zigzag(field_id))
+        self.last = field_id
+
+    def i32(self, field_id, value):
+        self._field(field_id, _I32)
+        self.out += _varint(_zigzag(value))
+        return self
+
+    def i64(self, field_id, value):
+        self._field(field_id, _I64)
+        self.out += _varint(_zigzag(value))
+        return self
+
+    def binary(self, field_id, value):
+        value = value.encode() if isinstance(value, str) else value
+        self._field(field_id, _BINARY)
+        self.out += _varint(len(value)) + value
+        return self
+
+    def struct(self, field_id, value):
+        self._field(field_id, _STRUCT)
+        self.out += value.encode()
+        return self
+
+    def list(self, field_id, type_id, items):
+        self._field(field_id, _LIST)
+        items = list(items)
+        if len(items) < 15:
+            self.out.append(len(items) << 4 | type_id)
+        else:
+            self.out.append(0xf0 | type_id)
+            self.out += _varint(len(items))
+        for item in items:
+            if type_id == _I32:
+                self.out += _varint(_zigzag(item))
+            elif type_id == _BINARY:
+                item = item.encode() if isinstance(item, str) else item
+                self.out += _varint(len(item)) + item
+            else:
+                self.out += item.encode()
+        return self
+
+    def encode(self):
+        return bytes(self.out) + b'\x00'
+
+
+def _scaled(value, scale):
+    return int((Decimal(value) * 10 ** scale).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def _timestamp_ms(value):
+    delta = value - datetime(1970, 1, 1)
+    return (delta.days * 86400 + delta.seconds) * 1000 + delta.microseconds // 1000
+
+
+def _strings(values):
+    out = bytearray()
+    for value in values:
+        data = str(value).encode()
+        out += struct.pack('<I', len(data)) + data
+    return bytes(out)
+
+
+# kind: (physical type, converted type, PLAIN encoder for the non-null values)
+_KINDS = {
+    'int': (2, None, lambda values, scale: struct.pack(f'<{len(values)}q', *values)),
+    'float': (5, None, lambda values, scale: struct.pack(f'<{len(values)}d', *map(float, values))),
+    'decimal': (2, 5, lambda values, scale: struct.pack(
+        f'<{len(values)}q', *(_scaled(v, scale) for v in values))),
+    'date': (1, 6, lambda values, scale: struct.pack(
+        f'<{len(values)}i', *((v - _EPOCH).days for v in values))),
+    'timestamp': (2, 9, lambda values, scale: struct.pack(
+        f'<{len(values)}q', *map(_timestamp_ms, values))),
+    'string': (6, 0, lambda values, scale: _strings(values)),
+}
+
+
+class Column:
+    """A named optional column; scale applies to decimals"""
+
+    def __init__(self, name, kind, scale=2):
+        if kind not in _KINDS:
+            raise ValueError(f"Unknown column kind '{kind}'")
+        self.name = name
+        self.kind = kind
+        self.scale = scale
+        self.physical_type, self.converted_type, self._encode = _KINDS[kind]
+
+    def encode(self, values):
+        return self._encode(values, self.scale)
+
+    def schema_element(self):
+        element = _Struct().i32(1, self.physical_type).i32(3, _OPTIONAL).binary(4, self.name)
+        if self.converted_type is not None:
+            element.i32(6, self.converted_type)
+        if self.kind == 'decimal':
+            element.i32(7, self.scale).i32(8, DECIMAL_PRECISION)
+        return element
+
+
+def _definition_levels(present):
+    """RLE runs of 1-bit definition levels, length-prefixed as in data page v1"""
+    out = bytearray()
+    i = 0
+    while i < len(present):
+        j = i
+        while j < len(present) and present[j] == present[i]:
+            j += 1
+        out += _varint((j - i) << 1) + (b'\x01' if present[i] else b'\x00')
+        i = j
+    return struct.pack('<I', len(out)) + bytes(out)
+
+
+def _gzip(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class ParquetWriter:
+    """Write row groups of tuples (in column order) to a binary stream"""
+
+    def __init__(self, stream, columns, created_by='Dayflow HRMS'):
+        self.stream = stream
+        self.columns = list(columns)
+        self.created_by = created_by
+        self.offset = 0
+        self.rows = 0
+        self.row_groups = []
+        self._write(MAGIC)
+
+    def _write(self, data):
+        self.stream.write(data)
+        self.offset += len(data)
+
+    def write_rows(self, rows):
+        """Add rows as one row group"""
+        rows = list(rows)
+        if not rows:
+            return
+        start = self.offset
+        chunks = [self._write_column(column, [row[i] for row in rows])
+                  for i, column in enumerate(self.columns)]
+        self.row_groups.append(
+            _Struct().list(1, _STRUCT, chunks).i64(2, self.offset - start).i64(3, len(rows))
+        )
+        self.rows += len(rows)
+
+    def _write_column(self, column, values):
+        present = [value is not None for value in values]
+        page = _definition_levels(present) + column.encode([v for v in values if v is not None])
+        compressed = _gzip(page)
+        header = _Struct().i32(1, _DATA_PAGE).i32(2, len(page)).i32(3, len(compressed)).struct(
+            5, _Struct().i32(1, len(values)).i32(2, _PLAIN).i32(3, _RLE).i32(4, _RLE)
+        ).encode()
+        page_offset = self.offset
+        self._write(header + compressed)
+        metadata = (_Struct().i32(1, column.physical_type).list(2, _I32, [_PLAIN, _RLE])
+                    .list(3, _BINARY, [column.name]).i32(4, _GZIP).i64(5, len(values))
+                    .i64(6, len(header) + len(page)).i64(7, len(header) + len(compressed))
+                    .i64(9, page_offset))
+        return _Struct().i64(2, page_offset).struct(3, metadata)
+
+    def close(self):
+        """Write the footer; the stream is left open"""
+        root = _Struct().binary(4, 'schema').i32(5, len(self.columns))
+        footer = (_Struct().i32(1, 1)
+                  .list(2, _STRUCT, [root] + [column.schema_element() for column in self.columns])
+                  .i64(3, self.rows).list(4, _STRUCT, self.row_groups)
+                  .binary(6, self.created_by)).encode()
+        self._write(footer + struct.pack('<I', len(footer)) + MAGIC)
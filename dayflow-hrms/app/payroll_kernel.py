@@ -0,0 +1,146 @@
+"""
+Columnar payroll calculation kernel
+Pay figures for many payroll records are computed from array-backed input
+columns in one pass. Payroll's calculate_* methods are thin wrappers over
+this module, so a single record and a month-end batch always agree to the
+last bit.
+"""
+from array import array
+
+# Summed in this order; float addition is not associative
+EARNING_FIELDS = ('basic_salary', 'hra', 'standard_allowance', 'performance_bonus', 'lta',
+                  'fixed_allowance', 'allowances', 'increment_amount', 'special_bonus',
+                  'festival_bonus', 'other_earnings')
+DEDUCTION_FIELDS = ('pf_deduction', 'professional_tax', 'deductions', 'tax_deductions')
+AMOUNT_FIELDS = EARNING_FIELDS + DEDUCTION_FIELDS + (
+    'overtime_hours', 'overtime_rate', 'base_monthly_salary', 'unpaid_leave_deduction')
+DAY_FIELDS = ('total_working_days', 'unpaid_leave_days')
+
+
+def _amount(value):
+    """Column value as float; unset amounts count as 0 like their column defaults"""
+    return 0.0 if value is None else float(value)
+
+
+def _field(record, name):
+    if isinstance(record, dict):
+        return record.get(name)
+    return getattr(record, name)
+
+
+class PayrollColumns:
+    """Kernel inputs for N payroll records, one typed array per field"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.size = len(columns[DAY_FIELDS[0]])
+
+    @classmethod
+    def from_records(cls, records):
+        """Columns from Payroll objects or dicts keyed by payroll column name"""
+        records = list(records)
+        columns = {name: array('d', (_amount(_field(r, name)) for r in records))
+                   for name in AMOUNT_FIELDS}
+        columns.update({name: array('q', (int(_field(r, name) or 0) for r in records))
+                        for name in DAY_FIELDS})
+        return cls(columns)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+
+class PayrollResults:
+    """Kernel outputs, one float array per calculated payroll column"""
+    FIELDS = ('gross_pay', 'unpaid_leave_deduction', 'total_deductions', 'net_pay')
+
+    def __init__(self, size):
+        self.gross_pay = array('d', bytes(8 * size))
+        self.unpaid_leave_deduction = array('d', bytes(8 * size))
+        self.total_deductions = array('d', bytes(8 * size))
+        self.net_pay = array('d', bytes(8 * size))
+
+    def __len__(self):
+        return len(self.net_pay)
+
+    def row(self, i):
+        """Calculated values for record i, keyed by payroll column name"""
+        return {name: getattr(self, name)[i] for name in self.FIELDS}
+
+
+def _gross(columns, earnings, i):
+    total = earnings[0][i]
+    for column in earnings[1:]:
+        total += column[i]
+    return total + columns['overtime_hours'][i] * columns['overtime_rate'][i]
+
+
+def _unpaid_deduction(base, working_days, unpaid_days, i):
+    if working_days[i] > 0 and unpaid_days[i] > 0:
+        # Per day salary from the base monthly salary
+        return base[i] / working_days[i] * unpaid_days[i]
+    return 0.0
+
+
+def _deductions(deductions, unpaid, i):
+    total = deductions[0][i]
+    for column in deductions[1:]:
+        total += column[i]
+    return total + unpaid
+
+
+def gross_pay(columns):
+    """Sum of all earning components plus overtime pay"""
+    earnings = [columns[name] for name in EARNING_FIELDS]
+    return array('d', (_gross(columns, earnings, i) for i in range(len(columns))))
+
+
+def unpaid_leave_deduction(columns):
+    """Base salary per working day times unpaid leave days"""
+    base, working_days, unpaid_days = (columns['base_monthly_salary'], columns['total_working_days'],
+                                       columns['unpaid_leave_days'])
+    return array('d', (_unpaid_deduction(base, working_days, unpaid_days, i) for i in range(len(columns))))
+
+
+def total_deductions(columns, unpaid=None):
+    """All deductions including unpaid leave (the stored amount unless unpaid is given)"""
+    unpaid = columns['unpaid_leave_deduction'] if unpaid is None else unpaid
+    deductions = [columns[name] for name in DEDUCTION_FIELDS]
+    return array('d', (_deductions(deductions, unpaid[i], i) for i in range(len(columns))))
+
+
+def compute_payroll(columns):
+    """Gross pay, unpaid leave deduction, total deductions and net pay in one pass"""
+    size = len(columns)
+    results = PayrollResults(size)
+    earnings = [columns[name] for name in EARNING_FIELDS]
+    deductions = [columns[name] for name in DEDUCTION_FIELDS]
+    base, working_days, unpaid_days = (columns['base_monthly_salary'], columns['total_working_days'],
+                                       columns['unpaid_leave_days'])
+    for i in range(size):
+        gross = _gross(columns, earnings, i)
+        unpaid = _unpaid_deduction(base, working_days, unpaid_days, i)
+        total = _deductions(deductions, unpaid, i)
+        results.gross_pay[i] = gross
+        results.unpaid_leave_deduction[i] = unpaid
+        results.total_deductions[i] = total
+        results.net_pay[i] = gross - total
+    return results
+
+
+def apply_payroll(records):
+    """
+    Calculate pay for Payroll objects (or dicts) and store the results on them.
+    Returns the PayrollResults.
+    """
+    records = list(records)
+    results = compute_payroll(PayrollColumns.from_records(records))
+    for i, record in enumerate(records):
+        for name, value in results.row(i).items():
+            if isinstance(record, dict):
+                record[name] = value
+            else:
+                setattr(record, name, value)
+    return results
@@ -0,0 +1,139 @@
+"""
+Minimal PDF writer
+Enough of PDF 1.4 to lay out text, rules and shaded boxes on A4 pages with
+the standard Helvetica fonts, so documents such as payslips can be produced
+without a third-party PDF library. Output is deterministic: the same calls
+always produce the same bytes.
+"""
+import zlib
+
+A4 = (595, 842)  # Points
+
+FONTS = {'regular': 'Helvetica', 'bold': 'Helvetica-Bold'}
+
+# Glyph widths (1/1000 em) for printable ASCII, from the standard font metrics
+_WIDTHS = {
+    'regular': (
+        278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+        1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+        333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+        556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584
+    ),
+    'bold': (
+        278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+        975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+        333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+        611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584
+    ),
+}
+
+
+def _latin1(text):
+    """Text limited to what the standard fonts can show"""
+    return str(text).replace('₹', 'Rs.').encode('latin-1', 'replace').decode('latin-1')
+
+
+def text_width(text, size, font='regular'):
+    """Width of text in points"""
+    widths = _WIDTHS[font]
+    total = sum(widths[ord(ch) - 32] if 32 <= ord(ch) < 127 else 556 for ch in _latin1(text))
+    return total * size / 1000
+
+
+def _escape(text):
+    return _latin1(text).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _number(value):
+    return f'{value:.2f}'.rstrip('0').rstrip('.')
+
+
+class PdfPage:
+    """Drawing commands for one page; y is measured from the top edge"""
+
+    def __init__(self, size=A4):
+        self.width, self.height = size
+        self.commands = []
+
+    def text(self, x, y, text, size=10, font='regular', align='left', gray=0):
+        """Draw text with its baseline at y; align is left, right or center of x"""
+        if align == 'right':
+            x -= text_width(text, size, font)
+        elif align == 'center':
+            x -= text_width(text, size, font) / 2
+        self.commands.append(
+            f'BT {_number(gray)} g /{"F2" if font == "bold" else "F1"} {_number(size)} Tf '
+            f'{_number(x)} {_number(self.height - y)} Td ({_escape(text)}) Tj ET'
+        )
+
+    def line(self, x1, y1, x2, y2, width=0.5, gray=0):
+        self.commands.append(
+            f'{_number(gray)} G {_number(width)} w {_number(x1)} {_number(self.height - y1)} m '
+            f'{_number(x2)} {_number(self.height - y2)} l S'
+        )
+
+    def rect(self, x, y, w, h, fill=0.9):
+        """Shaded box with its top-left corner at x, y"""
+        self.commands.append(
+            f'{_number(fill)} g {_number(x)} {_number(self.height - y - h)} {_number(w)} {_number(h)} re f'
+        )
+
+    def content(self):
+        return zlib.compress('\n'.join(self.commands).encode('latin-1'), 9)
+
+
+class PdfDocument:
+    """A sequence of pages serialised to PDF bytes"""
+
+    def __init__(self, title=None, size=A4):
+        self.title = title
+        self.size = size
+        self.pages = []
+
+    def add_page(self):
+        page = PdfPage(self.size)
+        self.pages.append(page)
+        return page
+
+    def to_bytes(self):
+        objects = []
+
+        def add(body):
+            objects.append(body)
+            return len(objects)
+
+        catalog = add(None)
+        pages = add(None)
+        regular = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+        bold = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+        resources = f'<< /Font << /F1 {regular} 0 R /F2 {bold} 0 R >> >>'
+
+        kids = []
+        for page in self.pages:
+            stream = page.content()
+            content = add(b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(stream) + stream + b'\nendstream')
+            kids.append(add(
+                f'<< /Type /Page /Parent {pages} 0 R /MediaBox [0 0 {page.width} {page.height}] '
+                f'/Resources {resources} /Contents {content} 0 R >>'.encode()
+            ))
+        objects[catalog - 1] = f'<< /Type /Catalog /Pages {pages} 0 R >>'.encode()
+        objects[pages - 1] = (f'<< /Type /Pages /Kids [{" ".join(f"{kid} 0 R" for kid in kids)}] '
+                              f'/Count {len(kids)} >>').encode()
+        info = add(f'<< /Title ({_escape(self.title)}) /Producer (Dayflow HRMS) >>'.encode()
+                   if self.title else b'<< /Producer (Dayflow HRMS) >>')
+
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+        xref = len(output)
+        output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+        output += (b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                   % (len(objects) + 1, catalog, info, xref))
+        return bytes(output)
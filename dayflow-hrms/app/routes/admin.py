@@ -1,14 +1,37 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, send_from_directory
+from flask import (Blueprint, render_template, request, flash, redirect, url_for, jsonify, send_from_directory,
+                   send_file, abort, current_app, stream_with_context)
 from flask_login import login_required, current_user
 from app.models import (db, User, Employee, Attendance, LeaveRequest, Payroll, 
-                        SalaryComponent, TimeOffType, LeaveAllocation,
+                        SalaryComponent, SalaryRevision, TimeOffType, LeaveAllocation,
                         create_salary_components_for_employee, allocate_leave_for_employee,
                         initialize_timeoff_types)
-from datetime import datetime, date, timedelta
-from sqlalchemy import func, or_, and_
+from app.services.attendance_archive import attendance_entity
+from app.services.attendance_bitmaps import year_calendar, department_month
+from app.services.attendance_summary import attendance_stats_for_day
+from app.services.attendance_queue import attendance_queue_metrics
+from app.services.punch_import import import_punch_log, punch_log_format, punch_rejects_dir
+from app.services.leave_attendance import apply_leave_to_attendance
+from app.services.leave_index import LeaveIntervalIndex
+from app.services.payroll_summary import payroll_statistics, payroll_filter_options, month_bounds
+from app.services.payroll_inputs import PayrollInputs, payroll_inputs
+from app.services.payroll_run import run_payroll, working_days_in_period
+from app.services.payroll_recompute import recompute_stale_payroll
+from app.services.ledger_export import LEDGER_FORMATS, export_ledger
+from app.services.payslips import (load_payslip_document, payslip_hash, payslip_file, payslip_filename,
+                                   period_payslip_documents, cached_payslips, payslip_archive)
+from app.services.salary_revision import (sync_salary_components, parse_revisions, revise_salaries,
+                                          increment_percentage)
+from app.salary_structure import salary_plan
+from app.services.loaders import load_profile
+from app.services.pagination import paginate_listing
+from app.services.search import employee_search_filter, autocomplete_employees
+from app.services.serializers import json_response, payroll_detail, leave_request_detail
+from datetime import datetime, date, timedelta, MINYEAR, MAXYEAR
+from sqlalchemy import func
 from decimal import Decimal
 from werkzeug.utils import secure_filename
 import calendar
+import io
 import os
 
 admin_bp = Blueprint('admin', __name__)
@@ -33,29 +56,22 @@ def admin_profile():
 @login_required
 @admin_required
 def employees():
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
+    cursor = request.args.get('cursor')
     search = request.args.get('search', '')
     department = request.args.get('department', '')
     
-    query = Employee.query.join(User)
+    query = Employee.query.join(User).options(*load_profile('employee_list_joined'))
     
     # Apply filters
     if search:
-        query = query.filter(
-            or_(
-                Employee.first_name.contains(search),
-                Employee.last_name.contains(search),
-                User.employee_id.contains(search),
-                User.email.contains(search)
-            )
-        )
+        query = query.filter(employee_search_filter(search))
     
     if department:
         query = query.filter(Employee.department == department)
     
-    employees = query.order_by(Employee.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    employees = paginate_listing(query, Employee, ('employees', search, department),
+                                 page=page, cursor=cursor)
     
     # Get all departments for filter
     departments = db.session.query(Employee.department).distinct().all()
@@ -67,6 +83,55 @@ def employees():
                          search=search,
                          current_department=department)
 
+@admin_bp.route('/employees/autocomplete')
+@login_required
+@admin_required
+def employee_autocomplete():
+    """Ranked prefix matches for the employee search box"""
+    term = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 10, type=int), 25)
+    
+    results = [{
+        'id': employee.id,
+        'name': employee.full_name,
+        'employee_id': user.employee_id,
+        'email': user.email,
+        'department': employee.department,
+        'position': employee.position
+    } for employee, user in autocomplete_employees(term, limit)]
+    
+    return jsonify({'query': term, 'results': results})
+
+@admin_bp.route('/employees/salary-revision', methods=['POST'])
+@login_required
+@admin_required
+def salary_revision():
+    """Apply a CSV of new wages or percentage increments to many employees"""
+    upload = request.files.get('revisions_file')
+    if not upload or not upload.filename:
+        flash('Please choose a CSV file of salary revisions', 'error')
+        return redirect(url_for('admin.employees'))
+    
+    try:
+        revisions = parse_revisions(upload.read())
+        effective_date = request.form.get('effective_date')
+        effective_date = datetime.strptime(effective_date, '%Y-%m-%d').date() if effective_date else None
+    except ValueError as e:
+        flash(f'Invalid salary revision file: {str(e)}', 'error')
+        return redirect(url_for('admin.employees'))
+    
+    try:
+        result = revise_salaries(revisions, effective_date=effective_date,
+                                 reason=request.form.get('reason', '').strip() or None,
+                                 revised_by=current_user.id)
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error revising salaries: {str(e)}', 'error')
+        return redirect(url_for('admin.employees'))
+    
+    flash(f'Salary revision complete - {result.summary()}', 'warning' if result.missing else 'success')
+    return redirect(url_for('admin.employees'))
+
 @admin_bp.route('/employee/<int:employee_id>')
 @login_required
 @admin_required
@@ -225,126 +290,30 @@ def edit_employee(employee_id):
             # Update monthly wage and salary components
             monthly_wage = request.form.get('monthly_wage')
             if monthly_wage:
+                previous_wage = employee.monthly_wage
                 employee.monthly_wage = Decimal(monthly_wage)
                 employee.salary = Decimal(monthly_wage)  # Keep for backward compatibility
                 
-                # Delete existing salary components for this employee
-                SalaryComponent.query.filter_by(employee_id=employee_id).delete()
-                
-                # Calculate and save salary components
-                monthly_wage_float = float(monthly_wage)
-                
-                # 1. Basic Salary (50% of wage)
-                basic_salary = round(monthly_wage_float * 0.50, 2)
-                basic_component = SalaryComponent(
-                    employee_id=employee_id,
-                    component_name='Basic Salary',
-                    component_type='earning',
-                    computation_type='percentage',
-                    value=50,
-                    base_component='wage',
-                    calculated_amount=basic_salary,
-                    is_active=True
-                )
-                db.session.add(basic_component)
-                
-                # 2. HRA (50% of basic)
-                hra = round(basic_salary * 0.50, 2)
-                hra_component = SalaryComponent(
-                    employee_id=employee_id,
-                    component_name='House Rent Allowance',
-                    component_type='earning',
-                    computation_type='percentage',
-                    value=50,
-                    base_component='basic',
-                    calculated_amount=hra,
-                    is_active=True
-                )
-                db.session.add(hra_component)
-                
-                # 3. Standard Allowance (fixed)
-                standard_allowance = Decimal(request.form.get('standard_allowance', '4167'))
-                standard_component = SalaryComponent(
-                    employee_id=employee_id,
-                    component_name='Standard Allowance',
-                    component_type='earning',
-                    computation_type='fixed',
-                    value=standard_allowance,
-                    calculated_amount=standard_allowance,
-                    is_active=True
-                )
-                db.session.add(standard_component)
-                
-                # 4. Performance Bonus (8.33% of wage)
-                performance_bonus = round(monthly_wage_float * 0.0833, 2)
-                perf_component = SalaryComponent(
-                    employee_id=employee_id,
-                    component_name='Performance Bonus',
-                    component_type='earning',
-                    computation_type='percentage',
-                    value=8.33,
-                    base_component='wage',
-                    calculated_amount=performance_bonus,
-                    is_active=True
-                )
-                db.session.add(perf_component)
-                
-                # 5. LTA (8.333% of wage)
-                lta = round(monthly_wage_float * 0.08333, 2)
-                lta_component = SalaryComponent(
-                    employee_id=employee_id,
-                    component_name='Leave Travel Allowance',
-                    component_type='earning',
-                    computation_type='percentage',
-                    value=8.333,
-                    base_component='wage',
-                    calculated_amount=lta,
-                    is_active=True
-                )
-                db.session.add(lta_component)
-                
-                # 6. Fixed Allowance (remaining amount)
-                fixed_allowance = monthly_wage_float - (basic_salary + hra + float(standard_allowance) + performance_bonus + lta)
-                if fixed_allowance > 0:
-                    fixed_component = SalaryComponent(
-                        employee_id=employee_id,
-                        component_name='Fixed Allowance',
-                        component_type='earning',
-                        computation_type='fixed',
-                        value=round(fixed_allowance, 2),
-                        calculated_amount=round(fixed_allowance, 2),
-                        is_active=True
-                    )
-                    db.session.add(fixed_component)
+                # Recompute components from the standard salary structure with
+                # this employee's allowance, PF rate and professional tax,
+                # writing only the components that changed
+                overrides = {
+                    'standard_allowance': Decimal(request.form.get('standard_allowance', '4167')),
+                    'pf': Decimal(request.form.get('pf_rate', '12')),
+                    'professional_tax': Decimal(request.form.get('professional_tax', '200'))
+                }
+                sync_salary_components([(employee.id, employee.monthly_wage)],
+                                       values={employee.id: overrides})
                 
-                # Deductions
-                # 7. Provident Fund (% of basic)
-                pf_rate = Decimal(request.form.get('pf_rate', '12'))
-                pf_amount = round(basic_salary * (float(pf_rate) / 100), 2)
-                pf_component = SalaryComponent(
-                    employee_id=employee_id,
-                    component_name='Provident Fund',
-                    component_type='deduction',
-                    computation_type='percentage',
-                    value=pf_rate,
-                    base_component='basic',
-                    calculated_amount=pf_amount,
-                    is_active=True
-                )
-                db.session.add(pf_component)
-                
-                # 8. Professional Tax (fixed)
-                professional_tax = Decimal(request.form.get('professional_tax', '200'))
-                pt_component = SalaryComponent(
-                    employee_id=employee_id,
-                    component_name='Professional Tax',
-                    component_type='deduction',
-                    computation_type='fixed',
-                    value=professional_tax,
-                    calculated_amount=professional_tax,
-                    is_active=True
-                )
-                db.session.add(pt_component)
+                if previous_wage is None or Decimal(previous_wage) != employee.monthly_wage:
+                    db.session.add(SalaryRevision(
+                        employee_id=employee.id,
+                        previous_wage=previous_wage,
+                        new_wage=employee.monthly_wage,
+                        increment_percentage=increment_percentage(previous_wage, employee.monthly_wage),
+                        reason='Edited employee salary',
+                        revised_by=current_user.id
+                    ))
             
             employee.updated_at = datetime.utcnow()
             db.session.commit()
@@ -439,32 +408,108 @@ def attendance():
     except ValueError:
         selected_date = date.today()
     
-    # Get all employees with their attendance for the selected date
-    employees = db.session.query(Employee, Attendance).outerjoin(
-        Attendance,
-        (Employee.id == Attendance.employee_id) & (Attendance.date == selected_date)
-    ).all()
+    # Get all employees with their attendance for the selected date, archived or not
+    history = attendance_entity(selected_date, selected_date)
+    employees = db.session.query(Employee, history).outerjoin(
+        history,
+        (Employee.id == history.employee_id) & (history.date == selected_date)
+    ).options(*load_profile('employee_list')).all()
+    
+    # Unmarked employees with approved leave show as on leave
+    on_leave = LeaveIntervalIndex.load(selected_date, selected_date).employees_on_leave(selected_date)
+    leave_unmarked = sum(1 for employee, attendance in employees
+                         if attendance is None and employee.id in on_leave)
     
-    # Calculate statistics
-    total_employees = Employee.query.count()
-    present_count = Attendance.query.filter_by(date=selected_date, status='present').count()
-    absent_count = Attendance.query.filter_by(date=selected_date, status='absent').count()
-    leave_count = Attendance.query.filter_by(date=selected_date, status='leave').count()
-    half_day_count = Attendance.query.filter_by(date=selected_date, status='half_day').count()
+    # Calculate statistics from the daily rollup instead of the attendance table
+    total_employees = len(employees)
+    day_stats = attendance_stats_for_day(selected_date)
     
     stats = {
         'total': total_employees,
-        'present': present_count,
-        'absent': absent_count,
-        'leave': leave_count,
-        'half_day': half_day_count,
-        'not_marked': total_employees - (present_count + absent_count + leave_count + half_day_count)
+        'present': day_stats['present'],
+        'absent': day_stats['absent'],
+        'leave': day_stats['leave'] + leave_unmarked,
+        'half_day': day_stats['half_day'],
+        'not_marked': total_employees - sum(day_stats.values()) - leave_unmarked
     }
     
     return render_template('admin/attendance.html',
                          employees=employees,
                          selected_date=selected_date,
-                         stats=stats)
+                         on_leave=on_leave,
+                         stats=stats,
+                         rejects=request.args.get('rejects'))
+
+@admin_bp.route('/attendance/import', methods=['POST'])
+@login_required
+@admin_required
+def upload_punch_log():
+    """Import a turnstile or biometric punch log as attendance"""
+    upload = request.files.get('punch_log')
+    if not upload or not upload.filename:
+        flash('Please choose a punch log file', 'error')
+        return redirect(url_for('admin.attendance'))
+    
+    os.makedirs(punch_rejects_dir(), exist_ok=True)
+    rejects_name = f"punch-rejects-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.csv"
+    rejects_path = os.path.join(punch_rejects_dir(), rejects_name)
+    try:
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        with open(rejects_path, 'w', newline='', encoding='utf-8') as rejects:
+            result = import_punch_log(stream, punch_log_format(upload.filename), rejects=rejects)
+    except ValueError as e:
+        db.session.rollback()
+        os.remove(rejects_path)
+        flash(f'Invalid punch log: {str(e)}', 'error')
+        return redirect(url_for('admin.attendance'))
+    except Exception as e:
+        db.session.rollback()
+        os.remove(rejects_path)
+        flash(f'Error importing punch log: {str(e)}', 'error')
+        return redirect(url_for('admin.attendance'))
+    
+    flash(f'Punch log imported - {result.summary()}', 'warning' if result.rejected else 'success')
+    if not result.rejected:
+        os.remove(rejects_path)
+        return redirect(url_for('admin.attendance'))
+    return redirect(url_for('admin.attendance', rejects=rejects_name))
+
+@admin_bp.route('/attendance/import/rejects/<filename>')
+@login_required
+@admin_required
+def download_punch_rejects(filename):
+    return send_from_directory(punch_rejects_dir(), secure_filename(filename), as_attachment=True)
+
+@admin_bp.route('/attendance/calendar/<int:employee_id>')
+@login_required
+@admin_required
+def attendance_calendar(employee_id):
+    """One employee's year of attendance from the packed bitmaps"""
+    if db.session.get(Employee, employee_id) is None:
+        return jsonify({'error': 'Employee not found'}), 404
+    year = request.args.get('year', date.today().year, type=int)
+    if not MINYEAR <= year <= MAXYEAR:
+        return jsonify({'error': 'Choose a valid year'}), 400
+    return json_response(year_calendar(employee_id, year))
+
+@admin_bp.route('/attendance/heatmap')
+@login_required
+@admin_required
+def attendance_heatmap():
+    """A department's month of attendance, per employee and per day"""
+    department = request.args.get('department', '')
+    try:
+        month = datetime.strptime(request.args.get('month', date.today().strftime('%Y-%m')), '%Y-%m')
+    except ValueError:
+        return jsonify({'error': 'Month must be in YYYY-MM format'}), 400
+    return json_response(department_month(department, month.year, month.month))
+
+@admin_bp.route('/attendance/queue')
+@login_required
+@admin_required
+def attendance_queue_status():
+    """Write-behind attendance queue depth and flush latency"""
+    return jsonify(attendance_queue_metrics())
 
 @admin_bp.route('/update_attendance', methods=['POST'])
 @login_required
@@ -498,6 +543,10 @@ def update_attendance():
         db.session.commit()
         return jsonify({'success': True, 'message': 'Attendance updated successfully'})
         
+    except ValueError as e:
+        # Archived years are read-only
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': 'Error updating attendance'})
@@ -507,24 +556,27 @@ def update_attendance():
 @admin_required
 def leave_requests():
     status_filter = request.args.get('status', 'all')
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
+    cursor = request.args.get('cursor')
     
-    query = LeaveRequest.query
+    query = LeaveRequest.query.options(*load_profile('leave_request_list'))
     
     if status_filter != 'all':
         query = query.filter(LeaveRequest.status == status_filter)
     
-    leave_requests = query.order_by(LeaveRequest.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    leave_requests = paginate_listing(query, LeaveRequest, ('leave_requests', status_filter),
+                                      page=page, cursor=cursor)
     
     # Get all employees for filter
     employees = Employee.query.all()
     
-    # Get counts for statistics
-    pending_count = LeaveRequest.query.filter_by(status='pending').count()
-    approved_count = LeaveRequest.query.filter_by(status='approved').count()
-    rejected_count = LeaveRequest.query.filter_by(status='rejected').count()
+    # Get counts for statistics in one grouped query
+    status_counts = dict(db.session.query(
+        LeaveRequest.status, func.count(LeaveRequest.id)
+    ).group_by(LeaveRequest.status).all())
+    pending_count = status_counts.get('pending', 0)
+    approved_count = status_counts.get('approved', 0)
+    rejected_count = status_counts.get('rejected', 0)
     
     return render_template('admin/leave_requests.html',
                          leave_requests=leave_requests,
@@ -538,28 +590,10 @@ def leave_requests():
 @login_required
 @admin_required
 def get_leave_request(request_id):
-    leave_request = LeaveRequest.query.get_or_404(request_id)
-    
-    # Get certificate filename if exists
-    certificate_filename = None
-    if leave_request.certificate_path:
-        certificate_filename = os.path.basename(leave_request.certificate_path)
-    
-    return jsonify({
-        'id': leave_request.id,
-        'employee_name': leave_request.employee.full_name,
-        'employee_id': leave_request.employee.user.employee_id,
-        'department': leave_request.employee.department,
-        'leave_type': leave_request.leave_type,
-        'start_date': leave_request.start_date.strftime('%Y-%m-%d'),
-        'end_date': leave_request.end_date.strftime('%Y-%m-%d'),
-        'days_requested': leave_request.days_requested,
-        'reason': leave_request.reason,
-        'status': leave_request.status,
-        'admin_comment': leave_request.admin_comment,
-        'certificate_path': leave_request.certificate_path,
-        'certificate_filename': certificate_filename
-    })
+    data = leave_request_detail(request_id)
+    if data is None:
+        return jsonify({'error': 'Leave request not found'}), 404
+    return json_response(data)
 
 @admin_bp.route('/update_leave_status', methods=['POST'])
 @login_required
@@ -577,30 +611,14 @@ def update_leave_status():
         
         # If approved, mark attendance as leave
         if new_status == 'approved':
-            current_date = leave_request.start_date
-            while current_date <= leave_request.end_date:
-                attendance = Attendance.query.filter_by(
-                    employee_id=leave_request.employee_id,
-                    date=current_date
-                ).first()
-                
-                if attendance:
-                    attendance.status = 'leave'
-                    attendance.remarks = f"Approved leave: {leave_request.leave_type}"
-                else:
-                    attendance = Attendance(
-                        employee_id=leave_request.employee_id,
-                        date=current_date,
-                        status='leave',
-                        remarks=f"Approved leave: {leave_request.leave_type}"
-                    )
-                    db.session.add(attendance)
-                
-                current_date += timedelta(days=1)
+            apply_leave_to_attendance(leave_request)
         
         db.session.commit()
         return jsonify({'success': True, 'message': f'Leave request {new_status} successfully'})
         
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -619,30 +637,14 @@ def approve_leave_request(request_id):
         leave_request.updated_at = datetime.utcnow()
         
         # Mark attendance as leave for the requested dates
-        current_date = leave_request.start_date
-        while current_date <= leave_request.end_date:
-            attendance = Attendance.query.filter_by(
-                employee_id=leave_request.employee_id,
-                date=current_date
-            ).first()
-            
-            if attendance:
-                attendance.status = 'leave'
-                attendance.remarks = f"Approved leave: {leave_request.leave_type}"
-            else:
-                attendance = Attendance(
-                    employee_id=leave_request.employee_id,
-                    date=current_date,
-                    status='leave',
-                    remarks=f"Approved leave: {leave_request.leave_type}"
-                )
-                db.session.add(attendance)
-            
-            current_date += timedelta(days=1)
+        apply_leave_to_attendance(leave_request)
         
         db.session.commit()
         return jsonify({'success': True, 'message': 'Leave request approved successfully'})
         
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': 'Error approving leave request'})
@@ -671,52 +673,47 @@ def reject_leave_request(request_id):
 @login_required
 @admin_required
 def payroll():
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
+    cursor = request.args.get('cursor')
     employee_id = request.args.get('employee_id', type=int)
     pay_period = request.args.get('pay_period')
     year = request.args.get('year', type=int)
     
-    query = Payroll.query
+    query = Payroll.query.options(*load_profile('payroll_list'))
     
     if employee_id:
         query = query.filter(Payroll.employee_id == employee_id)
     
     if pay_period:
         # pay_period format is 'YYYY-MM', filter by matching year and month
+        # Compared as a date range so ix_payroll_period_start can serve it
         year_month = pay_period.split('-')
-        if len(year_month) == 2:
-            year_val, month_val = int(year_month[0]), int(year_month[1])
+        try:
+            period_start, period_end = month_bounds(date(int(year_month[0]), int(year_month[1]), 1))
+        except (ValueError, IndexError):
+            period_start = period_end = None
+        if period_start:
             query = query.filter(
-                db.extract('year', Payroll.pay_period_start) == year_val,
-                db.extract('month', Payroll.pay_period_start) == month_val
+                Payroll.pay_period_start >= period_start,
+                Payroll.pay_period_start < period_end
             )
     elif year:
-        query = query.filter(db.extract('year', Payroll.pay_period_start) == year)
+        query = query.filter(
+            Payroll.pay_period_start >= date(year, 1, 1),
+            Payroll.pay_period_start < date(year + 1, 1, 1)
+        )
     
-    payroll_records = query.order_by(Payroll.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    payroll_records = paginate_listing(query, Payroll, ('payroll', employee_id, pay_period, year),
+                                       page=page, cursor=cursor)
     
-    # Calculate statistics
-    all_payrolls = Payroll.query.all()
-    total_payroll = sum(float(p.net_pay or 0) for p in all_payrolls)
-    employees_paid = len(set(p.employee_id for p in all_payrolls if p.payment_status and p.payment_status.lower() == 'paid'))
-    pending_payments = len([p for p in all_payrolls if p.payment_status and p.payment_status.lower() == 'pending'])
-    average_salary = total_payroll / len(all_payrolls) if all_payrolls else 0
+    # Calculate statistics with aggregate queries over the period rollup
+    stats = payroll_statistics()
     
     # Get all employees for filter
     employees = Employee.query.all()
     
-    # Get unique pay periods and years
-    pay_periods = db.session.query(
-        db.func.strftime('%Y-%m', Payroll.pay_period_start).label('period')
-    ).distinct().order_by('period').all()
-    pay_periods = [p[0] for p in pay_periods]
-    
-    years = db.session.query(
-        db.func.strftime('%Y', Payroll.pay_period_start).label('year')
-    ).distinct().order_by('year').all()
-    years = [int(y[0]) for y in years]
+    # Get pay periods and years that have payroll
+    pay_periods, years = payroll_filter_options()
     
     return render_template('admin/payroll.html',
                          payroll_records=payroll_records,
@@ -726,17 +723,54 @@ def payroll():
                          selected_year=year,
                          pay_periods=pay_periods,
                          years=years,
-                         total_payroll=total_payroll,
-                         employees_paid=employees_paid,
-                         pending_payments=pending_payments,
-                         average_salary=average_salary)
+                         total_payroll=stats['total_payroll'],
+                         employees_paid=stats['employees_paid'],
+                         pending_payments=stats['pending_payments'],
+                         average_salary=stats['average_salary'])
 
 @admin_bp.route('/payroll/generate', methods=['POST'])
 @login_required
 @admin_required
 def generate_payroll():
-    """Generate payroll - alias for create_payroll"""
-    return create_payroll()
+    """Run payroll for a month for all (or the selected) active employees"""
+    pay_period = request.form.get('pay_period', '')
+    try:
+        year, month = (int(part) for part in pay_period.split('-'))
+        date(year, month, 1)
+    except ValueError:
+        flash('Please select a valid pay period', 'error')
+        return redirect(url_for('admin.payroll'))
+    
+    department = request.form.get('department') or None
+    employee_ids = request.form.getlist('employee_ids', type=int)
+    
+    try:
+        result = run_payroll(month, year, department=department, employee_ids=employee_ids)
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error running payroll: {str(e)}', 'error')
+        return redirect(url_for('admin.payroll'))
+    
+    flash(f'Payroll run complete - {result.summary()}', 'success')
+    return redirect(url_for('admin.payroll', pay_period=pay_period))
+
+@admin_bp.route('/payroll/recompute', methods=['POST'])
+@login_required
+@admin_required
+def recompute_payroll():
+    """Recalculate payroll rows whose attendance, leave or salary inputs changed"""
+    try:
+        result = recompute_stale_payroll()
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error recomputing payroll: {str(e)}', 'error')
+        return redirect(url_for('admin.payroll'))
+    
+    if result.stale:
+        flash(f'Payroll recomputed - {result.summary()}', 'success')
+    else:
+        flash('All payroll records are up to date', 'info')
+    return redirect(url_for('admin.payroll'))
 
 @admin_bp.route('/payroll/create', methods=['GET', 'POST'])
 @login_required
@@ -767,6 +801,13 @@ def create_payroll():
             
             employee = Employee.query.get_or_404(employee_id)
             
+            # One payroll per employee and period
+            if Payroll.query.filter_by(employee_id=employee.id, pay_period_start=pay_period_start).first():
+                flash(f'{employee.full_name} already has payroll for {pay_period_start.strftime("%B %Y")}.', 'error')
+                employees = Employee.query.all()
+                current_year = datetime.now().year
+                return render_template('admin/create_payroll.html', employees=employees, current_year=current_year)
+            
             # Get base salary from form or calculate from employee data
             base_salary_form = request.form.get('base_monthly_salary', '').strip()
             if base_salary_form and float(base_salary_form) > 0:
@@ -780,11 +821,15 @@ def create_payroll():
                 return render_template('admin/create_payroll.html', employees=employees, current_year=current_year)
             
             # Get form data with defaults - handle empty strings properly
+            # Blank salary fields default to the standard salary structure
+            plan = salary_plan()
             basic_salary_val = request.form.get('basic_salary', '').strip()
-            basic_salary = Decimal(basic_salary_val if basic_salary_val else str(base_salary * 0.5))
+            pinned = {'basic': Decimal(basic_salary_val)} if basic_salary_val else {}
+            structure = plan.payroll_fields(plan.evaluate([base_salary], amounts=pinned), 0)
+            basic_salary = structure['basic_salary']
             
             hra_val = request.form.get('hra', '').strip()
-            hra = Decimal(hra_val if hra_val else str(float(basic_salary) * 0.5))
+            hra = Decimal(hra_val) if hra_val else structure['hra']
             
             standard_allowance = Decimal(request.form.get('standard_allowance', '0').strip() or '0')
             performance_bonus = Decimal(request.form.get('performance_bonus', '0').strip() or '0')
@@ -797,44 +842,29 @@ def create_payroll():
             other_earnings = Decimal(request.form.get('other_earnings', '0').strip() or '0')
             
             # Deductions
-            pf_deduction = Decimal(request.form.get('pf_deduction', '').strip() or str(float(basic_salary) * 0.12))
+            pf_deduction_val = request.form.get('pf_deduction', '').strip()
+            pf_deduction = Decimal(pf_deduction_val) if pf_deduction_val else structure['pf_deduction']
             professional_tax = Decimal(request.form.get('professional_tax', '200').strip() or '200')
             deductions = Decimal(request.form.get('deductions', '0').strip() or '0')
             tax_deductions = Decimal(request.form.get('tax_deductions', '0').strip() or '0')
             
-            # Attendance data - the form sends 'working_days' which is total_working_days
-            working_days_from_form = int(request.form.get('working_days', '26').strip() or '26')
-            total_working_days = working_days_from_form
-            days_present = int(request.form.get('days_present', '').strip() or str(working_days_from_form))
-            
-            # Calculate unpaid leave days from leave requests
-            unpaid_leave_days = 0
-            paid_leave_days = 0
-            
-            # Count unpaid and paid leaves in the pay period
-            leave_requests = LeaveRequest.query.filter(
-                LeaveRequest.employee_id == employee_id,
-                LeaveRequest.status == 'approved',
-                or_(
-                    and_(LeaveRequest.start_date >= pay_period_start, LeaveRequest.start_date <= pay_period_end),
-                    and_(LeaveRequest.end_date >= pay_period_start, LeaveRequest.end_date <= pay_period_end),
-                    and_(LeaveRequest.start_date <= pay_period_start, LeaveRequest.end_date >= pay_period_end)
-                )
-            ).all()
-            
-            for leave_req in leave_requests:
-                # Calculate overlapping days
-                overlap_start = max(leave_req.start_date, pay_period_start)
-                overlap_end = min(leave_req.end_date, pay_period_end)
-                overlap_days = (overlap_end - overlap_start).days + 1
-                
-                if leave_req.leave_type == 'unpaid':
-                    unpaid_leave_days += overlap_days
-                else:
-                    paid_leave_days += overlap_days
+            # Attendance data - blank fields default to the recorded attendance for the period
+            inputs = (payroll_inputs(pay_period_start, pay_period_end, employee_ids=[employee.id])
+                      .get(employee.id) or PayrollInputs())
+            working_days_val = request.form.get('working_days', '').strip()
+            total_working_days = (int(working_days_val) if working_days_val else working_days_in_period(
+                pay_period_start, pay_period_end, employee.working_days_per_week or 5))
+            days_present_val = request.form.get('days_present', '').strip()
+            days_present = (int(days_present_val) if days_present_val
+                            else inputs.payroll_days_present(total_working_days))
+            
+            # Paid and unpaid leave days from approved leave in the pay period
+            paid_leave_days, unpaid_leave_days = LeaveIntervalIndex.load(
+                pay_period_start, pay_period_end, employee_ids=[employee.id]
+            ).leave_days(employee.id, pay_period_start, pay_period_end)
             
-            overtime_hours_val = request.form.get('overtime_hours', '0').strip()
-            overtime_hours = float(overtime_hours_val if overtime_hours_val else '0')
+            overtime_hours_val = request.form.get('overtime_hours', '').strip()
+            overtime_hours = float(overtime_hours_val) if overtime_hours_val else inputs.overtime_hours
             
             overtime_rate_val = request.form.get('overtime_rate', '0').strip()
             overtime_rate = Decimal(overtime_rate_val if overtime_rate_val else '0')
@@ -862,7 +892,10 @@ def create_payroll():
                 unpaid_leave_days=unpaid_leave_days,
                 paid_leave_days=paid_leave_days,
                 overtime_hours=overtime_hours,
-                overtime_rate=overtime_rate
+                overtime_rate=overtime_rate,
+                # Figures left blank follow later attendance corrections
+                days_present_derived=not days_present_val,
+                overtime_derived=not overtime_hours_val
             )
             
             # Calculate all pay components
@@ -884,63 +917,39 @@ def create_payroll():
     current_year = datetime.now().year
     return render_template('admin/create_payroll.html', employees=employees, current_year=current_year)
 
-@admin_bp.route('/payroll/<int:payroll_id>')
+@admin_bp.route('/payroll/inputs')
 @login_required
 @admin_required
-def get_payroll(payroll_id):
+def payroll_form_inputs():
+    """Attendance figures that pre-fill the payroll form for one employee and month"""
     try:
-        payroll = Payroll.query.get_or_404(payroll_id)
+        employee = db.session.get(Employee, request.args.get('employee_id', type=int))
+        if employee is None:
+            return jsonify({'error': 'Employee not found'}), 404
+        period_start, period_end = month_bounds(date(request.args.get('year', type=int),
+                                                     request.args.get('month', type=int), 1))
+        period_end -= timedelta(days=1)
+        working_days = working_days_in_period(period_start, period_end, employee.working_days_per_week or 5)
+        inputs = (payroll_inputs(period_start, period_end, employee_ids=[employee.id]).get(employee.id)
+                  or PayrollInputs())
         return jsonify({
-            'id': payroll.id,
-            'employee_name': payroll.employee.full_name,
-            'employee_id': payroll.employee.user.employee_id,
-            'department': payroll.employee.department,
-            'position': payroll.employee.position,
-            'pay_period': f"{payroll.pay_period_start.strftime('%Y-%m-%d')} to {payroll.pay_period_end.strftime('%Y-%m-%d')}",
-            
-            # Earnings breakdown
-            'base_monthly_salary': float(payroll.base_monthly_salary) if payroll.base_monthly_salary else 0,
-            'basic_salary': float(payroll.basic_salary),
-            'hra': float(payroll.hra),
-            'standard_allowance': float(payroll.standard_allowance),
-            'performance_bonus': float(payroll.performance_bonus),
-            'lta': float(payroll.lta),
-            'fixed_allowance': float(payroll.fixed_allowance),
-            'allowances': float(payroll.allowances),
-            
-            # Increments and Bonuses
-            'increment_amount': float(payroll.increment_amount),
-            'increment_percentage': float(payroll.increment_percentage),
-            'special_bonus': float(payroll.special_bonus),
-            'festival_bonus': float(payroll.festival_bonus),
-            'other_earnings': float(payroll.other_earnings),
-            
-            # Overtime
-            'overtime_hours': float(payroll.overtime_hours),
-            'overtime_rate': float(payroll.overtime_rate),
-            'overtime_pay': float(payroll.overtime_hours * payroll.overtime_rate),
-            
-            # Attendance
-            'days_present': payroll.days_present,
-            'total_working_days': payroll.total_working_days,
-            'unpaid_leave_days': payroll.unpaid_leave_days,
-            'paid_leave_days': payroll.paid_leave_days,
-            
-            # Deductions breakdown
-            'pf_deduction': float(payroll.pf_deduction),
-            'professional_tax': float(payroll.professional_tax),
-            'deductions': float(payroll.deductions),
-            'tax_deductions': float(payroll.tax_deductions),
-            'unpaid_leave_deduction': float(payroll.unpaid_leave_deduction),
-            
-            # Totals
-            'gross_pay': float(payroll.gross_pay) if payroll.gross_pay else 0,
-            'total_deductions': float(payroll.total_deductions) if payroll.total_deductions else 0,
-            'net_pay': float(payroll.net_pay) if payroll.net_pay else 0,
-            
-            'payment_status': payroll.payment_status if payroll.payment_status else 'pending',
-            'created_at': payroll.created_at.strftime('%Y-%m-%d')
+            **inputs.to_dict(),
+            'working_days': working_days,
+            'payroll_days_present': inputs.payroll_days_present(working_days),
+            'base_monthly_salary': float(employee.monthly_wage or 0),
         })
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Choose an employee, month and year'}), 400
+
+@admin_bp.route('/payroll/<int:payroll_id>')
+@login_required
+@admin_required
+def get_payroll(payroll_id):
+    try:
+        data = payroll_detail(payroll_id)
+        if data is None:
+            return jsonify({'error': 'Payroll record not found'}), 404
+        return json_response(data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -953,8 +962,8 @@ def mark_payroll_paid():
         payroll_id = data.get('payroll_id')
         
         payroll = Payroll.query.get_or_404(payroll_id)
-        # You can add a payment_status field to the model later
-        # For now, just return success
+        payroll.payment_status = 'paid'
+        payroll.payment_date = date.today()
         
         db.session.commit()
         return jsonify({'success': True, 'message': 'Payroll marked as paid'})
@@ -967,9 +976,92 @@ def mark_payroll_paid():
 @login_required
 @admin_required
 def generate_payslip(payroll_id):
-    payroll = Payroll.query.get_or_404(payroll_id)
-    # This would generate a PDF payslip - for now just return HTML
-    return render_template('admin/payslip.html', payroll=payroll)
+    """PDF payslip, served from the payslip cache (?format=html for the printable page)"""
+    if request.args.get('format') == 'html':
+        payroll = Payroll.query.get_or_404(payroll_id)
+        return render_template('admin/payslip.html', payroll=payroll)
+    
+    document = load_payslip_document(payroll_id)
+    if document is None:
+        abort(404)
+    
+    # The content hash is the ETag, so an unchanged payslip needs no file access
+    digest = payslip_hash(document)
+    if digest in request.if_none_match:
+        response = current_app.response_class(status=304)
+        response.set_etag(digest)
+        return response
+    
+    path = payslip_file(document, digest)
+    return send_file(path, mimetype='application/pdf', download_name=payslip_filename(document),
+                     as_attachment=request.args.get('download') == '1', etag=digest,
+                     conditional=True, max_age=0)
+
+@admin_bp.route('/payroll/payslips.zip')
+@login_required
+@admin_required
+def download_payslips():
+    """Stream a ZIP of every payslip for a pay period, optionally for one department"""
+    pay_period = request.args.get('pay_period', '')
+    try:
+        year, month = (int(part) for part in pay_period.split('-'))
+        period_start = date(year, month, 1)
+    except ValueError:
+        flash('Please select a valid pay period', 'error')
+        return redirect(url_for('admin.payroll'))
+    
+    department = request.args.get('department') or None
+    query = Payroll.query.filter(Payroll.pay_period_start == period_start)
+    if department:
+        query = query.join(Employee).filter(Employee.department == department)
+    if not db.session.query(query.exists()).scalar():
+        flash(f'No payroll records for {period_start.strftime("%B %Y")}', 'error')
+        return redirect(url_for('admin.payroll', pay_period=pay_period))
+    
+    # Payslips are zipped as they come out of the cache or the render pool
+    entries = cached_payslips(period_payslip_documents(period_start, department))
+    filename = f"payslips-{pay_period}{'-' + secure_filename(department) if department else ''}.zip"
+    return current_app.response_class(
+        stream_with_context(payslip_archive(entries)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@admin_bp.route('/payroll/export')
+@login_required
+@admin_required
+def export_payroll_ledger():
+    """Stream the payroll ledger as CSV, NDJSON or Parquet, optionally filtered"""
+    fmt = request.args.get('format', 'csv')
+    period_from = request.args.get('from', '')
+    period_to = request.args.get('to', '')
+    try:
+        period_start = _month_start(period_from) if period_from else None
+        period_end = month_bounds(_month_start(period_to))[1] if period_to else None
+    except ValueError:
+        flash('Please select valid pay periods', 'error')
+        return redirect(url_for('admin.payroll'))
+    if fmt not in LEDGER_FORMATS:
+        flash('Please select a valid export format', 'error')
+        return redirect(url_for('admin.payroll'))
+    
+    department = request.args.get('department') or None
+    since_id = request.args.get('since_id', type=int)
+    chunks = export_ledger(fmt, period_start, period_end, department, since_id)
+    
+    mimetype, extension = LEDGER_FORMATS[fmt]
+    scope = '-'.join(part for part in (period_from, period_to, secure_filename(department or '')) if part)
+    filename = f"payroll-ledger{'-' + scope if scope else ''}.{extension}"
+    return current_app.response_class(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+def _month_start(pay_period):
+    """First day of a 'YYYY-MM' pay period"""
+    year, month = (int(part) for part in pay_period.split('-'))
+    return date(year, month, 1)
 
 @admin_bp.route('/download_medical_certificate/<int:leave_request_id>')
 @login_required
@@ -1,7 +1,13 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, send_from_directory
 from flask_login import login_required, current_user
 from app.models import db, Employee, Attendance, LeaveRequest, Payroll, Certificate
-from datetime import datetime, date, time, timedelta
+from app.services.attendance_queue import (buffered_attendance, queue_punch_in, queue_punch_out, punched_in,
+                                           settle_attendance)
+from app.services.attendance_archive import attendance_entity
+from app.services.attendance_bitmaps import year_calendar
+from app.services.punches import punch_in, punch_out
+from app.services.serializers import json_response
+from datetime import datetime, date, time, timedelta, MINYEAR, MAXYEAR
 from werkzeug.utils import secure_filename
 import os
 
@@ -152,15 +158,17 @@ def attendance():
         return redirect(url_for('main.admin_dashboard'))
     
     employee = current_user.employee_profile
+    settle_attendance(employee.id)
     
     # Get current month's attendance
     today = date.today()
     start_of_month = today.replace(day=1)
     
-    attendance_records = Attendance.query.filter(
-        Attendance.employee_id == employee.id,
-        Attendance.date >= start_of_month
-    ).order_by(Attendance.date.desc()).all()
+    history = attendance_entity(start_of_month, today)
+    attendance_records = db.session.query(history).filter(
+        history.employee_id == employee.id,
+        history.date >= start_of_month
+    ).order_by(history.date.desc()).all()
     
     # Get today's attendance
     todays_attendance = Attendance.query.filter_by(
@@ -188,6 +196,20 @@ def attendance():
     
     return render_template('employee/attendance.html', **context)
 
+@employee_bp.route('/attendance/calendar')
+@login_required
+def attendance_calendar():
+    """The employee's own year of attendance from the packed bitmaps"""
+    if current_user.is_admin():
+        return jsonify({'error': 'Access denied'}), 403
+    
+    employee = current_user.employee_profile
+    settle_attendance(employee.id)
+    year = request.args.get('year', date.today().year, type=int)
+    if not MINYEAR <= year <= MAXYEAR:
+        return jsonify({'error': 'Choose a valid year'}), 400
+    return json_response(year_calendar(employee.id, year))
+
 @employee_bp.route('/check_in', methods=['POST'])
 @login_required
 def check_in():
@@ -195,35 +217,15 @@ def check_in():
         return jsonify({'success': False, 'message': 'Access denied'})
     
     employee = current_user.employee_profile
-    today = date.today()
-    
-    # Check if already checked in today
-    existing_attendance = Attendance.query.filter_by(
-        employee_id=employee.id,
-        date=today
-    ).first()
-    
-    if existing_attendance and existing_attendance.check_in_time:
-        return jsonify({'success': False, 'message': 'Already checked in today'})
     
     try:
         current_time = datetime.now().time()
         
-        if existing_attendance:
-            # Update existing record
-            existing_attendance.check_in_time = current_time
-            existing_attendance.status = 'present'
-        else:
-            # Create new attendance record
-            attendance = Attendance(
-                employee_id=employee.id,
-                date=today,
-                check_in_time=current_time,
-                status='present'
-            )
-            db.session.add(attendance)
+        # One atomic upsert, or an entry in the write-behind queue when buffering is on
+        punch = queue_punch_in if buffered_attendance() else punch_in
+        if not punch(employee.id, employee.department, date.today(), current_time):
+            return jsonify({'success': False, 'message': 'Already checked in today'})
         
-        db.session.commit()
         return jsonify({'success': True, 'message': 'Checked in successfully', 'time': current_time.strftime('%H:%M:%S')})
         
     except Exception as e:
@@ -236,33 +238,24 @@ def check_out():
     if current_user.is_admin():
         return jsonify({'success': False, 'message': 'Access denied'})
     
-    employee = current_user.employee_profile
+    employee_id = current_user.employee_profile.id
     today = date.today()
     
-    attendance = Attendance.query.filter_by(
-        employee_id=employee.id,
-        date=today
-    ).first()
-    
-    if not attendance or not attendance.check_in_time:
-        return jsonify({'success': False, 'message': 'Please check in first'})
-    
-    if attendance.check_out_time:
-        return jsonify({'success': False, 'message': 'Already checked out today'})
-    
     try:
         current_time = datetime.now().time()
-        attendance.check_out_time = current_time
+        punch = queue_punch_out if buffered_attendance() else punch_out
+        hours_worked = punch(employee_id, today, current_time)
         
-        # Calculate hours worked
-        attendance.calculate_hours_worked()
+        if hours_worked is None:
+            if not punched_in(employee_id, today):
+                return jsonify({'success': False, 'message': 'Please check in first'})
+            return jsonify({'success': False, 'message': 'Already checked out today'})
         
-        db.session.commit()
         return jsonify({
             'success': True, 
             'message': 'Checked out successfully',
             'time': current_time.strftime('%H:%M:%S'),
-            'hours_worked': round(attendance.hours_worked, 2)
+            'hours_worked': round(hours_worked, 2)
         })
         
     except Exception as e:
@@ -1,7 +1,11 @@
 from flask import Blueprint, render_template, redirect, url_for
 from flask_login import login_required, current_user
-from app.models import db, Employee, Attendance, LeaveRequest, Payroll
-from datetime import datetime, date, timedelta
+from app.models import db, Employee, LeaveRequest
+from app.services.status import workforce_status_counts
+from app.services.loaders import load_profile
+from app.services.snapshot import employee_snapshot
+from app.services.attendance_queue import settle_attendance
+from datetime import date
 from sqlalchemy import func
 
 main_bp = Blueprint('main', __name__)
@@ -25,54 +29,19 @@ def employee_dashboard():
     if not employee:
         return redirect(url_for('auth.logout'))
     
-    # Get today's attendance
-    today = date.today()
-    todays_attendance = Attendance.query.filter_by(
-        employee_id=employee.id,
-        date=today
-    ).first()
-    
-    # Get recent attendance (last 7 days)
-    week_ago = today - timedelta(days=7)
-    recent_attendance = Attendance.query.filter(
-        Attendance.employee_id == employee.id,
-        Attendance.date >= week_ago
-    ).order_by(Attendance.date.desc()).limit(7).all()
-    
-    # Get pending leave requests
-    pending_leaves = LeaveRequest.query.filter_by(
-        employee_id=employee.id,
-        status='pending'
-    ).count()
-    
-    # Get approved leaves this month
-    first_of_month = today.replace(day=1)
-    approved_leaves = LeaveRequest.query.filter(
-        LeaveRequest.employee_id == employee.id,
-        LeaveRequest.status == 'approved',
-        LeaveRequest.start_date >= first_of_month
-    ).count()
-    
-    # Get latest payroll
-    latest_payroll = Payroll.query.filter_by(
-        employee_id=employee.id
-    ).order_by(Payroll.created_at.desc()).first()
-    
-    # Calculate total hours worked this month
-    total_hours = db.session.query(func.sum(Attendance.hours_worked)).filter(
-        Attendance.employee_id == employee.id,
-        Attendance.date >= first_of_month,
-        Attendance.status.in_(['present', 'half_day'])
-    ).scalar() or 0
+    # Everything below the greeting comes from one cached snapshot query,
+    # taken after any check-in still waiting in the attendance queue is applied
+    settle_attendance(employee.id)
+    snapshot = employee_snapshot(employee.id)
     
     context = {
         'employee': employee,
-        'todays_attendance': todays_attendance,
-        'recent_attendance': recent_attendance,
-        'pending_leaves': pending_leaves,
-        'approved_leaves': approved_leaves,
-        'latest_payroll': latest_payroll,
-        'total_hours': round(total_hours, 1)
+        'todays_attendance': snapshot.todays_attendance,
+        'recent_attendance': snapshot.recent_attendance,
+        'pending_leaves': snapshot.pending_leaves,
+        'approved_leaves': snapshot.approved_leaves,
+        'latest_payroll': snapshot.latest_payroll,
+        'total_hours': snapshot.total_hours
     }
     
     return render_template('employee/dashboard.html', **context)
@@ -83,35 +52,16 @@ def admin_dashboard():
     if not current_user.is_admin():
         return redirect(url_for('main.employee_dashboard'))
     
-    # Get all employees with their current status
-    all_employees = Employee.query.all()
-    
-    # Get today's date
-    today = date.today()
-    
-    # Count employees by status
-    present_count = 0
-    absent_count = 0
-    on_leave_count = 0
-    
-    for emp in all_employees:
-        status = emp.current_status
-        if status == 'present':
-            present_count += 1
-        elif status == 'on_leave':
-            on_leave_count += 1
-        else:
-            absent_count += 1
-    
-    total_employees = len(all_employees)
+    # Count employees by status for today in one set-based query
+    status_counts = workforce_status_counts(date.today())
     
     # Get pending leave requests
     pending_leaves = LeaveRequest.query.filter_by(status='pending').count()
     
     # Get recent leave requests (last 10)
-    recent_leave_requests = LeaveRequest.query.order_by(
-        LeaveRequest.created_at.desc()
-    ).limit(10).all()
+    recent_leave_requests = LeaveRequest.query.options(
+        *load_profile('leave_request_list')
+    ).order_by(LeaveRequest.created_at.desc()).limit(10).all()
     
     # Department wise summary
     department_summary = db.session.query(
@@ -120,13 +70,12 @@ def admin_dashboard():
     ).group_by(Employee.department).all()
     
     context = {
-        'total_employees': total_employees,
-        'present_today': present_count,
-        'absent_today': absent_count,
-        'on_leave_today': on_leave_count,
+        'total_employees': status_counts['total'],
+        'present_today': status_counts['present'],
+        'absent_today': status_counts['absent'],
+        'on_leave_today': status_counts['on_leave'],
         'pending_leaves': pending_leaves,
         'recent_leave_requests': recent_leave_requests,
-        'all_employees': all_employees,
         'department_summary': department_summary
     }
     
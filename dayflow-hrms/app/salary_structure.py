@@ -0,0 +1,214 @@
+"""
+Salary structure rules engine
+A salary structure is plain data: component rules that are a fixed amount,
+a percentage of the wage or of another component, or the remainder of the
+wage after the other earnings. Each structure is compiled once into a plan
+with its rules in dependency order; plans are cached and evaluate one wage
+or thousands of wages in a single call.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+WAGE = 'wage'
+CENT = Decimal('0.01')
+COMPUTATION_TYPES = ('fixed', 'percentage', 'remainder')
+
+
+def to_decimal(value):
+    """Decimal for a form, float or Numeric value (None counts as 0)"""
+    if value is None:
+        return Decimal('0')
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def component_amount(computation_type, value, base_amount=None):
+    """Amount of a fixed or percentage component, rounded to paise"""
+    if computation_type == 'fixed':
+        return to_decimal(value)
+    if computation_type == 'percentage':
+        if not base_amount:
+            return Decimal('0')
+        return (to_decimal(base_amount) * to_decimal(value) / 100).quantize(CENT, rounding=ROUND_HALF_UP)
+    raise ValueError(f"{computation_type} components need the whole structure to evaluate")
+
+
+class ComponentRule:
+    """How one salary component is computed and which payroll column it feeds"""
+
+    def __init__(self, key, name, component_type, computation_type, value=0, base=None,
+                 payroll_field=None):
+        if computation_type not in COMPUTATION_TYPES:
+            raise ValueError(f"Unknown computation type {computation_type!r} for {name}")
+        if computation_type == 'percentage' and not base:
+            raise ValueError(f"Percentage component {name} needs a base")
+        self.key = key
+        self.name = name
+        self.component_type = component_type
+        self.computation_type = computation_type
+        self.value = to_decimal(value)
+        self.base = base
+        self.payroll_field = payroll_field
+
+    def __repr__(self):
+        return f'<ComponentRule {self.key}>'
+
+
+class SalaryStructure:
+    """A named, ordered set of component rules"""
+
+    def __init__(self, name, rules):
+        self.name = name
+        self.rules = tuple(rules)
+
+    def __repr__(self):
+        return f'<SalaryStructure {self.name}>'
+
+
+class SalaryPlan:
+    """A compiled structure: its rules in an order where every base comes first"""
+
+    def __init__(self, structure, steps):
+        self.structure = structure
+        self.steps = tuple(steps)
+        self.rules_by_key = {rule.key: rule for rule in steps}
+        self.rules_by_name = {rule.name: rule for rule in steps}
+
+    def evaluate(self, wages, values=None, amounts=None):
+        """
+        Amounts for every component for each wage, as {key: [Decimal, ...]}.
+        values overrides rule values (a fixed amount or a percentage) and
+        amounts pins component amounts; both map keys to one value for all
+        wages or to a sequence with one value per wage.
+        """
+        wages = [to_decimal(wage) for wage in wages]
+        size = len(wages)
+        values = values or {}
+        amounts = amounts or {}
+        columns = {}
+
+        for rule in self.steps:
+            if rule.key in amounts:
+                columns[rule.key] = _broadcast(amounts[rule.key], size)
+                continue
+            rule_values = _broadcast(values.get(rule.key, rule.value), size)
+            if rule.computation_type == 'remainder':
+                earnings = [columns[other.key] for other in self.steps
+                            if other.component_type == 'earning' and other is not rule]
+                columns[rule.key] = [
+                    max(wages[i] - sum((column[i] for column in earnings), Decimal('0')), Decimal('0'))
+                    for i in range(size)
+                ]
+            elif rule.computation_type == 'percentage':
+                bases = wages if rule.base == WAGE else columns[rule.base]
+                columns[rule.key] = [component_amount('percentage', rule_values[i], bases[i])
+                                     for i in range(size)]
+            else:
+                columns[rule.key] = rule_values
+        return columns
+
+    def components(self, evaluated, i, values=None):
+        """SalaryComponent column values for wage i of an evaluate() result"""
+        values = values or {}
+        rows = []
+        for rule in self.steps:
+            amount = evaluated[rule.key][i]
+            if rule.computation_type == 'remainder':
+                # Only present when the other earnings leave something over
+                if amount <= 0:
+                    continue
+                computation_type, value = 'fixed', amount
+            else:
+                computation_type = rule.computation_type
+                value = values.get(rule.key, rule.value)
+                value = to_decimal(value[i] if isinstance(value, (list, tuple)) else value)
+            rows.append({
+                'component_name': rule.name,
+                'component_type': rule.component_type,
+                'computation_type': computation_type,
+                'value': value,
+                'base_component': rule.base if computation_type == 'percentage' else None,
+                'calculated_amount': amount,
+                'is_active': True
+            })
+        return rows
+
+    def payroll_fields(self, evaluated, i):
+        """{payroll column: amount} for wage i of an evaluate() result"""
+        return {rule.payroll_field: evaluated[rule.key][i]
+                for rule in self.steps if rule.payroll_field}
+
+
+def _broadcast(value, size):
+    if isinstance(value, (list, tuple)):
+        return [to_decimal(v) for v in value]
+    return [to_decimal(value)] * size
+
+
+def compile_structure(structure):
+    """Order a structure's rules so every component follows the ones it depends on"""
+    rules = {rule.key: rule for rule in structure.rules}
+    if len(rules) != len(structure.rules):
+        raise ValueError(f"Duplicate component keys in structure {structure.name}")
+    remainders = [rule for rule in structure.rules if rule.computation_type == 'remainder']
+    if len(remainders) > 1:
+        raise ValueError(f"Structure {structure.name} has more than one remainder component")
+
+    dependencies = {}
+    for rule in structure.rules:
+        if rule.computation_type == 'percentage' and rule.base != WAGE:
+            if rule.base not in rules:
+                raise ValueError(f"{rule.name} is based on unknown component {rule.base!r}")
+            dependencies[rule.key] = {rule.base}
+        elif rule.computation_type == 'remainder':
+            dependencies[rule.key] = {other.key for other in structure.rules
+                                      if other.component_type == 'earning' and other is not rule}
+        else:
+            dependencies[rule.key] = set()
+
+    # Topological sort that takes the first declared rule whose bases are done,
+    # so a structure already in dependency order keeps its order
+    steps = []
+    done = set()
+    remaining = [rule.key for rule in structure.rules]
+    while remaining:
+        ready = next((key for key in remaining if dependencies[key] <= done), None)
+        if ready is None:
+            raise ValueError(f"Circular component dependencies in structure {structure.name}: "
+                             f"{', '.join(remaining)}")
+        steps.append(rules[ready])
+        done.add(ready)
+        remaining.remove(ready)
+    return SalaryPlan(structure, steps)
+
+
+# The company salary structure; edit_employee exposes the standard allowance,
+# PF rate and professional tax as per-employee overrides
+STANDARD_STRUCTURE = SalaryStructure('standard', [
+    ComponentRule('basic', 'Basic Salary', 'earning', 'percentage', 50, base=WAGE,
+                  payroll_field='basic_salary'),
+    ComponentRule('hra', 'House Rent Allowance', 'earning', 'percentage', 50, base='basic',
+                  payroll_field='hra'),
+    ComponentRule('standard_allowance', 'Standard Allowance', 'earning', 'fixed', 4167,
+                  payroll_field='standard_allowance'),
+    ComponentRule('performance_bonus', 'Performance Bonus', 'earning', 'percentage', '8.33', base=WAGE,
+                  payroll_field='performance_bonus'),
+    ComponentRule('lta', 'Leave Travel Allowance', 'earning', 'percentage', '8.333', base=WAGE,
+                  payroll_field='lta'),
+    ComponentRule('fixed_allowance', 'Fixed Allowance', 'earning', 'remainder',
+                  payroll_field='fixed_allowance'),
+    ComponentRule('pf', 'Provident Fund', 'deduction', 'percentage', 12, base='basic',
+                  payroll_field='pf_deduction'),
+    ComponentRule('professional_tax', 'Professional Tax', 'deduction', 'fixed', 200,
+                  payroll_field='professional_tax'),
+])
+
+STRUCTURES = {STANDARD_STRUCTURE.name: STANDARD_STRUCTURE}
+_plans = {}
+
+
+def salary_plan(name='standard'):
+    """Compiled plan for a registered structure, compiled on first use"""
+    if name not in _plans:
+        _plans[name] = compile_structure(STRUCTURES[name])
+    return _plans[name]
@@ -0,0 +1,6 @@
+# Dayflow HRMS Services
+# Importing the package registers the ORM listeners that keep rollup tables,
+# attendance bitmaps and the directory search index current, drop stale
+# dashboard snapshots, cached payslip PDFs and deleted employees' archived
+# attendance, and mark payroll rows whose inputs changed
+from . import attendance_summary, attendance_bitmaps, attendance_archive, payroll_summary, search, snapshot, payslips, payroll_recompute
@@ -0,0 +1,141 @@
+"""
+Hot and archived attendance
+Years older than the hot horizon (the start of the oldest of the last
+ATTENDANCE_HOT_YEARS calendar years, never fewer than the current and the
+previous year) are moved out of the attendance table into one
+attendance_archive_<year> table per year with the same columns and
+indexes, registered in attendance_archives (see attendance_archiver).
+Which years are archived is what that registry says, not what the horizon
+says today: an archival run may have used other hot years than the
+current setting. attendance_entity(start, end) is what readers query: the
+Attendance model itself while the range stays within the current and the
+previous year, which are never archived, so hot reads are unchanged, or
+Attendance mapped onto a UNION ALL of the attendance table and the archive
+tables of the registered years the range reaches back to. The dashboard
+snapshot only reads the current month and week, which are always hot.
+Archived years are read-only history: check_attendance_writable refuses
+Core writes dated in them and a before_flush listener refuses ORM ones, so
+a day is never recorded both hot and archived.
+"""
+import threading
+from datetime import date
+from flask import current_app
+from sqlalchemy import MetaData, Table, Column, Index, event, select, delete, union_all
+from sqlalchemy.orm import aliased
+from app.models import db, Employee, Attendance, AttendanceArchive
+
+DEFAULT_HOT_YEARS = 2
+MIN_HOT_YEARS = 2
+ARCHIVE_PREFIX = 'attendance_archive_'
+
+_attendance = Attendance.__table__
+_archives = AttendanceArchive.__table__
+_archive_metadata = MetaData()
+_tables_lock = threading.Lock()
+
+
+def hot_years(requested=None):
+    """Calendar years kept in the attendance table, counting the current one"""
+    if requested is None:
+        requested = current_app.config.get('ATTENDANCE_HOT_YEARS', DEFAULT_HOT_YEARS)
+    return max(MIN_HOT_YEARS, int(requested))
+
+
+def attendance_horizon(today=None, years=None):
+    """First day of the hot years; attendance before it may be archived"""
+    today = today or date.today()
+    return date(today.year - hot_years(years) + 1, 1, 1)
+
+
+def archive_table(year):
+    """The archive Table for year: attendance's columns and indexes, without foreign keys"""
+    name = f'{ARCHIVE_PREFIX}{year}'
+    with _tables_lock:
+        table = _archive_metadata.tables.get(name)
+        if table is None:
+            table = Table(
+                name, _archive_metadata,
+                *[Column(column.name, column.type, primary_key=column.primary_key,
+                         nullable=column.nullable, autoincrement=False)
+                  for column in _attendance.columns],
+                Index(f'uq_{name}_employee_date', 'employee_id', 'date', unique=True),
+                Index(f'ix_{name}_date_status', 'date', 'status'),
+            )
+    return table
+
+
+def archived_years(first_year=None, last_year=None):
+    """Registered archive years between first_year and last_year inclusive, oldest first"""
+    query = select(AttendanceArchive.year).order_by(AttendanceArchive.year)
+    if first_year is not None:
+        query = query.where(AttendanceArchive.year >= first_year)
+    if last_year is not None:
+        query = query.where(AttendanceArchive.year <= last_year)
+    return db.session.execute(query).scalars().all()
+
+
+def archived_days(days, connection=None):
+    """The days among days that fall in registered archive years"""
+    never_archived = attendance_horizon(years=MIN_HOT_YEARS)
+    years = {day.year for day in days if day < never_archived}
+    if not years:
+        return set()
+    executor = db.session if connection is None else connection
+    archived = set(executor.execute(select(_archives.c.year).where(_archives.c.year.in_(sorted(years)))).scalars())
+    return {day for day in days if day.year in archived}
+
+
+def check_attendance_writable(days, connection=None):
+    """Raise ValueError if any of days is in an archived, read-only year"""
+    archived = archived_days(days, connection)
+    if archived:
+        first = min(archived)
+        raise ValueError(f"Attendance for {first.year} is archived and read-only ({first.isoformat()})")
+
+
+def _rows_between(table, start_date, end_date):
+    query = select(*table.c)
+    if start_date is not None:
+        query = query.where(table.c.date >= start_date)
+    if end_date is not None:
+        query = query.where(table.c.date <= end_date)
+    return query
+
+
+def attendance_entity(start_date=None, end_date=None):
+    """
+    What to query for attendance between start_date and end_date (either
+    open-ended when None): Attendance, or Attendance aliased onto hot and
+    archived rows when registered archive years fall inside the range. Use
+    its columns like Attendance's; it is for reads.
+    """
+    if start_date is not None and start_date >= attendance_horizon(years=MIN_HOT_YEARS):
+        return Attendance
+    years = archived_years(start_date.year if start_date else None, end_date.year if end_date else None)
+    if not years:
+        return Attendance
+    history = union_all(
+        _rows_between(_attendance, start_date, end_date),
+        *[_rows_between(archive_table(year), start_date, end_date) for year in years]
+    ).subquery('attendance_history')
+    return aliased(Attendance, history, name='attendance_history')
+
+
+@event.listens_for(db.session, 'before_flush')
+def _refuse_archived_writes(session, flush_context, instances):
+    """New or changed attendance dated in an archived year is refused"""
+    days = {obj.date for obj in list(session.new) + list(session.dirty)
+            if isinstance(obj, Attendance) and obj.date is not None}
+    if days:
+        with session.no_autoflush:
+            check_attendance_writable(days)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _drop_archived_attendance(session, flush_context, instances):
+    """Deleting an employee deletes their archived attendance too, as it does their hot rows"""
+    removed = sorted(obj.id for obj in session.deleted if isinstance(obj, Employee))
+    if not removed:
+        return
+    for year in session.execute(select(AttendanceArchive.year)).scalars():
+        session.execute(delete(archive_table(year)).where(archive_table(year).c.employee_id.in_(removed)))
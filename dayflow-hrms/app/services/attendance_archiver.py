@@ -0,0 +1,147 @@
+"""
+Online attendance archival
+Moves each year before the hot horizon from attendance into its archive
+table (see attendance_archive). The year's table is created and
+registered first, so readers union it in from the start and writes dated
+in it are refused. Rows then move batch_size at a time, oldest ids first.
+Each chunk is its own short transaction: it selects the chunk's ids,
+copies those rows into the archive and deletes exactly those ids. A day
+written hot after its year was archived (before writes were refused, or
+racing the registration) replaces the archived copy, whose count is taken
+back out of the daily summary. Check-ins queue behind at most one chunk;
+busy databases are retried as punches are, and pause spaces chunks out
+further. The daily summary and the attendance bitmaps otherwise describe
+archived days as before, so they are left alone. Archived rows keep their
+ids, so on SQLite the attendance table must be AUTOINCREMENT (see
+migrate_attendance_ids.py) or freed ids would be handed out again.
+"""
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from sqlalchemy import select, insert, delete, update, func, exists, text
+from app.services.attendance_archive import archive_table, attendance_horizon
+from app.services.attendance_summary import apply_summary_deltas
+from app.services.punches import run_write
+from app.models import db, Employee, Attendance, AttendanceArchive
+
+ARCHIVE_BATCH_SIZE = 2000
+
+_attendance = Attendance.__table__
+_archives = AttendanceArchive.__table__
+_employees = Employee.__table__
+
+
+class ArchiveResult:
+    """Outcome of an archival run: rows moved per year plus seconds spent"""
+
+    def __init__(self, horizon):
+        self.horizon = horizon
+        self.moved = defaultdict(int)
+        self.chunks = 0
+        self.timings = defaultdict(float)
+
+    @property
+    def elapsed(self):
+        return sum(self.timings.values())
+
+    def summary(self):
+        if not self.moved:
+            return f"nothing to archive before {self.horizon.isoformat()}"
+        years = ', '.join(f"{year}: {rows}" for year, rows in sorted(self.moved.items()))
+        return (f"archived {sum(self.moved.values())} attendance rows before {self.horizon.isoformat()} "
+                f"({years}) in {self.chunks} chunks, {self.elapsed:.2f}s")
+
+
+def _register(connection, year):
+    """Create year's archive table and register it (idempotent)"""
+    table = archive_table(year)
+    table.create(bind=connection, checkfirst=True)
+    registered = connection.execute(select(_archives.c.id).where(_archives.c.year == year)).first()
+    if registered is None:
+        connection.execute(insert(_archives).values(year=year, table_name=table.name, row_count=0,
+                                                    created_at=datetime.utcnow()))
+    return table
+
+
+def _check_ids_not_reused(connection):
+    """Refuse to archive from a SQLite attendance table that hands freed ids out again"""
+    if connection.dialect.name != 'sqlite':
+        return
+    schema = connection.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"
+    ), {'name': _attendance.name}).scalar()
+    if 'AUTOINCREMENT' not in (schema or '').upper():
+        raise RuntimeError("attendance ids are reused after deletes; run migrate_attendance_ids.py first")
+
+
+def _move_chunk(connection, year, table, batch_size):
+    """Move the year's batch_size oldest attendance rows into table; returns rows moved"""
+    ids = connection.execute(
+        select(_attendance.c.id)
+        .where(_attendance.c.date >= date(year, 1, 1), _attendance.c.date <= date(year, 12, 31))
+        .order_by(_attendance.c.id).limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        return 0
+    chunk = _attendance.c.id.in_(ids)
+
+    # Hot rows win over archived copies of the same day, which leave the summary
+    same_day = (_attendance.c.employee_id == table.c.employee_id, _attendance.c.date == table.c.date)
+    replaced = connection.execute(
+        select(table.c.date, func.coalesce(_employees.c.department, ''), table.c.status)
+        .join(_employees, _employees.c.id == table.c.employee_id)
+        .where(exists().where(chunk, *same_day))
+    ).all()
+    if replaced:
+        deltas = defaultdict(int)
+        for key in replaced:
+            deltas[tuple(key)] -= 1
+        apply_summary_deltas(connection, deltas)
+        connection.execute(delete(table).where(exists().where(chunk, *same_day)))
+
+    names = [column.name for column in _attendance.columns]
+    copied = connection.execute(insert(table).from_select(names, select(*_attendance.c).where(chunk))).rowcount
+    deleted = connection.execute(delete(_attendance).where(chunk)).rowcount
+    if not copied == deleted == len(ids):
+        raise RuntimeError(f"Archiving {year} selected {len(ids)} rows, copied {copied} and removed {deleted}")
+    connection.execute(update(_archives).where(_archives.c.year == year)
+                       .values(row_count=_archives.c.row_count + len(ids) - len(replaced)))
+    return len(ids)
+
+
+def archive_attendance(hot_years=None, batch_size=ARCHIVE_BATCH_SIZE, pause=0.0, progress=None):
+    """
+    Archive every year before the hot horizon (ATTENDANCE_HOT_YEARS unless
+    hot_years is given), sleeping pause seconds between chunks and calling
+    progress(year, rows moved so far). Returns an ArchiveResult. Raises
+    ValueError if hot_years keeps fewer years hot than ATTENDANCE_HOT_YEARS.
+    """
+    horizon = attendance_horizon(years=hot_years)
+    if horizon > attendance_horizon():
+        raise ValueError(f"Refusing to archive {horizon.year - 1}: ATTENDANCE_HOT_YEARS keeps it hot")
+    result = ArchiveResult(horizon)
+
+    started = time.perf_counter()
+    oldest = db.session.scalar(select(func.min(Attendance.date)).where(Attendance.date < horizon))
+    db.session.commit()
+    if oldest is None:
+        return result
+
+    run_write(_check_ids_not_reused)
+    for year in range(oldest.year, horizon.year):
+        table = run_write(lambda connection: _register(connection, year))
+        while True:
+            moved = run_write(lambda connection: _move_chunk(connection, year, table, batch_size))
+            if not moved:
+                break
+            result.moved[year] += moved
+            result.chunks += 1
+            if progress:
+                progress(year, result.moved[year])
+            if pause:
+                time.sleep(pause)
+        run_write(lambda connection: connection.execute(
+            update(_archives).where(_archives.c.year == year).values(completed_at=datetime.utcnow())
+        ))
+    result.timings['archive'] = time.perf_counter() - started
+    return result
@@ -0,0 +1,248 @@
+"""
+Attendance bitmaps
+Each employee's attendance for a calendar year is packed into one
+attendance_bitmaps row: 2-bit status codes, four days to a byte (92 bytes
+for 366 days), and a 46-byte bitset of the days that have an attendance
+row at all, which tells absent days from unrecorded ones. Year calendars
+and department month heatmaps decode a few of these blobs instead of
+loading hundreds of attendance rows. ORM writes are folded in by a
+before_flush listener in the same transaction; Core writes that bypass it
+call patch_attendance_bitmaps or sync_attendance_bitmaps themselves.
+"""
+import calendar
+from collections import defaultdict
+from datetime import date, datetime
+from sqlalchemy import event, select, delete, insert
+from app.services.attendance_archive import attendance_entity
+from app.services.tracking import loaded_value, upsert_insert
+from app.models import db, Employee, Attendance, AttendanceBitmap
+
+STATUS_BYTES = 92
+RECORDED_BYTES = 46
+
+# Code i is stored for CODE_STATUSES[i] and shown as DAY_CHARS[i]
+CODE_STATUSES = ('absent', 'present', 'half_day', 'leave')
+STATUS_CODES = {status: code for code, status in enumerate(CODE_STATUSES)}
+DAY_CHARS = 'APHL'
+UNRECORDED = '.'
+LEGEND = {**dict(zip(DAY_CHARS, CODE_STATUSES)), UNRECORDED: 'unrecorded'}
+
+_bitmaps = AttendanceBitmap.__table__
+
+# Four days' characters for every (recorded nibble << 8 | status byte)
+_DAY_QUADS = [
+    ''.join(DAY_CHARS[(key >> (2 * day)) & 3] if (key >> (8 + day)) & 1 else UNRECORDED
+            for day in range(4))
+    for key in range(4096)
+]
+
+
+def _empty():
+    return bytearray(STATUS_BYTES), bytearray(RECORDED_BYTES)
+
+
+def decode_days(statuses, recorded, first=0, count=STATUS_BYTES * 4):
+    """
+    One character per day (see LEGEND) for count days from day of year
+    index first, from a row's packed arrays
+    """
+    start = first >> 2
+    days = ''.join(
+        _DAY_QUADS[statuses[quad] | ((recorded[quad >> 1] >> ((quad & 1) << 2)) & 15) << 8]
+        for quad in range(start, min(STATUS_BYTES, (first + count + 3) >> 2))
+    )
+    offset = first - (start << 2)
+    return days[offset:offset + count]
+
+
+def set_day(statuses, recorded, index, status):
+    """Store status (None when the day has no row) for day of year index, in place"""
+    code = STATUS_CODES.get(status)
+    byte, shift = index >> 2, (index & 3) << 1
+    statuses[byte] &= ~(3 << shift) & 0xFF
+    if code is None:
+        recorded[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+    else:
+        statuses[byte] |= code << shift
+        recorded[index >> 3] |= 1 << (index & 7)
+
+
+def _day_index(day):
+    return day.timetuple().tm_yday - 1
+
+
+def _upsert(connection):
+    statement = upsert_insert(connection, _bitmaps)
+    return statement.on_conflict_do_update(
+        index_elements=['employee_id', 'year'],
+        set_={'statuses': statement.excluded.statuses, 'recorded': statement.excluded.recorded,
+              'updated_at': statement.excluded.updated_at}
+    )
+
+
+def patch_attendance_bitmaps(connection, days):
+    """
+    Write {(employee_id, date): status or None} into the bitmaps, None for
+    days whose attendance row is gone. Reads and rewrites each affected
+    employee-year once.
+    """
+    changes = defaultdict(dict)
+    for (employee_id, day), status in days.items():
+        changes[(employee_id, day.year)][_day_index(day)] = status
+    if not changes:
+        return
+
+    rows = connection.execute(
+        select(_bitmaps.c.employee_id, _bitmaps.c.year, _bitmaps.c.statuses, _bitmaps.c.recorded).where(
+            _bitmaps.c.employee_id.in_(sorted({employee_id for employee_id, _ in changes})),
+            _bitmaps.c.year.in_(sorted({year for _, year in changes}))
+        ).with_for_update()
+    ).all()
+    packed = {(row.employee_id, row.year): (bytearray(row.statuses), bytearray(row.recorded)) for row in rows}
+
+    now = datetime.utcnow()
+    values = []
+    for key, day_statuses in changes.items():
+        statuses, recorded = packed.get(key) or _empty()
+        for index, status in day_statuses.items():
+            set_day(statuses, recorded, index, status)
+        values.append(dict(employee_id=key[0], year=key[1], statuses=bytes(statuses),
+                           recorded=bytes(recorded), updated_at=now))
+    connection.execute(_upsert(connection), values)
+
+
+def sync_attendance_bitmaps(connection, keys):
+    """Copy the recorded status of each (employee_id, date) in keys into the bitmaps"""
+    keys = set(keys)
+    if not keys:
+        return
+    days = dict.fromkeys(keys)
+    rows = connection.execute(
+        select(Attendance.employee_id, Attendance.date, Attendance.status).where(
+            Attendance.employee_id.in_(sorted({employee_id for employee_id, _ in keys})),
+            Attendance.date.in_(sorted({day for _, day in keys}))
+        )
+    ).all()
+    for employee_id, day, status in rows:
+        if (employee_id, day) in days:
+            days[(employee_id, day)] = status
+    patch_attendance_bitmaps(connection, days)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _maintain_attendance_bitmaps(session, flush_context, instances):
+    """Fold attendance inserts/updates/deletes into the bitmaps in the same transaction"""
+    days = {}
+    removed_employees = set()
+    with session.no_autoflush:
+        for obj in session.deleted:
+            if isinstance(obj, Employee):
+                removed_employees.add(obj.id)
+            elif isinstance(obj, Attendance):
+                days[(loaded_value(obj, 'employee_id'), loaded_value(obj, 'date'))] = None
+
+        for obj in session.dirty:
+            if not isinstance(obj, Attendance) or not session.is_modified(obj):
+                continue
+            old_key = (loaded_value(obj, 'employee_id'), loaded_value(obj, 'date'))
+            new_key = (obj.employee_id, obj.date)
+            if old_key != new_key:
+                days[old_key] = None
+            elif obj.status == loaded_value(obj, 'status'):
+                continue
+            days[new_key] = obj.status
+
+        for obj in session.new:
+            if isinstance(obj, Attendance):
+                # Column defaults are only applied at INSERT time
+                days[(obj.employee_id, obj.date or date.today())] = obj.status or 'absent'
+
+    if removed_employees:
+        session.execute(delete(_bitmaps).where(_bitmaps.c.employee_id.in_(sorted(removed_employees))))
+    days = {key: status for key, status in days.items()
+            if key[0] is not None and key[1] is not None and key[0] not in removed_employees}
+    if days:
+        patch_attendance_bitmaps(session.connection(), days)
+
+
+def rebuild_attendance_bitmaps(year=None):
+    """
+    Recompute the bitmaps from attendance, archived years included, for
+    one year (every year when none is given). Caller commits.
+    Returns the number of bitmap rows written.
+    """
+    clear = delete(_bitmaps)
+    first, last = (date(year, 1, 1), date(year, 12, 31)) if year is not None else (None, None)
+    attendance = attendance_entity(first, last)
+    rows = select(attendance.employee_id, attendance.date, attendance.status)
+    if year is not None:
+        clear = clear.where(_bitmaps.c.year == year)
+        rows = rows.where(attendance.date >= first, attendance.date <= last)
+    db.session.execute(clear)
+
+    packed = {}
+    for employee_id, day, status in db.session.execute(rows.execution_options(yield_per=10000)):
+        key = (employee_id, day.year)
+        if key not in packed:
+            packed[key] = _empty()
+        set_day(*packed[key], _day_index(day), status)
+
+    now = datetime.utcnow()
+    values = [dict(employee_id=employee_id, year=key_year, statuses=bytes(statuses),
+                   recorded=bytes(recorded), updated_at=now)
+              for (employee_id, key_year), (statuses, recorded) in packed.items()]
+    if values:
+        db.session.execute(insert(_bitmaps), values)
+    return len(values)
+
+
+def year_calendar(employee_id, year):
+    """
+    One employee's year: {'days': one character per day from 1 January
+    (see LEGEND), 'totals': days per status}
+    """
+    row = db.session.execute(
+        select(_bitmaps.c.statuses, _bitmaps.c.recorded)
+        .where(_bitmaps.c.employee_id == employee_id, _bitmaps.c.year == year)
+    ).first()
+    length = 366 if calendar.isleap(year) else 365
+    days = decode_days(*row, count=length) if row else UNRECORDED * length
+    return {
+        'employee_id': employee_id,
+        'year': year,
+        'start': date(year, 1, 1).isoformat(),
+        'days': days,
+        'totals': {status: days.count(char) for char, status in zip(DAY_CHARS, CODE_STATUSES)},
+        'legend': LEGEND,
+    }
+
+
+def department_month(department, year, month):
+    """
+    A department's month: one day string per employee plus, per status,
+    how many employees had it on each day of the month
+    """
+    first = _day_index(date(year, month, 1))
+    length = calendar.monthrange(year, month)[1]
+    rows = db.session.execute(
+        select(Employee.id, Employee.first_name, Employee.last_name, _bitmaps.c.statuses, _bitmaps.c.recorded)
+        .outerjoin(_bitmaps, (_bitmaps.c.employee_id == Employee.id) & (_bitmaps.c.year == year))
+        .where(Employee.department == department)
+        .order_by(Employee.first_name, Employee.last_name, Employee.id)
+    ).all()
+
+    employees = []
+    for row in rows:
+        days = (decode_days(row.statuses, row.recorded, first, length)
+                if row.statuses is not None else UNRECORDED * length)
+        employees.append({'id': row.id, 'name': f'{row.first_name} {row.last_name}', 'days': days})
+    columns = list(zip(*(employee['days'] for employee in employees))) or [()] * length
+    return {
+        'department': department,
+        'month': f'{year:04d}-{month:02d}',
+        'start': date(year, month, 1).isoformat(),
+        'employees': employees,
+        'totals': {status: [column.count(char) for column in columns]
+                   for char, status in zip(DAY_CHARS, CODE_STATUSES)},
+        'legend': LEGEND,
+    }
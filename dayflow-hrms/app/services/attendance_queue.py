@@ -0,0 +1,283 @@
+"""
+Write-behind attendance queue
+With ATTENDANCE_WRITE_MODE = 'buffered', check-ins and check-outs are
+appended to a local append-only event log and acknowledged at once. A
+background flusher applies them to attendance in batched transactions
+every ATTENDANCE_FLUSH_INTERVAL_MS milliseconds, or as soon as
+ATTENDANCE_FLUSH_BATCH events are waiting, coalescing repeats per employee
+and day. Applying an event twice is harmless, so events still in the log
+after a crash are replayed when the queue starts. An employee's pending
+events are flushed before their own pages read attendance, so they always
+see their punches. The queue lives in one process: run buffered mode with
+a single application process.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, time as clock
+from flask import current_app
+from sqlalchemy import select
+from app.services.punches import Punch, apply_punches, hours_worked, run_write
+from app.services.snapshot import invalidate_employee_snapshot
+from app.models import db, Attendance
+
+DEFAULT_FLUSH_INTERVAL_MS = 200
+DEFAULT_FLUSH_BATCH = 500
+LOG_FILENAME = 'attendance-events.log'
+
+logger = logging.getLogger(__name__)
+
+_queues_lock = threading.Lock()
+
+
+def _encode(punch):
+    return json.dumps({'employee_id': punch.employee_id, 'department': punch.department,
+                       'date': punch.date.isoformat(), 'kind': punch.kind,
+                       'time': punch.time.isoformat()}) + '\n'
+
+
+def _decode(line):
+    event = json.loads(line)
+    return Punch(event['employee_id'], event['department'], date.fromisoformat(event['date']),
+                 event['kind'], clock.fromisoformat(event['time']))
+
+
+class AttendanceQueue:
+    """Pending punches for one application, their log and the flusher thread"""
+
+    def __init__(self, app, log_path, interval, batch_size, fsync=True):
+        self.app = app
+        self.log_path = log_path
+        self.interval = interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.pending = []  # (monotonic enqueue time, Punch), oldest first
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.flush_lock = threading.Lock()
+        self.thread = None
+        self.stopping = False
+
+        self.enqueued = 0
+        self.applied = 0
+        self.flushes = 0
+        self.failures = 0
+        self.replayed = 0
+        self.last_batch = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        self._replay()
+        self.log = open(log_path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        """Queue events left in the log by a previous process"""
+        if not os.path.exists(self.log_path):
+            return
+        now = time.monotonic()
+        with open(self.log_path, encoding='utf-8') as log:
+            for line in log:
+                try:
+                    self.pending.append((now, _decode(line)))
+                except (ValueError, KeyError):
+                    # A torn final line from a crash mid-append
+                    continue
+        self.replayed = len(self.pending)
+
+    def append(self, punch):
+        """Durably log a punch and queue it for the flusher"""
+        line = _encode(punch)
+        with self.lock:
+            self.log.write(line)
+            self.log.flush()
+            if self.fsync:
+                os.fsync(self.log.fileno())
+            self.pending.append((time.monotonic(), punch))
+            self.enqueued += 1
+            if len(self.pending) >= self.batch_size:
+                self.ready.notify()
+        self.start()
+
+    def pending_punches(self, employee_id, day):
+        """This employee's queued punches for day"""
+        with self.lock:
+            return [punch for _, punch in self.pending
+                    if punch.employee_id == employee_id and punch.date == day]
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.stopping or (self.thread is not None and self.thread.is_alive()):
+                    return
+                self.thread = threading.Thread(target=self._run, name='attendance-flusher', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            with self.lock:
+                if not self.stopping and len(self.pending) < self.batch_size:
+                    self.ready.wait(self.interval)
+                stopping = self.stopping
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Attendance flush failed; events stay queued')
+                time.sleep(self.interval)
+            if stopping:
+                return
+
+    def flush(self):
+        """Apply every queued punch in one transaction; returns how many were applied"""
+        with self.flush_lock:
+            with self.lock:
+                batch = [punch for _, punch in self.pending]
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            with self.app.app_context():
+                try:
+                    employee_ids = run_write(lambda connection: apply_punches(connection, batch))
+                except Exception:
+                    self.failures += 1
+                    raise
+                finally:
+                    db.session.remove()
+                invalidate_employee_snapshot(*employee_ids)
+            elapsed = (time.perf_counter() - started) * 1000
+
+            with self.lock:
+                del self.pending[:len(batch)]
+                if not self.pending:
+                    # Everything logged is now in the database
+                    self.log.seek(0)
+                    self.log.truncate()
+                self.applied += len(batch)
+                self.flushes += 1
+                self.last_batch = len(batch)
+                self.last_flush_ms = elapsed
+                self.max_flush_ms = max(self.max_flush_ms, elapsed)
+                self.total_flush_ms += elapsed
+            return len(batch)
+
+    def settle(self, employee_id):
+        """Flush now if this employee has punches waiting, so their next read sees them"""
+        with self.lock:
+            waiting = any(punch.employee_id == employee_id for _, punch in self.pending)
+        if waiting:
+            self.flush()
+
+    def metrics(self):
+        with self.lock:
+            depth = len(self.pending)
+            oldest = self.pending[0][0] if self.pending else None
+        return {
+            'mode': 'buffered',
+            'depth': depth,
+            'oldest_pending_ms': round((time.monotonic() - oldest) * 1000, 1) if oldest is not None else 0.0,
+            'enqueued': self.enqueued,
+            'applied': self.applied,
+            'replayed': self.replayed,
+            'flushes': self.flushes,
+            'failures': self.failures,
+            'last_batch': self.last_batch,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2),
+            'avg_flush_ms': round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+        }
+
+    def close(self):
+        """Stop the flusher after a final flush"""
+        with self.lock:
+            self.stopping = True
+            self.ready.notify()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+        self.log.close()
+
+
+def buffered_attendance():
+    """Whether punches go through the write-behind queue"""
+    return current_app.config.get('ATTENDANCE_WRITE_MODE', 'direct') == 'buffered'
+
+
+def attendance_queue():
+    """The current application's queue, created (and its log replayed) on first use"""
+    app = current_app._get_current_object()
+    with _queues_lock:
+        queue = app.extensions.get('attendance_queue')
+        if queue is None:
+            log_path = (app.config.get('ATTENDANCE_EVENT_LOG')
+                        or os.path.join(app.instance_path, LOG_FILENAME))
+            queue = AttendanceQueue(
+                app, log_path,
+                interval=app.config.get('ATTENDANCE_FLUSH_INTERVAL_MS', DEFAULT_FLUSH_INTERVAL_MS) / 1000,
+                batch_size=app.config.get('ATTENDANCE_FLUSH_BATCH', DEFAULT_FLUSH_BATCH),
+                fsync=app.config.get('ATTENDANCE_LOG_FSYNC', True)
+            )
+            app.extensions['attendance_queue'] = queue
+            atexit.register(queue.close)
+            if queue.pending:
+                queue.start()
+    return queue
+
+
+def _punch_state(employee_id, day):
+    """(check-in time, check-out time, break hours) for the day, recorded or queued"""
+    row = db.session.execute(
+        select(Attendance.check_in_time, Attendance.check_out_time, Attendance.break_time)
+        .where(Attendance.employee_id == employee_id, Attendance.date == day)
+    ).first()
+    check_in, check_out, break_time = row if row else (None, None, 0.0)
+    for punch in attendance_queue().pending_punches(employee_id, day):
+        if punch.kind == 'in' and check_in is None:
+            check_in = punch.time
+        elif punch.kind == 'out' and check_out is None:
+            check_out = punch.time
+    return check_in, check_out, break_time
+
+
+def queue_punch_in(employee_id, department, day, at):
+    """Buffered punch_in: False when a check-in is already recorded or queued"""
+    check_in, _, _ = _punch_state(employee_id, day)
+    if check_in is not None:
+        return False
+    attendance_queue().append(Punch(employee_id, department, day, 'in', at))
+    return True
+
+
+def queue_punch_out(employee_id, day, at):
+    """Buffered punch_out: the hours worked, or None without an open check-in"""
+    check_in, check_out, break_time = _punch_state(employee_id, day)
+    if check_in is None or check_out is not None:
+        return None
+    attendance_queue().append(Punch(employee_id, None, day, 'out', at))
+    return hours_worked(check_in, at, break_time)
+
+
+def punched_in(employee_id, day):
+    """Whether the employee has a check-in for day, counting queued punches"""
+    if buffered_attendance():
+        return _punch_state(employee_id, day)[0] is not None
+    return db.session.scalar(
+        select(Attendance.check_in_time)
+        .where(Attendance.employee_id == employee_id, Attendance.date == day)
+    ) is not None
+
+
+def settle_attendance(employee_id):
+    """Apply the employee's queued punches before one of their pages reads attendance"""
+    if buffered_attendance() and 'attendance_queue' in current_app.extensions:
+        attendance_queue().settle(employee_id)
+
+
+def attendance_queue_metrics():
+    """Queue depth, throughput and flush latency for the current write mode"""
+    if buffered_attendance():
+        return attendance_queue().metrics()
+    return {'mode': 'direct', 'depth': 0}
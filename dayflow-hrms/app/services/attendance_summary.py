@@ -0,0 +1,206 @@
+"""
+Daily attendance summary service
+Keeps daily_attendance_summary in step with attendance writes and serves
+per-day statistics from it
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from sqlalchemy import event, func, insert, select, delete
+from app.services.attendance_archive import attendance_entity
+from app.services.tracking import loaded_value, upsert_insert
+from app.models import db, Employee, Attendance, DailyAttendanceSummary
+
+ATTENDANCE_STATUSES = ('present', 'absent', 'half_day', 'leave')
+
+
+def _department_of(session, employee_id, cache):
+    """Department key for an employee ('' when unassigned)"""
+    if employee_id not in cache:
+        employee = session.get(Employee, employee_id)
+        cache[employee_id] = (employee.department or '') if employee else ''
+    return cache[employee_id]
+
+
+def collect_attendance_deltas(session):
+    """
+    Work out summary count changes implied by pending Attendance writes.
+    Returns {(date, department, status): delta}.
+    """
+    deltas = defaultdict(int)
+    departments = {}
+
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Attendance):
+                dept = _department_of(session, obj.employee_id, departments)
+                # Column defaults are only applied at INSERT time
+                deltas[(obj.date or date.today(), dept, obj.status or 'absent')] += 1
+
+        for obj in session.dirty:
+            if not isinstance(obj, Attendance) or not session.is_modified(obj):
+                continue
+            old_key = (
+                loaded_value(obj, 'date'),
+                _department_of(session, loaded_value(obj, 'employee_id'), departments),
+                loaded_value(obj, 'status')
+            )
+            new_key = (obj.date, _department_of(session, obj.employee_id, departments), obj.status)
+            if old_key != new_key:
+                deltas[old_key] -= 1
+                deltas[new_key] += 1
+
+        for obj in session.deleted:
+            if isinstance(obj, Attendance):
+                key = (
+                    loaded_value(obj, 'date'),
+                    _department_of(session, loaded_value(obj, 'employee_id'), departments),
+                    loaded_value(obj, 'status')
+                )
+                deltas[key] -= 1
+
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def collect_department_moves(session):
+    """
+    Summary count changes for employees whose department is changing: every
+    day they already have, archived ones included, moves from the old
+    department's cells to the new one's. Pending attendance writes of the
+    same flush are keyed by the new department (see collect_attendance_deltas).
+    Returns {(date, department, status): delta}.
+    """
+    deltas = defaultdict(int)
+    with session.no_autoflush:
+        for obj in session.dirty:
+            if not isinstance(obj, Employee) or obj.id is None:
+                continue
+            old_department = loaded_value(obj, 'department') or ''
+            new_department = obj.department or ''
+            if old_department == new_department:
+                continue
+            attendance = attendance_entity()
+            days = session.execute(
+                select(attendance.date, attendance.status, func.count(attendance.id))
+                .where(attendance.employee_id == obj.id)
+                .group_by(attendance.date, attendance.status)
+            )
+            for day, status, count in days:
+                deltas[(day, old_department, status)] -= count
+                deltas[(day, new_department, status)] += count
+
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def apply_summary_deltas(connection, deltas):
+    """Add deltas to the summary rows in one upsert, creating rows that do not exist yet"""
+    table = DailyAttendanceSummary.__table__
+    statement = upsert_insert(connection, table)
+    statement = statement.on_conflict_do_update(
+        index_elements=['date', 'department', 'status'],
+        set_={'headcount': table.c.headcount + statement.excluded.headcount,
+              'updated_at': statement.excluded.updated_at}
+    )
+    now = datetime.utcnow()
+    connection.execute(statement, [
+        dict(date=day, department=department, status=status, headcount=delta, updated_at=now)
+        for (day, department, status), delta in deltas.items()
+    ])
+
+
+def refresh_daily_summary_cell(connection, day, department):
+    """
+    Recount one day and department of the rollup from attendance.
+    Core writes that cannot tell which status a row had before call this.
+    """
+    refresh_daily_summary_range(connection, day, day, department)
+
+
+def refresh_daily_summary_range(connection, start_date, end_date, department):
+    """Recount one department's rollup rows from start_date to end_date inclusive"""
+    table = DailyAttendanceSummary.__table__
+    department = department or ''
+    connection.execute(delete(table).where(
+        table.c.date >= start_date, table.c.date <= end_date, table.c.department == department
+    ))
+    grouped = select(
+        Attendance.date,
+        func.coalesce(Employee.department, ''),
+        Attendance.status,
+        func.count(Attendance.id),
+        func.current_timestamp()
+    ).join(Employee, Employee.id == Attendance.employee_id).where(
+        Attendance.date >= start_date,
+        Attendance.date <= end_date,
+        func.coalesce(Employee.department, '') == department
+    ).group_by(Attendance.date, Attendance.status)
+    connection.execute(insert(table).from_select(
+        ['date', 'department', 'status', 'headcount', 'updated_at'], grouped
+    ))
+
+
+@event.listens_for(db.session, 'before_flush')
+def _maintain_daily_summary(session, flush_context, instances):
+    """Fold attendance writes and department changes into the rollup in the same transaction"""
+    deltas = defaultdict(int, collect_attendance_deltas(session))
+    for key, delta in collect_department_moves(session).items():
+        deltas[key] += delta
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if deltas:
+        apply_summary_deltas(session.connection(), deltas)
+
+
+def rebuild_daily_attendance_summary(start_date=None, end_date=None):
+    """
+    Recompute the rollup from the attendance table for a date range
+    (whole table when no range is given). Caller commits.
+    Returns the number of summary rows written.
+    """
+    table = DailyAttendanceSummary.__table__
+
+    clear = delete(table)
+    if start_date:
+        clear = clear.where(table.c.date >= start_date)
+    if end_date:
+        clear = clear.where(table.c.date <= end_date)
+    db.session.execute(clear)
+
+    # Archived days are counted too, so a rebuild keeps their history
+    attendance = attendance_entity(start_date, end_date)
+    department = func.coalesce(Employee.department, '')
+    grouped = select(
+        attendance.date,
+        department,
+        attendance.status,
+        func.count(attendance.id),
+        func.current_timestamp()
+    ).join(Employee, Employee.id == attendance.employee_id)
+    if start_date:
+        grouped = grouped.where(attendance.date >= start_date)
+    if end_date:
+        grouped = grouped.where(attendance.date <= end_date)
+    grouped = grouped.group_by(attendance.date, department, attendance.status)
+
+    result = db.session.execute(
+        insert(table).from_select(
+            ['date', 'department', 'status', 'headcount', 'updated_at'], grouped
+        )
+    )
+    return result.rowcount
+
+
+def attendance_stats_for_day(day, department=None):
+    """
+    Per-status attendance counts for a day read from the rollup.
+    Returns a dict with one entry per attendance status.
+    """
+    query = db.session.query(
+        DailyAttendanceSummary.status,
+        func.sum(DailyAttendanceSummary.headcount)
+    ).filter(DailyAttendanceSummary.date == day)
+    if department is not None:
+        query = query.filter(DailyAttendanceSummary.department == department)
+
+    stats = dict.fromkeys(ATTENDANCE_STATUSES, 0)
+    for status, headcount in query.group_by(DailyAttendanceSummary.status):
+        stats[status] = int(headcount or 0)
+    return stats
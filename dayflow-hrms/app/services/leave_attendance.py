@@ -0,0 +1,85 @@
+"""
+Leave attendance materialization
+Approving leave marks the employee's attendance as leave for every day the
+leave policy counts, in one bulk upsert on the (employee_id, date) unique
+index rather than a lookup and a write per day. The day series is built in
+memory: with LEAVE_ATTENDANCE_DAYS = 'working' (the default) days past the
+employee's working days per week and dates listed in HOLIDAYS are skipped;
+'calendar' marks every day of the range. The daily summary is recounted
+for the range, the attendance bitmaps are patched and the attendance
+payroll inputs are marked stale in the same transaction. Leave reaching
+into an archived year is refused, as archived attendance is read-only.
+"""
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import select
+from app.services.attendance_archive import check_attendance_writable
+from app.services.attendance_bitmaps import patch_attendance_bitmaps
+from app.services.attendance_summary import refresh_daily_summary_range
+from app.services.payroll_recompute import mark_payroll_stale
+from app.services.punches import attendance_insert
+from app.models import db, Employee
+
+LEAVE_DAY_POLICIES = ('working', 'calendar')
+
+
+def holidays():
+    """Dates in HOLIDAYS, given as dates or ISO strings"""
+    return {day if isinstance(day, date) else date.fromisoformat(day)
+            for day in current_app.config.get('HOLIDAYS') or ()}
+
+
+def leave_attendance_days(start, end, days_per_week=5, policy='working', skip=()):
+    """Days from start to end that leave marks under policy, skipping the dates in skip"""
+    if policy not in LEAVE_DAY_POLICIES:
+        raise ValueError(f"Unknown leave day policy '{policy}' (use {', '.join(LEAVE_DAY_POLICIES)})")
+    days = []
+    current = start
+    while current <= end:
+        if policy == 'calendar' or (current.weekday() < days_per_week and current not in skip):
+            days.append(current)
+        current += timedelta(days=1)
+    return days
+
+
+def _leave_upsert(connection):
+    """Upsert marking a day as leave, whatever was recorded for it before"""
+    statement = attendance_insert(connection)
+    return statement.on_conflict_do_update(
+        index_elements=['employee_id', 'date'],
+        set_={'status': statement.excluded.status, 'remarks': statement.excluded.remarks,
+              'updated_at': statement.excluded.updated_at}
+    )
+
+
+def apply_leave_to_attendance(leave_request):
+    """
+    Mark the approved leave_request's days as leave in attendance, in the
+    session's transaction. The caller commits along with the request's
+    status. Returns the days marked. Raises ValueError when a day falls in
+    an archived year.
+    """
+    employee = db.session.execute(
+        select(Employee.department, Employee.working_days_per_week)
+        .where(Employee.id == leave_request.employee_id)
+    ).one()
+    days = leave_attendance_days(
+        leave_request.start_date, leave_request.end_date, employee.working_days_per_week or 5,
+        current_app.config.get('LEAVE_ATTENDANCE_DAYS', 'working'), holidays()
+    )
+    if not days:
+        return days
+
+    connection = db.session.connection()
+    check_attendance_writable(days, connection)
+    now = datetime.utcnow()
+    remarks = f"Approved leave: {leave_request.leave_type}"
+    connection.execute(_leave_upsert(connection), [
+        dict(employee_id=leave_request.employee_id, date=day, status='leave', remarks=remarks,
+             break_time=0.0, hours_worked=0.0, created_at=now, updated_at=now)
+        for day in days
+    ])
+    refresh_daily_summary_range(connection, days[0], days[-1], employee.department)
+    patch_attendance_bitmaps(connection, {(leave_request.employee_id, day): 'leave' for day in days})
+    mark_payroll_stale(connection, 'attendance', {leave_request.employee_id: [(days[0], days[-1])]})
+    return days
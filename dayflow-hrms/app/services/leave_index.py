@@ -0,0 +1,110 @@
+"""
+Leave interval index
+Loads the approved leave intersecting a date window in one query and keeps
+it per employee as sorted, merged day ranges with running totals, so paid /
+unpaid leave days in a period and "on leave" checks are binary searches
+instead of a query per employee
+"""
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from sqlalchemy import select
+from app.models import db, Employee, LeaveRequest
+
+PAID, UNPAID = 0, 1
+
+
+def leave_kind(leave_type):
+    """Unpaid leave reduces pay; every other approved leave type is paid"""
+    return UNPAID if leave_type == 'unpaid' else PAID
+
+
+class DayRanges:
+    """Disjoint inclusive day ranges (date ordinals) with cumulative day counts"""
+    __slots__ = ('starts', 'ends', 'totals')
+
+    def __init__(self, ranges=()):
+        self.starts, self.ends, self.totals = [], [], [0]
+        for start, end in sorted(ranges):
+            if self.ends and start <= self.ends[-1] + 1:
+                # Overlapping or adjacent: extend the last range
+                if end > self.ends[-1]:
+                    self.totals[-1] += end - self.ends[-1]
+                    self.ends[-1] = end
+                continue
+            self.starts.append(start)
+            self.ends.append(end)
+            self.totals.append(self.totals[-1] + end - start + 1)
+
+    def days(self, start, end):
+        """Number of days covered between ordinals start and end inclusive"""
+        first = bisect_left(self.ends, start)
+        last = bisect_right(self.starts, end)
+        if first >= last:
+            return 0
+        covered = self.totals[last] - self.totals[first]
+        covered -= max(0, start - self.starts[first])
+        covered -= max(0, self.ends[last - 1] - end)
+        return covered
+
+    def __contains__(self, day):
+        i = bisect_right(self.starts, day) - 1
+        return i >= 0 and self.ends[i] >= day
+
+
+_EMPTY = DayRanges()
+
+
+class LeaveIntervalIndex:
+    """
+    Approved leave per employee, clipped to [window_start, window_end].
+    Overlapping requests of the same kind count once; days outside the
+    window are not known to the index and count as no leave.
+    """
+
+    def __init__(self, window_start, window_end, rows):
+        self.window_start = window_start
+        self.window_end = window_end
+        low, high = window_start.toordinal(), window_end.toordinal()
+
+        ranges = defaultdict(lambda: ([], []))
+        for employee_id, leave_type, start_date, end_date in rows:
+            start, end = max(start_date.toordinal(), low), min(end_date.toordinal(), high)
+            if start <= end:
+                ranges[employee_id][leave_kind(leave_type)].append((start, end))
+        self._ranges = {
+            employee_id: (DayRanges(paid), DayRanges(unpaid))
+            for employee_id, (paid, unpaid) in ranges.items()
+        }
+
+    @classmethod
+    def load(cls, window_start, window_end, *criteria, employee_ids=None):
+        """
+        Index approved leave overlapping the window with a single SELECT,
+        optionally limited to employee_ids or employees matching criteria.
+        """
+        query = select(LeaveRequest.employee_id, LeaveRequest.leave_type,
+                       LeaveRequest.start_date, LeaveRequest.end_date).where(
+            LeaveRequest.status == 'approved',
+            LeaveRequest.end_date >= window_start,
+            LeaveRequest.start_date <= window_end
+        )
+        if employee_ids is not None:
+            query = query.where(LeaveRequest.employee_id.in_(employee_ids))
+        if criteria:
+            query = query.join(Employee, Employee.id == LeaveRequest.employee_id).where(*criteria)
+        return cls(window_start, window_end, db.session.execute(query))
+
+    def leave_days(self, employee_id, period_start, period_end):
+        """(paid days, unpaid days) of approved leave within the period"""
+        paid, unpaid = self._ranges.get(employee_id, (_EMPTY, _EMPTY))
+        start, end = period_start.toordinal(), period_end.toordinal()
+        return paid.days(start, end), unpaid.days(start, end)
+
+    def on_leave(self, employee_id, day):
+        """True if the employee has approved leave of any kind on day"""
+        ordinal = day.toordinal()
+        return any(ordinal in ranges for ranges in self._ranges.get(employee_id, ()))
+
+    def employees_on_leave(self, day):
+        """Ids of every indexed employee on approved leave on day"""
+        return {employee_id for employee_id in self._ranges if self.on_leave(employee_id, day)}
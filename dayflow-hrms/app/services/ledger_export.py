@@ -0,0 +1,132 @@
+"""
+Payroll ledger export
+Streams the payroll table joined with employee and department as CSV,
+NDJSON or Parquet. Rows are read in payroll id order through a server-side
+cursor, batch_size at a time, and each batch is encoded and handed on
+before the next is fetched, so memory stays flat however long the ledger
+is. since_id resumes an export after the last payroll id already received.
+"""
+import csv
+import io
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import select
+from app.parquet import Column, ParquetWriter
+from app.services.streaming import ChunkSink
+from app.services.serializers import dumps
+from app.models import db, User, Employee, Payroll
+
+EXPORT_BATCH_SIZE = 2000
+
+# format: (mimetype, file extension)
+LEDGER_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+_AMOUNTS = ('base_monthly_salary', 'basic_salary', 'hra', 'standard_allowance', 'performance_bonus',
+            'lta', 'fixed_allowance', 'allowances', 'increment_amount', 'increment_percentage',
+            'special_bonus', 'festival_bonus', 'other_earnings', 'overtime_rate', 'pf_deduction',
+            'professional_tax', 'deductions', 'tax_deductions', 'unpaid_leave_deduction',
+            'gross_pay', 'total_deductions', 'net_pay')
+_DAYS = ('days_present', 'total_working_days', 'paid_leave_days', 'unpaid_leave_days')
+
+# (column name, SQL expression, Parquet column kind), in export order
+LEDGER_COLUMNS = (
+    ('payroll_id', Payroll.id, 'int'),
+    ('employee_id', Payroll.employee_id, 'int'),
+    ('employee_code', User.employee_id, 'string'),
+    ('first_name', Employee.first_name, 'string'),
+    ('last_name', Employee.last_name, 'string'),
+    ('department', Employee.department, 'string'),
+    ('position', Employee.position, 'string'),
+    ('pay_period_start', Payroll.pay_period_start, 'date'),
+    ('pay_period_end', Payroll.pay_period_end, 'date'),
+    *((name, getattr(Payroll, name), 'decimal') for name in _AMOUNTS),
+    ('overtime_hours', Payroll.overtime_hours, 'float'),
+    *((name, getattr(Payroll, name), 'int') for name in _DAYS),
+    ('payment_status', Payroll.payment_status, 'string'),
+    ('payment_date', Payroll.payment_date, 'date'),
+    ('created_at', Payroll.created_at, 'timestamp'),
+)
+LEDGER_FIELDS = tuple(name for name, _, _ in LEDGER_COLUMNS)
+
+
+def ledger_query(period_start=None, period_end=None, department=None, since_id=None):
+    """
+    Ledger rows in payroll id order: pay periods starting in
+    [period_start, period_end), one department, payroll ids after since_id
+    """
+    query = (select(*(expression for _, expression, _ in LEDGER_COLUMNS))
+             .select_from(Payroll)
+             .join(Employee, Employee.id == Payroll.employee_id)
+             .outerjoin(User, User.id == Employee.user_id)
+             .order_by(Payroll.id))
+    if period_start:
+        query = query.where(Payroll.pay_period_start >= period_start)
+    if period_end:
+        query = query.where(Payroll.pay_period_start < period_end)
+    if department:
+        query = query.where(Employee.department == department)
+    if since_id:
+        query = query.where(Payroll.id > since_id)
+    return query
+
+
+def ledger_batches(query, batch_size=EXPORT_BATCH_SIZE):
+    """Lists of row tuples, fetched batch_size at a time from a server-side cursor"""
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+
+
+def _text(value):
+    """Cell value for CSV and NDJSON: exact decimals, ISO dates"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(LEDGER_FIELDS)
+    yield buffer.getvalue().encode()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([[_text(value) for value in row] for row in batch])
+        yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(batches):
+    for batch in batches:
+        yield b''.join(
+            dumps({name: float(value) if isinstance(value, Decimal) else _text(value)
+                   for name, value in zip(LEDGER_FIELDS, row)}) + b'\n'
+            for row in batch
+        )
+
+
+def parquet_chunks(batches):
+    """One Parquet row group per batch, the footer after the last"""
+    sink = ChunkSink()
+    writer = ParquetWriter(sink, [Column(name, kind) for name, _, kind in LEDGER_COLUMNS])
+    for batch in batches:
+        writer.write_rows(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+_ENCODERS = {'csv': csv_chunks, 'ndjson': ndjson_chunks, 'parquet': parquet_chunks}
+
+
+def export_ledger(fmt, period_start=None, period_end=None, department=None, since_id=None,
+                  batch_size=EXPORT_BATCH_SIZE):
+    """Byte chunks of the filtered ledger encoded as fmt (a LEDGER_FORMATS key)"""
+    if fmt not in _ENCODERS:
+        raise ValueError(f"Unknown export format '{fmt}' (use {', '.join(LEDGER_FORMATS)})")
+    query = ledger_query(period_start, period_end, department, since_id)
+    return _ENCODERS[fmt](ledger_batches(query, batch_size))
@@ -0,0 +1,39 @@
+"""
+Named eager-loading profiles for list views
+Each profile is the set of loader options a page needs so that rendering
+it issues a fixed number of statements regardless of page size
+"""
+from sqlalchemy.orm import contains_eager, joinedload
+from app.models import Employee, LeaveRequest, Payroll
+
+
+def _employee_with_user():
+    return (joinedload(Employee.user),)
+
+
+def _employee_with_joined_user():
+    # For queries that already join users themselves, e.g. to filter on them
+    return (contains_eager(Employee.user),)
+
+
+def _leave_request_with_employee():
+    return (joinedload(LeaveRequest.employee).joinedload(Employee.user),)
+
+
+def _payroll_with_employee():
+    return (joinedload(Payroll.employee).joinedload(Employee.user),)
+
+
+# Built on demand: backref attributes such as Employee.user only exist
+# once the mappers have been configured
+LOAD_PROFILES = {
+    'employee_list': _employee_with_user,
+    'employee_list_joined': _employee_with_joined_user,
+    'leave_request_list': _leave_request_with_employee,
+    'payroll_list': _payroll_with_employee,
+}
+
+
+def load_profile(name):
+    """Loader options for a named profile, ready for query.options(*...)"""
+    return LOAD_PROFILES[name]()
@@ -0,0 +1,152 @@
+"""
+Keyset (cursor) pagination for admin listings
+Pages are addressed by opaque cursors over (created_at, id) so every page
+costs one indexed range scan, however deep it is. Offset pagination is
+kept for small tables.
+"""
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, or_
+
+DEFAULT_KEYSET_THRESHOLD = 1000  # Rows above which listings switch to cursors
+DEFAULT_COUNT_TTL = 60  # Seconds an approximate total is reused
+DEFAULT_COUNT_CACHE_SIZE = 512  # Listing totals kept, one per filter combination
+
+
+class KeysetPage:
+    """One page of a keyset listing; mirrors the parts of Pagination templates use"""
+    is_keyset = True
+
+    def __init__(self, items, per_page, has_next, has_prev, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.total = total  # Approximate, may be None
+        self.next_cursor = encode_cursor(items[-1], 'next') if has_next and items else None
+        self.prev_cursor = encode_cursor(items[0], 'prev') if has_prev and items else None
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+class CountCache:
+    """Listing totals by cache key; entries expire and the least recently used go first when full"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # cache key -> (total, expires at)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, cache_key, now):
+        """Cached total for cache_key, or None when missing or expired"""
+        with self._lock:
+            cached = self._entries.get(cache_key)
+            if cached is None:
+                return None
+            if cached[1] <= now:
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return cached[0]
+
+    def put(self, cache_key, total, expires):
+        with self._lock:
+            self._entries[cache_key] = (total, expires)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def encode_cursor(row, direction):
+    """Opaque token pointing just past row in the given direction"""
+    payload = json.dumps([row.created_at.isoformat(), row.id, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(created_at, id, direction) from a token, or None if it is not valid"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, row_id, direction = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in ('next', 'prev'):
+            return None
+        return datetime.fromisoformat(created_at), int(row_id), direction
+    except (ValueError, TypeError, json.JSONDecodeError):
+        return None
+
+
+def keyset_paginate(query, model, cursor=None, per_page=10, total=None):
+    """
+    Newest-first page of query keyed on (model.created_at, model.id).
+    cursor is a token from a previous page's next_cursor / prev_cursor.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    created_at, row_id = model.created_at, model.id
+
+    if position is None:
+        rows = query.order_by(created_at.desc(), row_id.desc()).limit(per_page + 1).all()
+        return KeysetPage(rows[:per_page], per_page, len(rows) > per_page, False, total)
+
+    key_created, key_id, direction = position
+    if direction == 'next':
+        rows = query.filter(or_(
+            created_at < key_created,
+            and_(created_at == key_created, row_id < key_id)
+        )).order_by(created_at.desc(), row_id.desc()).limit(per_page + 1).all()
+        return KeysetPage(rows[:per_page], per_page, len(rows) > per_page, True, total)
+
+    rows = query.filter(or_(
+        created_at > key_created,
+        and_(created_at == key_created, row_id > key_id)
+    )).order_by(created_at.asc(), row_id.asc()).limit(per_page + 1).all()
+    has_prev = len(rows) > per_page
+    return KeysetPage(list(reversed(rows[:per_page])), per_page, True, has_prev, total)
+
+
+def _count_cache():
+    count_cache = current_app.extensions.get('approximate_counts')
+    if count_cache is None:
+        size = current_app.config.get('APPROX_COUNT_CACHE_SIZE', DEFAULT_COUNT_CACHE_SIZE)
+        count_cache = current_app.extensions.setdefault('approximate_counts', CountCache(size))
+    return count_cache
+
+
+def approximate_count(query, cache_key, ttl=None):
+    """Row count for query, cached per cache_key for ttl seconds in a bounded cache"""
+    if ttl is None:
+        ttl = current_app.config.get('APPROX_COUNT_TTL', DEFAULT_COUNT_TTL)
+    count_cache = _count_cache()
+    now = time.monotonic()
+    cached = count_cache.get(cache_key, now)
+    if cached is not None:
+        return cached
+    total = query.order_by(None).count()
+    count_cache.put(cache_key, total, now + ttl)
+    return total
+
+
+def paginate_listing(query, model, cache_key, page=None, cursor=None, per_page=10):
+    """
+    Pick offset or keyset pagination for an admin listing.
+    Explicit ?page= keeps offset mode, ?cursor= keeps keyset mode; otherwise
+    tables larger than KEYSET_PAGINATION_THRESHOLD start in keyset mode.
+    """
+    threshold = current_app.config.get('KEYSET_PAGINATION_THRESHOLD', DEFAULT_KEYSET_THRESHOLD)
+
+    if cursor or page is None:
+        total = approximate_count(query, cache_key)
+        if cursor or total > threshold:
+            return keyset_paginate(query, model, cursor, per_page, total)
+
+    return query.order_by(model.created_at.desc()).paginate(
+        page=page or 1, per_page=per_page, error_out=False
+    )
@@ -0,0 +1,73 @@
+"""
+Attendance-derived payroll inputs
+Days present, half days, leave days, hours worked and overtime for every
+employee in a pay period, computed with one GROUP BY over attendance
+(and the archive tables when the period reaches back past the horizon).
+Overtime is the time worked beyond the employee's working_hours_per_day,
+counted day by day. Both the single payroll form and month-end runs take
+their attendance figures from here.
+"""
+from sqlalchemy import select, func, case
+from app.services.attendance_archive import attendance_entity
+from app.models import db, Employee
+
+DEFAULT_HOURS_PER_DAY = 8.0
+
+
+class PayrollInputs:
+    """One employee's attendance figures for a pay period"""
+
+    __slots__ = ('days_present', 'half_days', 'leave_days', 'hours_worked', 'overtime_hours', 'recorded')
+
+    def __init__(self, days_present=0, half_days=0, leave_days=0, hours_worked=0.0,
+                 overtime_hours=0.0, recorded=0):
+        self.days_present = days_present
+        self.half_days = half_days
+        self.leave_days = leave_days
+        self.hours_worked = hours_worked
+        self.overtime_hours = overtime_hours
+        self.recorded = recorded
+
+    def payroll_days_present(self, working_days):
+        """Days present for payroll; employees without attendance records are paid in full"""
+        return self.days_present if self.recorded else working_days
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _count(attendance, status):
+    return func.sum(case((attendance.status == status, 1), else_=0))
+
+
+def payroll_inputs(period_start, period_end, *criteria, employee_ids=None):
+    """
+    {employee_id: PayrollInputs} for attendance between period_start and
+    period_end inclusive, for employees matching criteria (Employee column
+    expressions) or employee_ids. Employees without attendance are absent;
+    use PayrollInputs() for them.
+    """
+    attendance = attendance_entity(period_start, period_end)
+    hours = func.coalesce(attendance.hours_worked, 0.0)
+    hours_per_day = func.coalesce(Employee.working_hours_per_day, DEFAULT_HOURS_PER_DAY)
+    query = select(
+        attendance.employee_id,
+        _count(attendance, 'present'),
+        _count(attendance, 'half_day'),
+        _count(attendance, 'leave'),
+        func.sum(hours),
+        func.sum(case((hours > hours_per_day, hours - hours_per_day), else_=0.0)),
+        func.count(attendance.id)
+    ).join(Employee, Employee.id == attendance.employee_id).where(
+        attendance.date >= period_start,
+        attendance.date <= period_end,
+        *criteria
+    ).group_by(attendance.employee_id)
+    if employee_ids is not None:
+        query = query.where(attendance.employee_id.in_(employee_ids))
+
+    return {
+        employee_id: PayrollInputs(int(present or 0), int(half or 0), int(leave or 0),
+                                   round(float(worked or 0), 2), round(float(overtime or 0), 2), recorded)
+        for employee_id, present, half, leave, worked, overtime, recorded in db.session.execute(query)
+    }
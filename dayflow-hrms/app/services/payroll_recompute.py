@@ -0,0 +1,339 @@
+"""
+Stale payroll tracking and recomputation
+A payroll row depends on its employee's attendance days and hours and
+approved leave inside its pay period and on the employee's salary
+components. Writes to those inputs mark the dependent unpaid payroll rows
+stale, per kind of input, in the same transaction. recompute_stale_payroll
+recalculates only the marked rows, in batches, refreshing just the inputs
+that changed so amounts entered by hand on a payroll row are kept; present
+days and overtime follow attendance only on rows that took them from it
+(run_payroll, or payroll form fields left blank).
+"""
+import time
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import event, select, insert, delete, update, exists, literal, func, and_, or_, bindparam
+from sqlalchemy.orm import attributes
+from app.payroll_kernel import apply_payroll, PayrollResults
+from app.salary_structure import salary_plan
+from app.services.leave_index import LeaveIntervalIndex
+from app.services.payroll_inputs import PayrollInputs, payroll_inputs
+from app.services.payroll_run import component_amounts
+from app.services.payroll_summary import refresh_payroll_cell
+from app.services.payslips import invalidate_payslips
+from app.services.snapshot import invalidate_employee_snapshot
+from app.services.tracking import loaded_value
+from app.models import db, Employee, Attendance, LeaveRequest, Payroll, SalaryComponent, SalaryRevision, StalePayroll
+
+SOURCES = ('attendance', 'leave', 'salary')
+RECOMPUTE_BATCH_SIZE = 500
+
+_PENDING_KEY = 'stale_payroll_inputs'
+
+# Attributes whose change alters what a payroll row is calculated from
+_INPUT_ATTRIBUTES = {
+    Attendance: ('employee_id', 'date', 'status', 'hours_worked'),
+    LeaveRequest: ('employee_id', 'leave_type', 'start_date', 'end_date', 'status'),
+    SalaryComponent: ('employee_id', 'component_name', 'component_type', 'calculated_amount', 'is_active'),
+}
+
+_stale = StalePayroll.__table__
+_payroll = Payroll.__table__
+
+
+class PayrollRecomputeResult:
+    """Outcome of a recompute: counts plus seconds spent per phase"""
+
+    def __init__(self):
+        self.stale = 0
+        self.recomputed = 0
+        self.skipped = 0  # Paid or deleted since they were marked
+        self.timings = defaultdict(float)
+
+    @property
+    def elapsed(self):
+        return sum(self.timings.values())
+
+    def summary(self):
+        return (f"recomputed {self.recomputed} of {self.stale} stale payroll records "
+                f"({self.skipped} skipped) in {self.elapsed:.2f}s")
+
+
+def _unpaid(query):
+    return query.where(func.coalesce(Payroll.payment_status, 'pending') != 'paid')
+
+
+def _mark(connection, source, query):
+    """Insert stale marks for the payroll ids query selects, skipping existing marks"""
+    query = _unpaid(query).where(~exists().where(
+        _stale.c.payroll_id == Payroll.id,
+        _stale.c.source == source
+    ))
+    return connection.execute(insert(_stale).from_select(
+        ['payroll_id', 'source', 'marked_at'], query
+    )).rowcount
+
+
+def mark_payroll_stale(connection, source, changes):
+    """
+    Mark the unpaid payroll rows depending on changed inputs as stale.
+    changes is {employee_id: [(first day, last day), ...]} of changed input
+    days; salary changes span from their effective date to date.max (see
+    salary_change_days). Bulk writes that bypass the ORM call this
+    themselves. Returns rows marked.
+    """
+    targets = select(Payroll.id, literal(source), func.current_timestamp())
+    marked = 0
+    # Employees whose changes span the same days share one statement, so a
+    # bulk write over many employees and a few days issues a few inserts
+    by_days = defaultdict(list)
+    for employee_id, days in changes.items():
+        by_days[tuple(sorted(set(days)))].append(employee_id)
+    for days, employee_ids in by_days.items():
+        marked += _mark(connection, source, targets.where(
+            Payroll.employee_id.in_(sorted(employee_ids)),
+            or_(*(and_(Payroll.pay_period_start <= last, Payroll.pay_period_end >= first)
+                  for first, last in days))
+        ))
+    return marked
+
+
+def salary_change_days(employee_ids, effective_date=None):
+    """
+    mark_payroll_stale changes for salaries changing from effective_date
+    (today by default): only pay periods ending on or after it are affected
+    """
+    days = [(effective_date or date.today(), date.max)]
+    return dict.fromkeys(employee_ids, days)
+
+
+def _inputs_changed(session, obj, names):
+    if obj in session.new or obj in session.deleted:
+        return True
+    return session.is_modified(obj) and any(
+        attributes.get_history(obj, name).has_changes() for name in names
+    )
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_changed_inputs(session, flush_context, instances):
+    """Remember the attendance days, leave ranges and salaries being written"""
+    pending = session.info.setdefault(
+        _PENDING_KEY, {'attendance': defaultdict(set), 'leave': defaultdict(set), 'salary': set()}
+    )
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            names = _INPUT_ATTRIBUTES.get(type(obj))
+            if names is None or not _inputs_changed(session, obj, names):
+                continue
+            before = obj not in session.new
+            after = obj not in session.deleted
+            if isinstance(obj, Attendance):
+                if before:
+                    day = loaded_value(obj, 'date')
+                    pending['attendance'][loaded_value(obj, 'employee_id')].add((day, day))
+                if after:
+                    day = obj.date or date.today()
+                    pending['attendance'][obj.employee_id].add((day, day))
+            elif isinstance(obj, LeaveRequest):
+                # Only approved leave counts towards payroll
+                if before and loaded_value(obj, 'status') == 'approved':
+                    pending['leave'][loaded_value(obj, 'employee_id')].add(
+                        (loaded_value(obj, 'start_date'), loaded_value(obj, 'end_date')))
+                if after and obj.status == 'approved':
+                    pending['leave'][obj.employee_id].add((obj.start_date, obj.end_date))
+            else:
+                if before:
+                    pending['salary'].add(loaded_value(obj, 'employee_id'))
+                if after:
+                    pending['salary'].add(obj.employee_id)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _mark_dependent_payroll(session, flush_context):
+    """Mark payroll rows depending on the flushed inputs, in the same transaction"""
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not any(pending.values()):
+        return
+    connection = session.connection()
+    for source in ('attendance', 'leave'):
+        if pending[source]:
+            mark_payroll_stale(connection, source, pending[source])
+    if pending['salary']:
+        mark_payroll_stale(connection, 'salary', salary_change_days(pending['salary']))
+
+
+def stale_payroll_count():
+    """Number of payroll rows waiting to be recomputed"""
+    return db.session.scalar(select(func.count(func.distinct(_stale.c.payroll_id))))
+
+
+def _refresh_inputs(rows, sources):
+    """
+    Payroll column values for rows with the stale inputs reloaded: present
+    days and overtime, where they were derived from attendance rather than
+    entered, for 'attendance', leave days for 'leave' and base salary plus
+    structure amounts, at the wage in force for the period, for 'salary'.
+    Other columns keep their stored values.
+    """
+    records = {row.id: dict(row._mapping) for row in rows}
+
+    needing = defaultdict(list)
+    for row in rows:
+        for source in sources[row.id]:
+            needing[source].append(row)
+
+    by_period = defaultdict(list)
+    for row in needing['attendance']:
+        if row.days_present_derived or row.overtime_derived:
+            by_period[(row.pay_period_start, row.pay_period_end)].append(row)
+    for (period_start, period_end), period_rows in by_period.items():
+        attendance = payroll_inputs(period_start, period_end,
+                                    employee_ids=[row.employee_id for row in period_rows])
+        for row in period_rows:
+            inputs = attendance.get(row.employee_id) or PayrollInputs()
+            if row.days_present_derived:
+                records[row.id]['days_present'] = inputs.payroll_days_present(row.total_working_days)
+            if row.overtime_derived:
+                records[row.id]['overtime_hours'] = inputs.overtime_hours
+
+    if needing['leave']:
+        leave_index = LeaveIntervalIndex.load(
+            min(row.pay_period_start for row in needing['leave']),
+            max(row.pay_period_end for row in needing['leave']),
+            employee_ids=sorted({row.employee_id for row in needing['leave']})
+        )
+        for row in needing['leave']:
+            paid, unpaid = leave_index.leave_days(row.employee_id, row.pay_period_start, row.pay_period_end)
+            records[row.id].update(paid_leave_days=paid, unpaid_leave_days=unpaid)
+
+    if needing['salary']:
+        plan = salary_plan()
+        structure_fields = [rule.payroll_field for rule in plan.steps if rule.payroll_field]
+        wages = wages_in_force(needing['salary'])
+        components = component_amounts(sorted({row.employee_id for row in needing['salary']}))
+        # The employee's components describe their current wage; periods paid
+        # at an earlier wage, and employees without components, get the
+        # standard structure at the wage in force
+        current = {row.id: components.get(row.employee_id) for row in needing['salary']
+                   if _same_wage(wages[row.id], row.monthly_wage)}
+        missing = [row for row in needing['salary'] if not current.get(row.id)]
+        evaluated = plan.evaluate([wages[row.id] for row in missing]) if missing else None
+        structured = {row.id: plan.payroll_fields(evaluated, i) for i, row in enumerate(missing)}
+        for row in needing['salary']:
+            record = records[row.id]
+            record.update(dict.fromkeys(structure_fields, 0))
+            record.update(current.get(row.id) or structured[row.id])
+            record['base_monthly_salary'] = wages[row.id]
+    return list(records.values())
+
+
+def _same_wage(wage, other):
+    return wage is not None and other is not None and Decimal(str(wage)) == Decimal(str(other))
+
+
+def wages_in_force(rows):
+    """
+    {payroll id: monthly wage} for payroll rows (with monthly_wage, the
+    employee's current wage) from the salary revision history: the new wage
+    of the latest revision effective by the end of the period, else the
+    wage before the first revision, else the current wage. A period before
+    the first recorded wage keeps its stored base salary.
+    """
+    history = defaultdict(list)
+    revisions = db.session.execute(
+        select(SalaryRevision.employee_id, SalaryRevision.effective_date,
+               SalaryRevision.previous_wage, SalaryRevision.new_wage)
+        .where(SalaryRevision.employee_id.in_(sorted({row.employee_id for row in rows})))
+        .order_by(SalaryRevision.employee_id, SalaryRevision.effective_date, SalaryRevision.id)
+    )
+    for employee_id, effective_date, previous_wage, new_wage in revisions:
+        history[employee_id].append((effective_date, previous_wage, new_wage))
+
+    wages = {}
+    for row in rows:
+        revised = history[row.employee_id]
+        in_force = [new for effective, _, new in revised if effective <= row.pay_period_end]
+        if in_force:
+            wages[row.id] = in_force[-1]
+        elif revised:
+            wages[row.id] = revised[0][1] if revised[0][1] is not None else row.base_monthly_salary
+        else:
+            wages[row.id] = row.monthly_wage
+    return wages
+
+
+def _update_statement(fields):
+    return update(_payroll).where(_payroll.c.id == bindparam('payroll_id')).values(
+        {name: bindparam(name) for name in fields}
+    )
+
+
+def recompute_stale_payroll(batch_size=RECOMPUTE_BATCH_SIZE, progress=None):
+    """
+    Recalculate every payroll row marked stale, batch_size rows per
+    transaction, and clear their marks. Calls progress(done, total).
+    Returns a PayrollRecomputeResult.
+    """
+    result = PayrollRecomputeResult()
+    result.stale = stale_payroll_count()
+    plan = salary_plan()
+    fields = (('base_monthly_salary', 'days_present', 'overtime_hours', 'paid_leave_days',
+               'unpaid_leave_days', 'allowances', 'deductions')
+              + tuple(rule.payroll_field for rule in plan.steps if rule.payroll_field)
+              + PayrollResults.FIELDS)
+    statement = _update_statement(fields)
+    if progress:
+        progress(0, result.stale)
+
+    last_id = 0
+    while True:
+        started = time.perf_counter()
+        payroll_ids = db.session.scalars(
+            select(_stale.c.payroll_id).where(_stale.c.payroll_id > last_id)
+            .distinct().order_by(_stale.c.payroll_id).limit(batch_size)
+        ).all()
+        if not payroll_ids:
+            break
+        last_id = payroll_ids[-1]
+        marks = db.session.execute(
+            select(_stale.c.id, _stale.c.payroll_id, _stale.c.source)
+            .where(_stale.c.payroll_id.in_(payroll_ids))
+        ).all()
+        sources = defaultdict(set)
+        for _, payroll_id, source in marks:
+            sources[payroll_id].add(source)
+        rows = db.session.execute(_unpaid(
+            select(_payroll, Employee.department, Employee.monthly_wage)
+            .join(Employee, Employee.id == Payroll.employee_id)
+            .where(Payroll.id.in_(payroll_ids))
+        )).all()
+        result.timings['load'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        records = _refresh_inputs(rows, sources)
+        apply_payroll(records)
+        result.timings['calculate'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        # Bulk updates bypass the ORM listeners, so refresh derived data here
+        connection = db.session.connection()
+        if records:
+            connection.execute(statement, [
+                dict({name: record[name] for name in fields}, payroll_id=record['id'])
+                for record in records
+            ])
+        for period_start, department in {(row.pay_period_start, row.department or '') for row in rows}:
+            refresh_payroll_cell(connection, period_start, department)
+        connection.execute(delete(_stale).where(_stale.c.id.in_([mark_id for mark_id, _, _ in marks])))
+        db.session.commit()
+        invalidate_payslips(*[row.id for row in rows])
+        invalidate_employee_snapshot(*{row.employee_id for row in rows})
+        result.timings['update'] += time.perf_counter() - started
+
+        result.recomputed += len(rows)
+        result.skipped += len(payroll_ids) - len(rows)
+        if progress:
+            progress(result.recomputed + result.skipped, result.stale)
+    return result
@@ -0,0 +1,210 @@
+"""
+Month-end payroll run
+Generates payroll for every eligible employee in a period with a handful of
+set-based queries and batched inserts. Employees who already have payroll
+for the period are skipped, so a run can be repeated or resumed safely;
+rows that a concurrent run inserted first are skipped by the unique
+(employee, period) index rather than duplicated.
+"""
+import time
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import select, exists
+from app.payroll_kernel import apply_payroll
+from app.salary_structure import salary_plan
+from app.services.leave_index import LeaveIntervalIndex
+from app.services.payroll_inputs import PayrollInputs, payroll_inputs
+from app.services.payroll_summary import refresh_payroll_cell
+from app.services.snapshot import invalidate_employee_snapshot
+from app.services.tracking import upsert_insert
+from app.models import db, User, Employee, Payroll, SalaryComponent
+
+RUN_BATCH_SIZE = 500
+
+_MONEY_FIELDS = ('basic_salary', 'hra', 'standard_allowance', 'performance_bonus', 'lta',
+                 'fixed_allowance', 'allowances', 'increment_amount', 'increment_percentage',
+                 'special_bonus', 'festival_bonus', 'other_earnings', 'pf_deduction',
+                 'professional_tax', 'deductions', 'tax_deductions', 'overtime_rate')
+
+
+class PayrollRunResult:
+    """Outcome of a payroll run: counts plus seconds spent per phase"""
+
+    def __init__(self, period_start, period_end):
+        self.period_start = period_start
+        self.period_end = period_end
+        self.eligible = 0
+        self.created = 0
+        self.skipped = 0
+        self.timings = {}
+
+    @property
+    def elapsed(self):
+        return sum(self.timings.values())
+
+    def summary(self):
+        return (f"{self.period_start.strftime('%B %Y')}: created {self.created}, "
+                f"skipped {self.skipped} existing of {self.eligible} eligible "
+                f"in {self.elapsed:.2f}s")
+
+
+def working_days_in_period(start, end, days_per_week=5):
+    """Days from start to end falling on the first days_per_week weekdays"""
+    days = 0
+    current = start
+    while current <= end:
+        if current.weekday() < days_per_week:
+            days += 1
+        current += timedelta(days=1)
+    return days
+
+
+def _eligible_employees(period_start, period_end, department=None, employee_ids=None):
+    """(employee_id, department, monthly_wage, days_per_week, has_payroll) rows"""
+    has_payroll = exists().where(
+        Payroll.employee_id == Employee.id,
+        Payroll.pay_period_start == period_start
+    )
+    query = select(
+        Employee.id, Employee.department, Employee.monthly_wage,
+        Employee.working_days_per_week, has_payroll.label('has_payroll')
+    ).join(User, User.id == Employee.user_id).where(
+        User.is_active.is_(True),
+        Employee.monthly_wage > 0,
+        (Employee.hire_date.is_(None)) | (Employee.hire_date <= period_end)
+    ).order_by(Employee.id)
+    if department:
+        query = query.where(Employee.department == department)
+    if employee_ids:
+        query = query.where(Employee.id.in_(employee_ids))
+    return db.session.execute(query).all()
+
+
+def component_amounts(employee_ids):
+    """{employee_id: {payroll field: amount}} from active salary components"""
+    rules = salary_plan().rules_by_name
+    amounts = defaultdict(lambda: defaultdict(Decimal))
+    rows = db.session.execute(
+        select(SalaryComponent.employee_id, SalaryComponent.component_name,
+               SalaryComponent.component_type, SalaryComponent.calculated_amount).where(
+            SalaryComponent.employee_id.in_(employee_ids),
+            SalaryComponent.is_active.is_(True)
+        )
+    ).all()
+    for employee_id, name, component_type, amount in rows:
+        rule = rules.get(name)
+        field = (rule.payroll_field if rule and rule.payroll_field
+                 else 'allowances' if component_type == 'earning' else 'deductions')
+        amounts[employee_id][field] += Decimal(str(amount or 0))
+    return amounts
+
+
+def _structure_amounts(pending, components):
+    """
+    {employee_id: {payroll field: amount}} from the standard salary structure
+    for employees without salary components, evaluated in one call
+    """
+    missing = [(employee_id, wage) for employee_id, _, wage, _, _ in pending
+               if not components.get(employee_id)]
+    if not missing:
+        return {}
+    plan = salary_plan()
+    evaluated = plan.evaluate([wage for _, wage in missing])
+    return {employee_id: plan.payroll_fields(evaluated, i)
+            for i, (employee_id, _) in enumerate(missing)}
+
+
+def _payroll_values(employee_id, monthly_wage, components, period_start, period_end,
+                    working_days, days_present, paid_leave_days, unpaid_leave_days, overtime_hours):
+    """Column values for one new payroll row, before pay figures are calculated"""
+    wage = Decimal(str(monthly_wage))
+    values = dict.fromkeys(_MONEY_FIELDS, Decimal('0'))
+    values.update(components)
+
+    values.update(
+        employee_id=employee_id,
+        pay_period_start=period_start,
+        pay_period_end=period_end,
+        base_monthly_salary=wage,
+        days_present=days_present,
+        total_working_days=working_days,
+        paid_leave_days=paid_leave_days,
+        unpaid_leave_days=unpaid_leave_days,
+        overtime_hours=overtime_hours,
+        days_present_derived=True,
+        overtime_derived=True,
+        payment_status='pending',
+        payment_date=None,
+        created_at=datetime.utcnow()
+    )
+    return values
+
+
+def _payroll_insert(connection):
+    """INSERT of new payroll rows that skips employees already paid for the period, returning who was inserted"""
+    statement = upsert_insert(connection, Payroll.__table__)
+    return statement.on_conflict_do_nothing(
+        index_elements=['employee_id', 'pay_period_start']
+    ).returning(Payroll.__table__.c.employee_id)
+
+
+def run_payroll(month, year, department=None, employee_ids=None,
+                batch_size=RUN_BATCH_SIZE, progress=None):
+    """
+    Generate payroll for month/year for every active employee with a wage,
+    optionally limited to a department or to employee_ids.
+    Commits after each batch and calls progress(done, total) as it goes.
+    Returns a PayrollRunResult.
+    """
+    period_start = date(year, month, 1)
+    period_end = date(year, month, monthrange(year, month)[1])
+    result = PayrollRunResult(period_start, period_end)
+
+    started = time.perf_counter()
+    employees = _eligible_employees(period_start, period_end, department, employee_ids)
+    result.eligible = len(employees)
+    pending = [row for row in employees if not row.has_payroll]
+    result.skipped = result.eligible - len(pending)
+    pending_ids = [row.id for row in pending]
+    attendance = payroll_inputs(period_start, period_end, employee_ids=pending_ids) if pending else {}
+    leave_index = (LeaveIntervalIndex.load(period_start, period_end, employee_ids=pending_ids)
+                   if pending else LeaveIntervalIndex(period_start, period_end, ()))
+    components = component_amounts(pending_ids) if pending else {}
+    result.timings['load'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    structured = _structure_amounts(pending, components)
+    rows = []
+    for employee_id, employee_department, monthly_wage, days_per_week, _ in pending:
+        working_days = working_days_in_period(period_start, period_end, days_per_week or 5)
+        inputs = attendance.get(employee_id) or PayrollInputs()
+        paid_days, unpaid_days = leave_index.leave_days(employee_id, period_start, period_end)
+        rows.append((employee_department or '', _payroll_values(
+            employee_id, monthly_wage, components.get(employee_id) or structured[employee_id],
+            period_start, period_end,
+            working_days, inputs.payroll_days_present(working_days), paid_days, unpaid_days,
+            inputs.overtime_hours
+        )))
+    apply_payroll([values for _, values in rows])
+    result.timings['calculate'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if progress:
+        progress(0, len(rows))
+    for offset in range(0, len(rows), batch_size):
+        batch = rows[offset:offset + batch_size]
+        # Bulk inserts bypass the ORM listeners, so refresh derived data here
+        connection = db.session.connection()
+        created = connection.execute(_payroll_insert(connection), [values for _, values in batch]).scalars().all()
+        for dept in {dept for dept, _ in batch}:
+            refresh_payroll_cell(connection, period_start, dept)
+        db.session.commit()
+        invalidate_employee_snapshot(*created)
+        result.created += len(created)
+        result.skipped += len(batch) - len(created)
+        if progress:
+            progress(offset + len(batch), len(rows))
+    result.timings['insert'] = time.perf_counter() - started
+    return result
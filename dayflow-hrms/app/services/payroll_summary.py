@@ -0,0 +1,170 @@
+"""
+Payroll period summary service
+Keeps payroll_period_summary current as payroll rows are written and
+answers payroll page statistics with aggregate queries
+"""
+from datetime import date
+from sqlalchemy import event, func, case, distinct, select, delete, insert, literal
+from app.services.tracking import loaded_value
+from app.models import db, Employee, Payroll, PayrollPeriodSummary
+
+_PENDING_CELLS_KEY = 'payroll_summary_cells'
+
+_SUMMARY_COLUMNS = ['period_start', 'department', 'headcount', 'payroll_count',
+                    'gross_total', 'deductions_total', 'net_total',
+                    'paid_count', 'pending_count', 'updated_at']
+
+
+def month_bounds(day):
+    """First day of day's month and first day of the following month"""
+    start = day.replace(day=1)
+    if start.month == 12:
+        return start, date(start.year + 1, 1, 1)
+    return start, date(start.year, start.month + 1, 1)
+
+
+def _aggregates():
+    """Aggregate columns shared by cell refresh and full rebuild"""
+    status = func.lower(Payroll.payment_status)
+    return [
+        func.count(distinct(Payroll.employee_id)),
+        func.count(Payroll.id),
+        func.coalesce(func.sum(Payroll.gross_pay), 0),
+        func.coalesce(func.sum(Payroll.total_deductions), 0),
+        func.coalesce(func.sum(Payroll.net_pay), 0),
+        func.coalesce(func.sum(case((status == 'paid', 1), else_=0)), 0),
+        func.coalesce(func.sum(case((status == 'pending', 1), else_=0)), 0),
+    ]
+
+
+def refresh_payroll_cell(connection, period_start, department):
+    """Recompute one (period, department) summary row from the payroll table"""
+    table = PayrollPeriodSummary.__table__
+    start, end = month_bounds(period_start)
+    connection.execute(delete(table).where(
+        table.c.period_start == start,
+        table.c.department == department
+    ))
+    aggregated = select(
+        literal(start, db.Date),
+        literal(department),
+        *_aggregates(),
+        func.current_timestamp()
+    ).select_from(Payroll).join(
+        Employee, Employee.id == Payroll.employee_id
+    ).where(
+        Payroll.pay_period_start >= start,
+        Payroll.pay_period_start < end,
+        func.coalesce(Employee.department, '') == department
+    ).having(func.count(Payroll.id) > 0)
+    connection.execute(insert(table).from_select(_SUMMARY_COLUMNS, aggregated))
+
+
+def _department_of(session, employee_id):
+    employee = session.get(Employee, employee_id)
+    return (employee.department or '') if employee else ''
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_payroll_cells(session, flush_context, instances):
+    """Remember which summary cells the pending payroll writes and department changes touch"""
+    cells = session.info.setdefault(_PENDING_CELLS_KEY, set())
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Payroll) and obj.pay_period_start:
+                cells.add((obj.pay_period_start.replace(day=1),
+                           _department_of(session, obj.employee_id)))
+        for obj in list(session.dirty) + list(session.deleted):
+            if not isinstance(obj, Payroll):
+                continue
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            old_start = loaded_value(obj, 'pay_period_start')
+            cells.add((old_start.replace(day=1),
+                       _department_of(session, loaded_value(obj, 'employee_id'))))
+            if obj in session.dirty and obj.pay_period_start:
+                cells.add((obj.pay_period_start.replace(day=1),
+                           _department_of(session, obj.employee_id)))
+        # A department change moves every period the employee has payroll in
+        for obj in session.dirty:
+            if not isinstance(obj, Employee) or obj.id is None:
+                continue
+            old_department = loaded_value(obj, 'department') or ''
+            new_department = obj.department or ''
+            if old_department == new_department:
+                continue
+            periods = session.execute(
+                select(Payroll.pay_period_start).where(Payroll.employee_id == obj.id).distinct()
+            ).scalars()
+            for period_start in periods:
+                cells.add((period_start.replace(day=1), old_department))
+                cells.add((period_start.replace(day=1), new_department))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _refresh_payroll_cells(session, flush_context):
+    """Recompute touched cells once the payroll rows are written"""
+    cells = session.info.pop(_PENDING_CELLS_KEY, None)
+    if not cells:
+        return
+    connection = session.connection()
+    for period_start, department in cells:
+        refresh_payroll_cell(connection, period_start, department)
+
+
+def rebuild_payroll_period_summary():
+    """
+    Recompute the whole rollup from the payroll table. Caller commits.
+    Returns the number of summary rows written.
+    """
+    table = PayrollPeriodSummary.__table__
+    year = db.extract('year', Payroll.pay_period_start)
+    month = db.extract('month', Payroll.pay_period_start)
+    department = func.coalesce(Employee.department, '')
+
+    rows = db.session.execute(
+        select(year, month, department, *_aggregates())
+        .select_from(Payroll)
+        .join(Employee, Employee.id == Payroll.employee_id)
+        .group_by(year, month, department)
+    ).all()
+
+    db.session.execute(delete(table))
+    if rows:
+        db.session.execute(insert(table), [
+            dict(zip(_SUMMARY_COLUMNS, (date(int(y), int(m), 1), dept, *values)))
+            for y, m, dept, *values in rows
+        ])
+    return len(rows)
+
+
+def payroll_statistics():
+    """Headline numbers for the payroll page"""
+    totals = db.session.query(
+        func.coalesce(func.sum(PayrollPeriodSummary.net_total), 0),
+        func.coalesce(func.sum(PayrollPeriodSummary.payroll_count), 0),
+        func.coalesce(func.sum(PayrollPeriodSummary.pending_count), 0)
+    ).one()
+    total_payroll, payroll_count, pending_payments = float(totals[0]), int(totals[1]), int(totals[2])
+
+    # Distinct employees paid across all periods cannot be summed from cells
+    employees_paid = db.session.query(
+        func.count(distinct(Payroll.employee_id))
+    ).filter(Payroll.payment_status == 'paid').scalar() or 0
+
+    return {
+        'total_payroll': total_payroll,
+        'employees_paid': employees_paid,
+        'pending_payments': pending_payments,
+        'average_salary': total_payroll / payroll_count if payroll_count else 0
+    }
+
+
+def payroll_filter_options():
+    """Pay periods ('YYYY-MM') and years that have payroll, from the rollup"""
+    period_starts = [row[0] for row in db.session.query(
+        PayrollPeriodSummary.period_start
+    ).distinct().order_by(PayrollPeriodSummary.period_start)]
+    pay_periods = [p.strftime('%Y-%m') for p in period_starts]
+    years = sorted({p.year for p in period_starts})
+    return pay_periods, years
@@ -0,0 +1,326 @@
+"""
+Payslip PDFs
+Payslips are rendered to PDF in a worker pool, off the request thread, and
+cached on disk as <payroll id>/<content hash>.pdf. The hash covers every
+value printed on the payslip, so a changed payroll row (or a renamed
+employee) maps to a new file rather than a stale one; files for payroll
+rows that are updated or deleted are removed once the change is committed.
+A pay period's payslips can be streamed as one ZIP archive.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from app.pdf import PdfDocument
+from app.services.streaming import ChunkSink
+from app.models import db, Payroll, Employee, User
+
+DEFAULT_PAYSLIP_WORKERS = 2
+RENDER_TIMEOUT = 60  # Seconds to wait for a worker to render one payslip
+ARCHIVE_RENDER_AHEAD = 16  # Payslips rendered ahead of the one being zipped
+ARCHIVE_BATCH_SIZE = 200  # Payroll rows fetched per round trip for an archive
+
+_PENDING_KEY = 'payslip_invalidations'
+
+# (label, payroll column, always shown); the rest appear only when non-zero
+EARNINGS = (
+    ('Basic Salary', 'basic_salary', True),
+    ('House Rent Allowance (HRA)', 'hra', True),
+    ('Standard Allowance', 'standard_allowance', True),
+    ('Performance Bonus', 'performance_bonus', True),
+    ('Leave Travel Allowance (LTA)', 'lta', True),
+    ('Fixed Allowance', 'fixed_allowance', False),
+    ('Increment', 'increment_amount', False),
+    ('Special Bonus', 'special_bonus', False),
+    ('Festival Bonus', 'festival_bonus', False),
+    ('Other Earnings', 'other_earnings', False),
+)
+DEDUCTIONS = (
+    ('Provident Fund (PF)', 'pf_deduction', True),
+    ('Professional Tax', 'professional_tax', True),
+    ('Tax Deductions', 'tax_deductions', False),
+    ('Unpaid Leave Deduction', 'unpaid_leave_deduction', False),
+    ('Other Deductions', 'deductions', False),
+)
+ATTENDANCE = (
+    ('Total Working Days', 'total_working_days', True),
+    ('Days Present', 'days_present', True),
+    ('Paid Leave Days', 'paid_leave_days', True),
+    ('Unpaid Leave Days', 'unpaid_leave_days', False),
+)
+_TOTALS = ('gross_pay', 'total_deductions', 'net_pay')
+
+
+def _money(value):
+    return f'{float(value or 0):.2f}'
+
+
+def _day(value):
+    return value.strftime('%d %b %Y') if value else None
+
+
+def payslip_document(payroll, employee, user=None):
+    """Everything printed on a payslip, as JSON-safe plain data"""
+    document = {
+        'payroll_id': payroll.id,
+        'employee_name': f'{employee.first_name} {employee.last_name}',
+        'employee_code': user.employee_id if user else 'N/A',
+        'department': employee.department or 'N/A',
+        'position': employee.position or 'N/A',
+        'period': payroll.pay_period_start.strftime('%B %Y'),
+        'period_start': _day(payroll.pay_period_start),
+        'period_end': _day(payroll.pay_period_end),
+        'payment_date': _day(payroll.payment_date) or 'Pending',
+        'payment_status': (payroll.payment_status or 'pending').title(),
+        'generated_on': payroll.created_at.strftime('%d %b %Y at %I:%M %p') if payroll.created_at else None,
+    }
+    for _, field, _ in EARNINGS + DEDUCTIONS:
+        document[field] = _money(getattr(payroll, field))
+    for field in _TOTALS:
+        document[field] = _money(getattr(payroll, field))
+    for _, field, _ in ATTENDANCE:
+        document[field] = int(getattr(payroll, field) or 0)
+    return document
+
+
+def payslip_hash(document):
+    """Content hash of a payslip document, used as cache key and ETag"""
+    return hashlib.sha256(json.dumps(document, sort_keys=True).encode()).hexdigest()
+
+
+def payslip_filename(document):
+    """Download name, e.g. payslip-EMP0001-January-2026.pdf"""
+    return f"payslip-{document['employee_code']}-{document['period'].replace(' ', '-')}.pdf"
+
+
+def payslip_query():
+    """(Payroll, Employee, User) rows ready for payslip_document"""
+    return (select(Payroll, Employee, User)
+            .join(Employee, Employee.id == Payroll.employee_id)
+            .outerjoin(User, User.id == Employee.user_id))
+
+
+def load_payslip_document(payroll_id):
+    """Document for one payroll row, or None if it does not exist"""
+    row = db.session.execute(payslip_query().where(Payroll.id == payroll_id)).first()
+    return payslip_document(*row) if row else None
+
+
+def render_payslip(document):
+    """PDF bytes for a payslip document; runs in the worker pool"""
+    pdf = PdfDocument(title=f"Payslip {document['employee_code']} {document['period']}")
+    page = pdf.add_page()
+    left, right = 50, page.width - 50
+    middle = page.width / 2
+
+    page.text(middle, 60, 'DayFlow HRMS', size=18, font='bold', align='center')
+    page.text(middle, 80, 'Salary Slip', size=11, align='center', gray=0.4)
+    page.text(middle, 96, document['period'], size=11, align='center', gray=0.4)
+    page.line(left, 110, right, 110)
+
+    details = (
+        ('Employee Name', document['employee_name'], 'Position', document['position']),
+        ('Employee ID', document['employee_code'], 'Pay Period',
+         f"{document['period_start']} - {document['period_end']}"),
+        ('Department', document['department'], 'Payment Date', document['payment_date']),
+    )
+    y = 132
+    for label, value, other_label, other_value in details:
+        page.text(left, y, f'{label}:', font='bold')
+        page.text(left + 95, y, value)
+        page.text(middle + 10, y, f'{other_label}:', font='bold')
+        page.text(middle + 100, y, other_value)
+        y += 18
+    page.line(left, y, right, y)
+
+    def table(x, top, width, title, rows, total_label, total):
+        page.text(x, top, title, size=12, font='bold')
+        top += 10
+        page.rect(x, top, width, 18)
+        page.text(x + 6, top + 13, 'Component', font='bold')
+        page.text(x + width - 6, top + 13, 'Amount (Rs.)', font='bold', align='right')
+        top += 18
+        for label, field, always in rows:
+            if not always and float(document[field]) <= 0:
+                continue
+            page.text(x + 6, top + 13, label)
+            page.text(x + width - 6, top + 13, document[field], align='right')
+            top += 18
+            page.line(x, top, x + width, top, width=0.25, gray=0.7)
+        page.rect(x, top, width, 18, fill=0.85)
+        page.text(x + 6, top + 13, total_label, font='bold')
+        page.text(x + width - 6, top + 13, total, font='bold', align='right')
+        return top + 18
+
+    column = (right - left - 20) / 2
+    top = y + 24
+    earnings_end = table(left, top, column, 'Earnings', EARNINGS, 'Total Earnings', document['gross_pay'])
+    deductions_end = table(left + column + 20, top, column, 'Deductions', DEDUCTIONS,
+                           'Total Deductions', document['total_deductions'])
+
+    y = deductions_end + 24
+    page.text(left + column + 20, y, 'Attendance Summary', size=11, font='bold')
+    for label, field, always in ATTENDANCE:
+        if not always and document[field] <= 0:
+            continue
+        y += 16
+        page.text(left + column + 26, y, f'{label}:')
+        page.text(right - 6, y, str(document[field]), font='bold', align='right')
+
+    y = max(y, earnings_end) + 30
+    page.rect(left, y, right - left, 44, fill=0.92)
+    page.text(left + 10, y + 27, 'Net Salary (Take Home)', size=14, font='bold')
+    page.text(right - 10, y + 22, f"Rs. {document['net_pay']}", size=16, font='bold', align='right')
+    page.text(right - 10, y + 37, f"({document['payment_status']})", size=9, align='right', gray=0.4)
+
+    y += 74
+    page.text(middle, y, 'This is a computer-generated payslip and does not require a signature.',
+              size=8, align='center', gray=0.4)
+    if document['generated_on']:
+        page.text(middle, y + 12, f"Generated on: {document['generated_on']}", size=8, align='center', gray=0.4)
+    return pdf.to_bytes()
+
+
+def payslip_cache_dir():
+    return current_app.config.get('PAYSLIP_CACHE_DIR') or os.path.join(current_app.instance_path, 'payslips')
+
+
+def cached_payslip_path(document, digest=None):
+    """Where the PDF for this exact payslip content is (or would be) cached"""
+    digest = digest or payslip_hash(document)
+    return os.path.join(payslip_cache_dir(), str(document['payroll_id']), f'{digest}.pdf')
+
+
+def payslip_pool():
+    """The app's render pool, started on first use"""
+    pool = current_app.extensions.get('payslip_pool')
+    if pool is None:
+        workers = current_app.config.get('PAYSLIP_WORKERS', DEFAULT_PAYSLIP_WORKERS)
+        if 'fork' in multiprocessing.get_all_start_methods():
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+        else:
+            # Spawned workers would re-import the app package and build a second app
+            pool = ThreadPoolExecutor(workers, thread_name_prefix='payslip')
+        current_app.extensions['payslip_pool'] = pool
+    return pool
+
+
+def store_payslip(path, pdf):
+    """Write a rendered PDF atomically and drop older versions for the same payroll"""
+    directory, name = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'wb') as output:
+        output.write(pdf)
+    os.replace(temporary, path)
+    for stale in os.listdir(directory):
+        if stale != name and stale.endswith('.pdf'):
+            _remove(os.path.join(directory, stale))
+    return path
+
+
+def payslip_file(document, digest=None):
+    """Path of the cached PDF for a payslip, rendering it in the pool on a miss"""
+    path = cached_payslip_path(document, digest)
+    if not os.path.exists(path):
+        pdf = payslip_pool().submit(render_payslip, document).result(timeout=RENDER_TIMEOUT)
+        store_payslip(path, pdf)
+    return path
+
+
+def invalidate_payslips(*payroll_ids):
+    """Remove cached PDFs for payroll rows"""
+    if not has_app_context():
+        return
+    directory = payslip_cache_dir()
+    for payroll_id in payroll_ids:
+        shutil.rmtree(os.path.join(directory, str(payroll_id)), ignore_errors=True)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def period_payslip_documents(period_start, department=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """Payslip documents for a pay period, fetched batch_size rows at a time"""
+    query = payslip_query().where(Payroll.pay_period_start == period_start)
+    if department:
+        query = query.where(Employee.department == department)
+    rows = db.session.execute(query.order_by(Payroll.employee_id, Payroll.id)
+                              .execution_options(yield_per=batch_size))
+    for row in rows:
+        yield payslip_document(*row)
+
+
+def cached_payslips(documents, ahead=ARCHIVE_RENDER_AHEAD):
+    """
+    (document, cached PDF path) for each document, in order. Cache misses are
+    handed to the render pool as they are seen, so up to ahead payslips
+    render in parallel while earlier ones are consumed.
+    """
+    window = deque()
+    for document in documents:
+        path = cached_payslip_path(document)
+        future = None if os.path.exists(path) else payslip_pool().submit(render_payslip, document)
+        window.append((document, path, future))
+        if len(window) > ahead:
+            yield _finished(*window.popleft())
+    while window:
+        yield _finished(*window.popleft())
+
+
+def _finished(document, path, future):
+    if future is not None:
+        store_payslip(path, future.result(timeout=RENDER_TIMEOUT))
+    return document, path
+
+
+def payslip_archive(entries):
+    """
+    Stream a ZIP of (document, PDF path) entries chunk by chunk; only the
+    payslip being added is held in memory
+    """
+    sink = ChunkSink()
+    previous = None
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for document, path in entries:
+            name = payslip_filename(document)
+            if (document['employee_code'], document['period']) == previous:
+                # A second payroll row for the same employee and month
+                name = name.replace('.pdf', f"-{document['payroll_id']}.pdf")
+            previous = (document['employee_code'], document['period'])
+            with open(path, 'rb') as payslip, archive.open(name, 'w') as entry:
+                shutil.copyfileobj(payslip, entry)
+            yield sink.drain()
+    yield sink.drain()
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_payslip_changes(session, flush_context, instances):
+    """Remember payroll rows whose printed values may change"""
+    payroll_ids = session.info.setdefault(_PENDING_KEY, set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Payroll) and obj.id is not None and (obj in session.deleted or session.is_modified(obj)):
+            payroll_ids.add(obj.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed(session):
+    payroll_ids = session.info.pop(_PENDING_KEY, None)
+    if payroll_ids:
+        invalidate_payslips(*payroll_ids)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_rolled_back(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,268 @@
+"""
+Bulk punch log import
+Streams a turnstile or biometric export without loading it whole: CSV with
+badge_id and timestamp columns, or NDJSON objects with the same keys.
+Badges are resolved to employees through an in-memory map of login IDs and
+punches collapse to the first and last per employee and day, so memory
+grows with employee-days rather than punches. Attendance is then upserted
+batch_size employee-days per transaction, keeping an earlier check-in or
+later check-out that is already recorded. Lines that cannot be imported,
+including punches dated in an archived (read-only) year, are written to a
+reject report with the reason.
+"""
+import csv
+import io
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, update, bindparam, case, and_, or_
+from app.services.attendance_archive import archived_years
+from app.services.attendance_bitmaps import sync_attendance_bitmaps
+from app.services.attendance_summary import refresh_daily_summary_cell
+from app.services.payroll_recompute import mark_payroll_stale
+from app.services.punches import attendance_insert, hours_worked, run_write
+from app.services.snapshot import invalidate_employee_snapshot
+from app.models import db, User, Employee, Attendance
+
+IMPORT_BATCH_SIZE = 5000
+PUNCH_LOG_FORMATS = ('csv', 'ndjson')
+REJECT_FIELDS = ('line', 'reason', 'record')
+
+_attendance = Attendance.__table__
+
+_UPDATE_HOURS = update(_attendance).where(_attendance.c.id == bindparam('row_id'))
+
+
+class PunchImportResult:
+    """Outcome of an import: counts, reject reasons and seconds spent per phase"""
+
+    def __init__(self):
+        self.punches = 0
+        self.accepted = 0
+        self.employee_days = 0
+        self.rejected = Counter()
+        self.timings = defaultdict(float)
+
+    @property
+    def elapsed(self):
+        return sum(self.timings.values())
+
+    @property
+    def throughput(self):
+        """Punches read per second"""
+        return self.punches / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        text = (f"imported {self.accepted} of {self.punches} punches as {self.employee_days} "
+                f"employee-days in {self.elapsed:.2f}s ({self.throughput:.0f} punches/s)")
+        if self.rejected:
+            reasons = ', '.join(f"{count} {reason}" for reason, count in self.rejected.most_common())
+            text += f"; rejected {sum(self.rejected.values())} ({reasons})"
+        return text
+
+
+def punch_rejects_dir():
+    """Where reject reports of uploaded punch logs are kept"""
+    return os.path.join(current_app.instance_path, 'punch-rejects')
+
+
+def punch_log_format(filename, default='csv'):
+    """Format of a punch log from its file extension"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension in ('ndjson', 'jsonl'):
+        return 'ndjson'
+    return 'csv' if extension == 'csv' else default
+
+
+def badge_map():
+    """{login ID: (employee id, department)} for every employee, from one query"""
+    rows = db.session.execute(
+        select(User.employee_id, Employee.id, Employee.department)
+        .join(Employee, Employee.user_id == User.id)
+    ).all()
+    return {badge: (employee_id, department or '') for badge, employee_id, department in rows}
+
+
+def _records(stream, fmt):
+    """(line number, {field: value} or None when unreadable, raw text) per record"""
+    if fmt == 'ndjson':
+        for line, text in enumerate(stream, start=1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError:
+                record = None
+            yield line, record if isinstance(record, dict) else None, text.rstrip('\r\n')
+        return
+
+    reader = csv.reader(stream)
+    header = [name.strip().lower() for name in next(reader, [])]
+    if 'badge_id' not in header or 'timestamp' not in header:
+        raise ValueError("Punch log needs badge_id and timestamp columns")
+    for row in reader:
+        if not row:
+            continue
+        raw = ','.join(row)
+        yield reader.line_num, dict(zip(header, row)) if len(row) == len(header) else None, raw
+
+
+def parse_punch_time(value):
+    """Local naive datetime of an ISO 8601 timestamp; aware ones are converted to local time"""
+    punched = datetime.fromisoformat(str(value).strip())
+    if punched.tzinfo is not None:
+        punched = punched.astimezone().replace(tzinfo=None)
+    return punched
+
+
+def collapse_punches(stream, fmt, badges, result, rejects=None, archived=()):
+    """
+    {(employee id, day): [first punch time, last punch time]} from a punch
+    log, counting punches and reasons on result and writing rejected lines
+    to rejects, a csv.writer. Punches in the archived years are rejected.
+    """
+    days = {}
+    for line, record, raw in _records(stream, fmt):
+        result.punches += 1
+        reason = None
+        if record is None:
+            reason = 'malformed record'
+        else:
+            badge = str(record.get('badge_id') or '').strip()
+            employee = badges.get(badge)
+            if not badge:
+                reason = 'missing badge_id'
+            elif employee is None:
+                reason = 'unknown badge'
+            else:
+                try:
+                    punched = parse_punch_time(record.get('timestamp'))
+                except (TypeError, ValueError):
+                    reason = 'bad timestamp'
+                else:
+                    if punched.year in archived:
+                        reason = 'archived date'
+        if reason:
+            result.rejected[reason] += 1
+            if rejects is not None:
+                rejects.writerow((line, reason, raw))
+            continue
+
+        result.accepted += 1
+        key = (employee[0], punched.date())
+        moment = punched.time()
+        span = days.get(key)
+        if span is None:
+            days[key] = [moment, moment]
+        elif moment < span[0]:
+            span[0] = moment
+        elif moment > span[1]:
+            span[1] = moment
+    return days
+
+
+def _upsert(connection):
+    """Merge an imported day into any row already recorded for it"""
+    statement = attendance_insert(connection)
+    excluded, current = statement.excluded, _attendance.c
+    return statement.on_conflict_do_update(
+        index_elements=['employee_id', 'date'],
+        set_={
+            'check_in_time': case(
+                (or_(current.check_in_time.is_(None), excluded.check_in_time < current.check_in_time),
+                 excluded.check_in_time),
+                else_=current.check_in_time),
+            'check_out_time': case(
+                (and_(excluded.check_out_time.is_not(None),
+                      or_(current.check_out_time.is_(None), excluded.check_out_time > current.check_out_time)),
+                 excluded.check_out_time),
+                else_=current.check_out_time),
+            # A punch proves presence; half days and leave stay as an admin set them
+            'status': case((current.status == 'absent', 'present'), else_=current.status),
+            'updated_at': excluded.updated_at,
+        }
+    )
+
+
+def _write_days(connection, batch, departments):
+    """Upsert one batch of (employee id, day, first, last) and refresh what derives from it"""
+    now = datetime.utcnow()
+    connection.execute(_upsert(connection), [
+        dict(employee_id=employee_id, date=day, check_in_time=first,
+             check_out_time=last if last > first else None, status='present', break_time=0.0,
+             hours_worked=hours_worked(first, last, 0.0) if last > first else 0.0,
+             created_at=now, updated_at=now)
+        for employee_id, day, first, last in batch
+    ])
+
+    # Hours follow the merged punches, which differ from the file's when a row existed
+    keys = {(employee_id, day) for employee_id, day, _, _ in batch}
+    rows = connection.execute(
+        select(_attendance.c.id, _attendance.c.employee_id, _attendance.c.date, _attendance.c.check_in_time,
+               _attendance.c.check_out_time, _attendance.c.break_time, _attendance.c.hours_worked).where(
+            _attendance.c.employee_id.in_(sorted({employee_id for employee_id, _ in keys})),
+            _attendance.c.date.in_(sorted({day for _, day in keys})),
+            _attendance.c.check_out_time.is_not(None)
+        )
+    ).all()
+    changed_hours = []
+    for row in rows:
+        if (row.employee_id, row.date) not in keys:
+            continue
+        hours = hours_worked(row.check_in_time, row.check_out_time, row.break_time)
+        if hours != row.hours_worked:
+            changed_hours.append({'row_id': row.id, 'hours_worked': hours})
+    if changed_hours:
+        connection.execute(_UPDATE_HOURS, changed_hours)
+
+    for day, department in {(day, departments[employee_id]) for employee_id, day, _, _ in batch}:
+        refresh_daily_summary_cell(connection, day, department)
+    sync_attendance_bitmaps(connection, keys)
+    spans = {}
+    for employee_id, day, _, _ in batch:
+        first_day, last_day = spans.get(employee_id, (day, day))
+        spans[employee_id] = (min(first_day, day), max(last_day, day))
+    mark_payroll_stale(connection, 'attendance', {employee_id: [span] for employee_id, span in spans.items()})
+
+
+def import_punch_log(stream, fmt='csv', rejects=None, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """
+    Import a punch log from a text stream in fmt ('csv' or 'ndjson').
+    Rejected lines go to rejects, a text stream, as CSV (line, reason,
+    record). Commits after each batch and calls progress(done, total)
+    with employee-days written. Returns a PunchImportResult.
+    Raises ValueError for an unknown format or a CSV without the columns.
+    """
+    if fmt not in PUNCH_LOG_FORMATS:
+        raise ValueError(f"Unknown punch log format '{fmt}' (use {', '.join(PUNCH_LOG_FORMATS)})")
+    if isinstance(stream, (bytes, bytearray)):
+        stream = io.StringIO(stream.decode('utf-8-sig'))
+    result = PunchImportResult()
+
+    started = time.perf_counter()
+    badges = badge_map()
+    departments = dict(badges.values())
+    writer = csv.writer(rejects) if rejects is not None else None
+    if writer:
+        writer.writerow(REJECT_FIELDS)
+    days = collapse_punches(stream, fmt, badges, result, writer, set(archived_years()))
+    result.employee_days = len(days)
+    result.timings['read'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    ordered = sorted((day, employee_id, span[0], span[1]) for (employee_id, day), span in days.items())
+    del days
+    if progress:
+        progress(0, len(ordered))
+    for offset in range(0, len(ordered), batch_size):
+        batch = [(employee_id, day, first, last)
+                 for day, employee_id, first, last in ordered[offset:offset + batch_size]]
+        run_write(lambda connection: _write_days(connection, batch, departments))
+        invalidate_employee_snapshot(*{employee_id for employee_id, _, _, _ in batch})
+        if progress:
+            progress(min(offset + batch_size, len(ordered)), len(ordered))
+    result.timings['write'] = time.perf_counter() - started
+    return result
@@ -0,0 +1,203 @@
+"""
+Check-in and check-out punches
+Each punch is one short write transaction whose first statement is the
+write, so concurrent punches queue on the database writer lock instead of
+deadlocking on a read-then-write upgrade. A check-in is a single
+INSERT ... ON CONFLICT on the (employee_id, date) unique index, so two
+requests racing for the same employee and day can never create two rows.
+Busy databases are retried with jittered backoff. apply_punches writes
+many punches in one transaction for the buffered attendance queue. Core
+writes bypass the ORM listeners, so the daily summary, attendance
+bitmaps, stale payroll marks and dashboard snapshots are kept up to date
+here.
+"""
+import random
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from sqlalchemy import select, update, bindparam
+from sqlalchemy.exc import OperationalError
+from app.services.attendance_bitmaps import patch_attendance_bitmaps, sync_attendance_bitmaps
+from app.services.attendance_summary import apply_summary_deltas, refresh_daily_summary_cell
+from app.services.payroll_recompute import mark_payroll_stale
+from app.services.snapshot import invalidate_employee_snapshot
+from app.services.tracking import upsert_insert
+from app.models import db, Attendance
+
+# kind is 'in' or 'out'; department keys the daily summary
+Punch = namedtuple('Punch', 'employee_id department date kind time')
+
+PUNCH_ATTEMPTS = 6
+BUSY_BACKOFF = 0.01  # Seconds before the first retry, doubled on each one
+
+_attendance = Attendance.__table__
+
+
+def is_busy(error):
+    """Whether an OperationalError means another writer holds the database"""
+    message = str(getattr(error, 'orig', error)).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def run_write(write, attempts=PUNCH_ATTEMPTS):
+    """
+    Run write(connection) in its own transaction and commit, retrying the
+    whole transaction while the database is busy. Returns write's result.
+    """
+    for attempt in range(attempts):
+        try:
+            result = write(db.session.connection())
+            db.session.commit()
+            return result
+        except OperationalError as e:
+            db.session.rollback()
+            if attempt == attempts - 1 or not is_busy(e):
+                raise
+            time.sleep(BUSY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def hours_worked(check_in_time, check_out_time, break_time):
+    """Hours between the punches less the break, as Attendance calculates them"""
+    return Attendance(check_in_time=check_in_time, check_out_time=check_out_time,
+                      break_time=break_time or 0.0).calculate_hours_worked()
+
+
+def attendance_insert(connection):
+    """INSERT into attendance that supports ON CONFLICT on the connection's dialect"""
+    return upsert_insert(connection, _attendance)
+
+
+def _check_in_upsert(connection):
+    """Upsert of a day's row with the check-in time unless one is already recorded"""
+    statement = attendance_insert(connection)
+    return statement.on_conflict_do_update(
+        index_elements=['employee_id', 'date'],
+        set_={'check_in_time': statement.excluded.check_in_time, 'status': 'present',
+              'updated_at': statement.excluded.updated_at},
+        where=_attendance.c.check_in_time.is_(None)
+    )
+
+
+def _check_in_values(employee_id, day, at, now):
+    return dict(employee_id=employee_id, date=day, check_in_time=at, status='present',
+                break_time=0.0, hours_worked=0.0, created_at=now, updated_at=now)
+
+
+def punch_in(employee_id, department, day, at):
+    """
+    Record a check-in at time at on day. Returns False when the employee
+    had already checked in that day.
+    """
+    def write(connection):
+        now = datetime.utcnow()
+        row = connection.execute(_check_in_upsert(connection).returning(_attendance.c.created_at),
+                                 _check_in_values(employee_id, day, at, now)).first()
+        if row is None:
+            return False
+        if row.created_at == now:
+            apply_summary_deltas(connection, {(day, department or '', 'present'): 1})
+        else:
+            # A row marked earlier (absent, on leave) may have held any status
+            refresh_daily_summary_cell(connection, day, department)
+        patch_attendance_bitmaps(connection, {(employee_id, day): 'present'})
+        mark_payroll_stale(connection, 'attendance', {employee_id: [(day, day)]})
+        return True
+
+    checked_in = run_write(write)
+    if checked_in:
+        invalidate_employee_snapshot(employee_id)
+    return checked_in
+
+
+def punch_out(employee_id, day, at):
+    """
+    Record a check-out at time at on day and the hours worked. Returns the
+    hours, or None when there is no open check-in for the day.
+    """
+    def write(connection):
+        row = connection.execute(
+            update(_attendance).where(
+                _attendance.c.employee_id == employee_id,
+                _attendance.c.date == day,
+                _attendance.c.check_in_time.is_not(None),
+                _attendance.c.check_out_time.is_(None)
+            ).values(check_out_time=at, updated_at=datetime.utcnow())
+            .returning(_attendance.c.id, _attendance.c.check_in_time, _attendance.c.break_time)
+        ).first()
+        if row is None:
+            return None
+        hours = hours_worked(row.check_in_time, at, row.break_time)
+        connection.execute(update(_attendance).where(_attendance.c.id == row.id).values(hours_worked=hours))
+        mark_payroll_stale(connection, 'attendance', {employee_id: [(day, day)]})
+        return hours
+
+    hours = run_write(write)
+    if hours is not None:
+        invalidate_employee_snapshot(employee_id)
+    return hours
+
+
+def coalesce_punches(punches):
+    """
+    ({(employee_id, date): check-in Punch}, {(employee_id, date): check-out Punch})
+    keeping the earliest of each kind per employee and day
+    """
+    check_ins, check_outs = {}, {}
+    for punch in punches:
+        earliest = check_ins if punch.kind == 'in' else check_outs
+        key = (punch.employee_id, punch.date)
+        if key not in earliest or punch.time < earliest[key].time:
+            earliest[key] = punch
+    return check_ins, check_outs
+
+
+def apply_punches(connection, punches):
+    """
+    Apply many punches in the caller's transaction: every check-in in one
+    executemany upsert, then every check-out whose check-in is recorded.
+    Punches that are already recorded change nothing, so a batch can be
+    applied again safely. Returns the ids of the employees punched.
+    """
+    check_ins, check_outs = coalesce_punches(punches)
+    now = datetime.utcnow()
+    if check_ins:
+        connection.execute(_check_in_upsert(connection), [
+            _check_in_values(punch.employee_id, punch.date, punch.time, now) for punch in check_ins.values()
+        ])
+
+    closed = []
+    if check_outs:
+        open_rows = connection.execute(
+            select(_attendance.c.id, _attendance.c.employee_id, _attendance.c.date,
+                   _attendance.c.check_in_time, _attendance.c.break_time).where(
+                _attendance.c.employee_id.in_(sorted({employee_id for employee_id, _ in check_outs})),
+                _attendance.c.date.in_(sorted({day for _, day in check_outs})),
+                _attendance.c.check_in_time.is_not(None),
+                _attendance.c.check_out_time.is_(None)
+            )
+        ).all()
+        for row in open_rows:
+            punch = check_outs.get((row.employee_id, row.date))
+            if punch is not None:
+                closed.append({'row_id': row.id, 'check_out': punch.time, 'updated': now,
+                               'hours': hours_worked(row.check_in_time, punch.time, row.break_time)})
+        if closed:
+            connection.execute(
+                update(_attendance).where(_attendance.c.id == bindparam('row_id'),
+                                          _attendance.c.check_out_time.is_(None))
+                .values(check_out_time=bindparam('check_out'), hours_worked=bindparam('hours'),
+                        updated_at=bindparam('updated')),
+                closed
+            )
+
+    # Check-ins can change a row's status; recount the days and departments they touched
+    for day, department in {(punch.date, punch.department or '') for punch in check_ins.values()}:
+        refresh_daily_summary_cell(connection, day, department)
+    sync_attendance_bitmaps(connection, check_ins)
+    changed = defaultdict(set)
+    for employee_id, day in list(check_ins) + list(check_outs):
+        changed[employee_id].add((day, day))
+    if changed:
+        mark_payroll_stale(connection, 'attendance', {employee_id: sorted(days)
+                                                      for employee_id, days in changed.items()})
+    return set(changed)
@@ -0,0 +1,299 @@
+"""
+Bulk salary revision
+Applies new wages or percentage increments to many employees at once.
+Salary components are re-evaluated through the compiled salary structure
+for a whole chunk of employees, only rows whose values changed are written
+(one executemany per statement), and every wage change is recorded in the
+revision history. Each chunk is committed as its own transaction.
+"""
+import csv
+import io
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from sqlalchemy import select, update, insert, bindparam
+from app.salary_structure import salary_plan, to_decimal, CENT
+from app.services.payroll_recompute import mark_payroll_stale, salary_change_days
+from app.models import db, User, Employee, SalaryComponent, SalaryRevision
+
+REVISION_CHUNK_SIZE = 500
+
+# Columns compared to decide whether a component row needs an UPDATE
+_COMPONENT_FIELDS = ('component_type', 'computation_type', 'value', 'base_component',
+                     'calculated_amount', 'is_active')
+
+_components = SalaryComponent.__table__
+_employees = Employee.__table__
+
+_UPDATE_COMPONENT = update(_components).where(_components.c.id == bindparam('component_id'))
+_UPDATE_WAGE = update(_employees).where(_employees.c.id == bindparam('row_id'))
+
+
+class SalaryRevisionResult:
+    """Outcome of a bulk revision: counts plus seconds spent per phase"""
+
+    def __init__(self):
+        self.requested = 0
+        self.revised = 0
+        self.unchanged = 0
+        self.missing = []
+        self.components_updated = 0
+        self.components_inserted = 0
+        self.timings = defaultdict(float)
+
+    @property
+    def elapsed(self):
+        return sum(self.timings.values())
+
+    @property
+    def throughput(self):
+        """Employees revised per second"""
+        return self.revised / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        text = (f"revised {self.revised} of {self.requested} employees "
+                f"({self.unchanged} unchanged), {self.components_updated} components updated, "
+                f"{self.components_inserted} added in {self.elapsed:.2f}s "
+                f"({self.throughput:.0f} employees/s)")
+        if self.missing:
+            text += f"; unknown employee IDs: {', '.join(self.missing)}"
+        return text
+
+
+def parse_revisions(stream):
+    """
+    Revisions from CSV text with an employee_id column (the login ID) and
+    either new_wage or increment_percentage on each row.
+    Raises ValueError naming the first bad line.
+    """
+    if isinstance(stream, (bytes, bytearray)):
+        stream = stream.decode('utf-8-sig')
+    if isinstance(stream, str):
+        stream = io.StringIO(stream)
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames or 'employee_id' not in reader.fieldnames:
+        raise ValueError("CSV needs an employee_id column")
+
+    revisions = []
+    for line, row in enumerate(reader, start=2):
+        employee = (row.get('employee_id') or '').strip()
+        new_wage = (row.get('new_wage') or '').strip()
+        increment = (row.get('increment_percentage') or '').strip()
+        if not employee:
+            raise ValueError(f"Line {line}: missing employee_id")
+        if bool(new_wage) == bool(increment):
+            raise ValueError(f"Line {line}: give either new_wage or increment_percentage")
+        try:
+            amount = Decimal(new_wage or increment)
+            if not amount.is_finite():
+                raise InvalidOperation
+            revision = {'employee_id': employee,
+                        'new_wage': amount if new_wage else None,
+                        'increment_percentage': amount if increment else None,
+                        'line': line}
+        except InvalidOperation:
+            raise ValueError(f"Line {line}: amounts must be numbers")
+        if revision['new_wage'] is not None and revision['new_wage'] <= 0:
+            raise ValueError(f"Line {line}: new_wage must be positive")
+        if revision['increment_percentage'] is not None and revision['increment_percentage'] <= -100:
+            raise ValueError(f"Line {line}: increment_percentage must be above -100")
+        revisions.append(revision)
+    return revisions
+
+
+def increment_percentage(previous_wage, new_wage):
+    """Percentage change from previous_wage, or None without a previous wage"""
+    if not previous_wage:
+        return None
+    change = (to_decimal(new_wage) - to_decimal(previous_wage)) * 100 / to_decimal(previous_wage)
+    return change.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _revised_wage(previous_wage, revision):
+    """New wage for a revision, or None for an increment without a current wage"""
+    if revision['new_wage'] is not None:
+        return to_decimal(revision['new_wage']).quantize(CENT, rounding=ROUND_HALF_UP)
+    if not previous_wage:
+        return None
+    wage = to_decimal(previous_wage) * (100 + revision['increment_percentage']) / 100
+    return wage.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _line(revision):
+    """'Line N: ' for revisions read by parse_revisions"""
+    return f"Line {revision['line']}: " if revision.get('line') else ''
+
+
+def _stored_as(value):
+    """value as the Numeric(10, 2) component columns store it"""
+    if isinstance(value, (Decimal, int, float)) and not isinstance(value, bool):
+        return to_decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+    return value
+
+
+def _needs_update(row, component):
+    return any(_stored_as(getattr(row, field)) != _stored_as(component[field])
+               for field in _COMPONENT_FIELDS)
+
+
+def _existing_components(connection, employee_ids):
+    """{employee_id: {component name: row}} for the employees' components"""
+    existing = defaultdict(dict)
+    rows = connection.execute(
+        select(_components.c.id, _components.c.employee_id, _components.c.component_name,
+               *[_components.c[field] for field in _COMPONENT_FIELDS])
+        .where(_components.c.employee_id.in_(employee_ids))
+        .order_by(_components.c.employee_id, _components.c.is_active.desc(), _components.c.id)
+    ).all()
+    for row in rows:
+        # The first (active) row per name is the one kept up to date
+        existing[row.employee_id].setdefault(row.component_name, row)
+    return existing
+
+
+def sync_salary_components(employees, values=None, effective_date=None):
+    """
+    Bring the salary components of employees, a list of (employee_id, wage),
+    in line with the standard salary structure in the current transaction.
+    Each employee keeps their own rule values (e.g. a custom PF rate) unless
+    values gives {employee_id: {rule key: value}} overrides. Unpaid payroll of
+    employees whose components change is marked stale for the periods ending
+    on or after effective_date (today by default).
+    Returns (components updated, components inserted).
+    """
+    if not employees:
+        return 0, 0
+    values = values or {}
+    plan = salary_plan()
+    connection = db.session.connection()
+    existing = _existing_components(connection, [employee_id for employee_id, _ in employees])
+
+    # Per-employee rule values: explicit override, then the stored value, then the rule
+    rule_values = {}
+    for rule in plan.steps:
+        if rule.computation_type == 'remainder':
+            continue
+        column = []
+        for employee_id, _ in employees:
+            stored = existing[employee_id].get(rule.name)
+            if rule.key in values.get(employee_id, {}):
+                column.append(values[employee_id][rule.key])
+            elif (stored is not None and stored.is_active and stored.computation_type == rule.computation_type
+                  and stored.value != _stored_as(rule.value)):
+                # A value the employee was given rather than the rule's own, which
+                # may carry more decimals than the column keeps
+                column.append(stored.value)
+            else:
+                column.append(rule.value)
+        rule_values[rule.key] = column
+    evaluated = plan.evaluate([wage for _, wage in employees], values=rule_values)
+
+    updates, deactivations, inserts = [], [], []
+    changed = set()
+    for i, (employee_id, _) in enumerate(employees):
+        written = len(updates) + len(deactivations) + len(inserts)
+        stored = dict(existing[employee_id])
+        for component in plan.components(evaluated, i, values=rule_values):
+            row = stored.pop(component['component_name'], None)
+            if row is None:
+                inserts.append(dict(component, employee_id=employee_id))
+            elif _needs_update(row, component):
+                updates.append(dict(component, component_id=row.id))
+        # Structure components the plan left out (a remainder of 0) are switched off
+        for name, row in stored.items():
+            if name in plan.rules_by_name and row.is_active:
+                deactivations.append({'component_id': row.id, 'is_active': False})
+        if len(updates) + len(deactivations) + len(inserts) > written:
+            changed.add(employee_id)
+
+    if updates:
+        connection.execute(_UPDATE_COMPONENT, updates)
+    if deactivations:
+        connection.execute(_UPDATE_COMPONENT, deactivations)
+    if inserts:
+        connection.execute(insert(_components), inserts)
+    # Core writes bypass the ORM listeners, so mark dependent payroll here
+    if changed:
+        mark_payroll_stale(connection, 'salary', salary_change_days(changed, effective_date))
+    return len(updates) + len(deactivations), len(inserts)
+
+
+def _employee_wages(connection, codes):
+    """{login ID: (employee id, monthly wage)} for the given login IDs"""
+    rows = connection.execute(
+        select(User.employee_id, Employee.id, Employee.monthly_wage)
+        .join(Employee, Employee.user_id == User.id)
+        .where(User.employee_id.in_(codes))
+    ).all()
+    return {code: (employee_id, wage) for code, employee_id, wage in rows}
+
+
+def revise_salaries(revisions, effective_date=None, reason=None, revised_by=None,
+                    chunk_size=REVISION_CHUNK_SIZE, progress=None):
+    """
+    Apply revisions (dicts from parse_revisions) and record them in the
+    revision history. A later revision for the same employee replaces an
+    earlier one. Commits after each chunk and calls progress(done, total).
+    Raises ValueError, before writing its chunk, for a revision that would
+    leave an employee without a positive wage.
+    Returns a SalaryRevisionResult.
+    """
+    effective_date = effective_date or date.today()
+    result = SalaryRevisionResult()
+    revisions = list({revision['employee_id']: revision for revision in revisions}.values())
+    result.requested = len(revisions)
+
+    if progress:
+        progress(0, len(revisions))
+    for offset in range(0, len(revisions), chunk_size):
+        chunk = revisions[offset:offset + chunk_size]
+
+        started = time.perf_counter()
+        connection = db.session.connection()
+        wages = _employee_wages(connection, [revision['employee_id'] for revision in chunk])
+        changed = []
+        for revision in chunk:
+            if revision['employee_id'] not in wages:
+                result.missing.append(revision['employee_id'])
+                continue
+            employee_id, previous_wage = wages[revision['employee_id']]
+            new_wage = _revised_wage(previous_wage, revision)
+            if new_wage is not None and new_wage <= 0:
+                raise ValueError(f"{_line(revision)}revising {revision['employee_id']} from {previous_wage} "
+                                 f"leaves no wage ({new_wage})")
+            if new_wage is None or (previous_wage is not None and to_decimal(previous_wage) == new_wage):
+                result.unchanged += 1
+                continue
+            changed.append((employee_id, previous_wage, new_wage))
+        result.timings['load'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        updated, inserted = sync_salary_components([(employee_id, new_wage)
+                                                    for employee_id, _, new_wage in changed],
+                                                   effective_date=effective_date)
+        result.timings['components'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        if changed:
+            now = datetime.utcnow()
+            connection.execute(_UPDATE_WAGE, [
+                {'row_id': employee_id, 'monthly_wage': new_wage, 'salary': new_wage, 'updated_at': now}
+                for employee_id, _, new_wage in changed
+            ])
+            connection.execute(insert(SalaryRevision.__table__), [
+                {'employee_id': employee_id, 'previous_wage': previous_wage, 'new_wage': new_wage,
+                 'increment_percentage': increment_percentage(previous_wage, new_wage),
+                 'effective_date': effective_date, 'reason': reason, 'revised_by': revised_by,
+                 'created_at': now}
+                for employee_id, previous_wage, new_wage in changed
+            ])
+        db.session.commit()
+        result.timings['write'] += time.perf_counter() - started
+
+        result.revised += len(changed)
+        result.components_updated += updated
+        result.components_inserted += inserted
+        if progress:
+            progress(min(offset + chunk_size, len(revisions)), len(revisions))
+    return result
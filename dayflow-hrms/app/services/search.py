@@ -0,0 +1,190 @@
+"""
+Employee directory search
+On SQLite the directory is indexed in an FTS5 table (employee_search) kept
+in sync by ORM flush events; PostgreSQL, and SQLite built without FTS5,
+fall back to index-friendly prefix LIKE matching on the source columns.
+These are the two databases Dayflow supports (see tracking.upsert_insert).
+"""
+import re
+import weakref
+from sqlalchemy import event, text, select, table, column, or_, and_, case, true
+from sqlalchemy.orm import attributes
+from app.models import db, User, Employee
+
+SEARCH_TABLE = 'employee_search'
+AUTOCOMPLETE_LIMIT = 10
+
+_EMPLOYEE_FIELDS = ('first_name', 'last_name', 'department', 'position', 'skills')
+_USER_FIELDS = ('employee_id', 'email')
+
+_search_table = table(SEARCH_TABLE, column('rowid'))
+_fts_engines = weakref.WeakKeyDictionary()  # engine -> bool (FTS index present)
+
+_CREATE_INDEX = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+    full_name, employee_code, email, department, position, skills,
+    prefix='2 3'
+)
+"""
+
+_INDEX_ROWS = f"""
+INSERT INTO {SEARCH_TABLE} (rowid, full_name, employee_code, email, department, position, skills)
+SELECT employees.id,
+       employees.first_name || ' ' || employees.last_name,
+       users.employee_id, users.email,
+       coalesce(employees.department, ''), coalesce(employees.position, ''),
+       coalesce(employees.skills, '')
+FROM employees JOIN users ON users.id = employees.user_id
+"""
+
+
+def search_tokens(term):
+    """Word tokens of a search box entry"""
+    return re.findall(r'\w+', term or '')
+
+
+def _match_expression(tokens):
+    """FTS5 query requiring every token as a prefix, quoted so input cannot inject syntax"""
+    return ' '.join('"{}"*'.format(token.replace('"', '')) for token in tokens)
+
+
+def fts_enabled(connection):
+    """Whether connection's database has the FTS directory index"""
+    engine = connection.engine
+    if engine not in _fts_engines:
+        enabled = False
+        if connection.dialect.name == 'sqlite':
+            enabled = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': SEARCH_TABLE}
+            ).first() is not None
+        _fts_engines[engine] = enabled
+    return _fts_engines[engine]
+
+
+def rebuild_search_index(connection, employee_ids=None):
+    """Re-index some (or all) employees from the employees and users tables"""
+    if employee_ids is None:
+        connection.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+        connection.execute(text(_INDEX_ROWS))
+        return
+    ids = sorted(employee_ids)
+    if not ids:
+        return
+    placeholders = ', '.join(f':id{i}' for i in range(len(ids)))
+    params = {f'id{i}': employee_id for i, employee_id in enumerate(ids)}
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})"), params)
+    connection.execute(text(f"{_INDEX_ROWS} WHERE employees.id IN ({placeholders})"), params)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    """Create and backfill the FTS index alongside db.create_all() on SQLite"""
+    if connection.dialect.name != 'sqlite':
+        return
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': SEARCH_TABLE}
+    ).first()
+    if exists:
+        return
+    try:
+        connection.execute(text(_CREATE_INDEX))
+    except Exception:
+        # SQLite built without FTS5: the LIKE fallback is used instead
+        return
+    _fts_engines.pop(connection.engine, None)
+    rebuild_search_index(connection)
+
+
+def _changed(obj, fields):
+    return any(attributes.get_history(obj, field).has_changes() for field in fields)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_search_changes(session, flush_context, instances):
+    """Remember which employees need re-indexing after this flush"""
+    reindex = session.info.setdefault('search_reindex', set())
+    removed = session.info.setdefault('search_remove', set())
+    for obj in session.deleted:
+        if isinstance(obj, Employee):
+            removed.add(obj.id)
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, Employee) and (obj in session.new or _changed(obj, _EMPLOYEE_FIELDS)):
+                reindex.add(obj)
+            elif isinstance(obj, User) and obj not in session.new and _changed(obj, _USER_FIELDS):
+                profile = obj.employee_profile
+                if profile is not None:
+                    reindex.add(profile)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _apply_search_changes(session, flush_context):
+    """Re-index changed employees inside the flushing transaction"""
+    reindex = session.info.pop('search_reindex', set())
+    removed = session.info.pop('search_remove', set())
+    if not reindex and not removed:
+        return
+    connection = session.connection()
+    if not fts_enabled(connection):
+        return
+    employee_ids = {employee.id for employee in reindex if employee.id is not None} - removed
+    rebuild_search_index(connection, employee_ids | removed)
+
+
+def employee_search_filter(term):
+    """
+    Criterion restricting an Employee query (already joined to User) to
+    employees matching every token of term as a word prefix.
+    """
+    tokens = search_tokens(term)
+    if not tokens:
+        return true()
+    if fts_enabled(db.session.connection()):
+        matches = select(_search_table.c.rowid).where(
+            text(f"{SEARCH_TABLE} MATCH :search_match").bindparams(search_match=_match_expression(tokens))
+        )
+        return Employee.id.in_(matches)
+    return and_(*[
+        or_(
+            Employee.first_name.like(f'{token}%'),
+            Employee.last_name.like(f'{token}%'),
+            User.employee_id.like(f'{token}%'),
+            User.email.like(f'{token}%'),
+            Employee.department.like(f'{token}%'),
+            Employee.position.like(f'{token}%'),
+            Employee.skills.like(f'{token}%')
+        )
+        for token in tokens
+    ])
+
+
+def autocomplete_employees(term, limit=AUTOCOMPLETE_LIMIT):
+    """Best matches for term, ranked by relevance, as (Employee, User) pairs"""
+    tokens = search_tokens(term)
+    if not tokens:
+        return []
+
+    if fts_enabled(db.session.connection()):
+        ranked = db.session.execute(
+            text(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :search_match "
+                 "ORDER BY rank LIMIT :limit"),
+            {'search_match': _match_expression(tokens), 'limit': limit}
+        ).scalars().all()
+        if not ranked:
+            return []
+        rows = db.session.query(Employee, User).join(User).filter(Employee.id.in_(ranked)).all()
+        position = {employee_id: i for i, employee_id in enumerate(ranked)}
+        return sorted(rows, key=lambda row: position[row[0].id])
+
+    first = tokens[0]
+    rank = case(
+        (Employee.first_name.like(f'{first}%'), 0),
+        (Employee.last_name.like(f'{first}%'), 1),
+        (User.employee_id.like(f'{first}%'), 2),
+        else_=3
+    )
+    return db.session.query(Employee, User).join(User).filter(
+        employee_search_filter(term)
+    ).order_by(rank, Employee.first_name, Employee.last_name).limit(limit).all()
@@ -0,0 +1,139 @@
+"""
+JSON serializers
+Detail payloads for the admin modals, built from one joined SELECT of just
+the columns each payload needs (no ORM objects, no lazy loads) and encoded
+with orjson when it is installed. Responses carry a strong ETag of the
+encoded body, so reopening an unchanged record is answered with 304.
+"""
+import hashlib
+import json
+import os
+from flask import Response, request
+from sqlalchemy import select
+from app.models import db, User, Employee, LeaveRequest, Payroll
+
+try:
+    import orjson
+except ImportError:  # Same bytes shape from the standard library, just slower
+    orjson = None
+
+# Employee columns shared by every payload that names an employee
+EMPLOYEE_COLUMNS = (
+    Employee.first_name,
+    Employee.last_name,
+    Employee.department,
+    Employee.position,
+    User.employee_id.label('employee_code'),
+)
+
+PAYROLL_AMOUNTS = (
+    'base_monthly_salary', 'basic_salary', 'hra', 'standard_allowance', 'performance_bonus',
+    'lta', 'fixed_allowance', 'allowances', 'increment_amount', 'increment_percentage',
+    'special_bonus', 'festival_bonus', 'other_earnings', 'overtime_hours', 'overtime_rate',
+    'pf_deduction', 'professional_tax', 'deductions', 'tax_deductions', 'unpaid_leave_deduction',
+    'gross_pay', 'total_deductions', 'net_pay',
+)
+PAYROLL_DAYS = ('days_present', 'total_working_days', 'unpaid_leave_days', 'paid_leave_days')
+
+LEAVE_REQUEST_FIELDS = ('leave_type', 'days_requested', 'reason', 'status', 'admin_comment',
+                        'certificate_path')
+
+
+def _number(value):
+    """Numeric column as a JSON number; unset amounts count as 0"""
+    return 0.0 if value is None else float(value)
+
+
+def _iso(value):
+    return value.strftime('%Y-%m-%d') if value else None
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def json_response(data):
+    """JSON response with a strong ETag; 304 when the client's copy is current"""
+    body = dumps(data)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(hashlib.sha256(body).hexdigest())
+    # Cache but revalidate on every open
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def with_employee(query, employee_id_column):
+    """Join the employee and login account onto a query selecting EMPLOYEE_COLUMNS"""
+    return (query.join(Employee, Employee.id == employee_id_column)
+            .outerjoin(User, User.id == Employee.user_id))
+
+
+def serialize_employee(row):
+    """Employee identity fields of a row selected with EMPLOYEE_COLUMNS"""
+    return {
+        'employee_name': f'{row.first_name} {row.last_name}',
+        'employee_id': row.employee_code,
+        'department': row.department,
+        'position': row.position,
+    }
+
+
+def payroll_query():
+    return with_employee(
+        select(Payroll.id, Payroll.pay_period_start, Payroll.pay_period_end,
+               Payroll.payment_status, Payroll.created_at,
+               *(getattr(Payroll, name) for name in PAYROLL_AMOUNTS + PAYROLL_DAYS),
+               *EMPLOYEE_COLUMNS),
+        Payroll.employee_id
+    )
+
+
+def serialize_payroll(row):
+    data = {
+        'id': row.id,
+        **serialize_employee(row),
+        'pay_period': f'{_iso(row.pay_period_start)} to {_iso(row.pay_period_end)}',
+    }
+    for name in PAYROLL_AMOUNTS:
+        data[name] = _number(getattr(row, name))
+    # Same product the payroll kernel adds to gross pay
+    data['overtime_pay'] = data['overtime_hours'] * data['overtime_rate']
+    for name in PAYROLL_DAYS:
+        data[name] = int(getattr(row, name) or 0)
+    data['payment_status'] = row.payment_status or 'pending'
+    data['created_at'] = _iso(row.created_at)
+    return data
+
+
+def payroll_detail(payroll_id):
+    """Payroll modal payload, or None if the row does not exist"""
+    row = db.session.execute(payroll_query().where(Payroll.id == payroll_id)).first()
+    return serialize_payroll(row) if row else None
+
+
+def leave_request_query():
+    return with_employee(
+        select(LeaveRequest.id, LeaveRequest.start_date, LeaveRequest.end_date,
+               *(getattr(LeaveRequest, name) for name in LEAVE_REQUEST_FIELDS),
+               *EMPLOYEE_COLUMNS),
+        LeaveRequest.employee_id
+    )
+
+
+def serialize_leave_request(row):
+    data = {'id': row.id, **serialize_employee(row)}
+    data.update({name: getattr(row, name) for name in LEAVE_REQUEST_FIELDS})
+    data['start_date'] = _iso(row.start_date)
+    data['end_date'] = _iso(row.end_date)
+    data['certificate_filename'] = os.path.basename(row.certificate_path) if row.certificate_path else None
+    return data
+
+
+def leave_request_detail(request_id):
+    """Leave request modal payload, or None if the request does not exist"""
+    row = db.session.execute(leave_request_query().where(LeaveRequest.id == request_id)).first()
+    return serialize_leave_request(row) if row else None
@@ -0,0 +1,166 @@
+"""
+Employee dashboard snapshot service
+Loads everything the employee dashboard shows in one composed query and
+caches it per employee until an attendance, leave or payroll write for
+that employee is committed
+"""
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select, true
+from app.services.tracking import loaded_value
+from app.models import db, Attendance, LeaveRequest, Payroll
+
+DEFAULT_SNAPSHOT_TTL = 300  # Seconds a snapshot is reused without a write
+RECENT_DAYS = 7
+
+_PENDING_KEY = 'snapshot_invalidations'
+
+# Detached, cache-safe stand-ins for the ORM rows the template reads
+AttendanceDay = namedtuple('AttendanceDay', 'id date check_in_time check_out_time hours_worked status')
+PayrollBrief = namedtuple('PayrollBrief', 'id pay_period_start pay_period_end net_pay payment_status')
+
+_ATTENDANCE_FIELDS = AttendanceDay._fields
+_PAYROLL_FIELDS = PayrollBrief._fields
+
+
+class EmployeeSnapshot:
+    """Dashboard figures for one employee as of one day"""
+
+    def __init__(self, employee_id, taken_on, todays_attendance, recent_attendance,
+                 pending_leaves, approved_leaves, latest_payroll, total_hours):
+        self.employee_id = employee_id
+        self.taken_on = taken_on
+        self.todays_attendance = todays_attendance
+        self.recent_attendance = recent_attendance
+        self.pending_leaves = pending_leaves
+        self.approved_leaves = approved_leaves
+        self.latest_payroll = latest_payroll
+        self.total_hours = total_hours
+
+    @classmethod
+    def load(cls, employee_id, today=None):
+        """Build a snapshot with a single SELECT"""
+        today = today or date.today()
+        first_of_month = today.replace(day=1)
+
+        pending = select(func.count(LeaveRequest.id)).where(
+            LeaveRequest.employee_id == employee_id,
+            LeaveRequest.status == 'pending'
+        ).scalar_subquery()
+        approved = select(func.count(LeaveRequest.id)).where(
+            LeaveRequest.employee_id == employee_id,
+            LeaveRequest.status == 'approved',
+            LeaveRequest.start_date >= first_of_month
+        ).scalar_subquery()
+        hours = select(func.coalesce(func.sum(Attendance.hours_worked), 0)).where(
+            Attendance.employee_id == employee_id,
+            Attendance.date >= first_of_month,
+            Attendance.status.in_(['present', 'half_day'])
+        ).scalar_subquery()
+        stats = select(
+            pending.label('pending_leaves'),
+            approved.label('approved_leaves'),
+            hours.label('total_hours')
+        ).cte('stats')
+
+        attendance_columns = [getattr(Attendance, field) for field in _ATTENDANCE_FIELDS]
+        todays = select(*attendance_columns).where(
+            Attendance.employee_id == employee_id,
+            Attendance.date == today
+        ).cte('todays_attendance')
+        recent = select(*attendance_columns).where(
+            Attendance.employee_id == employee_id,
+            Attendance.date >= today - timedelta(days=RECENT_DAYS)
+        ).order_by(Attendance.date.desc()).limit(RECENT_DAYS).cte('recent_attendance')
+        latest = select(*[getattr(Payroll, field) for field in _PAYROLL_FIELDS]).where(
+            Payroll.employee_id == employee_id
+        ).order_by(Payroll.created_at.desc(), Payroll.id.desc()).limit(1).cte('latest_payroll')
+
+        # One row per recent attendance day (at least one), each carrying the stats
+        rows = db.session.execute(
+            select(
+                stats.c.pending_leaves, stats.c.approved_leaves, stats.c.total_hours,
+                *[todays.c[field].label(f'today_{field}') for field in _ATTENDANCE_FIELDS],
+                *[latest.c[field].label(f'payroll_{field}') for field in _PAYROLL_FIELDS],
+                *[recent.c[field].label(f'recent_{field}') for field in _ATTENDANCE_FIELDS]
+            ).select_from(stats)
+            .outerjoin(todays, true())
+            .outerjoin(latest, true())
+            .outerjoin(recent, true())
+            .order_by(recent.c.date.desc())
+        ).mappings().all()
+
+        first = rows[0]
+        return cls(
+            employee_id=employee_id,
+            taken_on=today,
+            todays_attendance=_unpack(first, 'today_', AttendanceDay),
+            recent_attendance=[day for day in (_unpack(row, 'recent_', AttendanceDay) for row in rows) if day],
+            pending_leaves=first['pending_leaves'] or 0,
+            approved_leaves=first['approved_leaves'] or 0,
+            latest_payroll=_unpack(first, 'payroll_', PayrollBrief),
+            total_hours=round(float(first['total_hours'] or 0), 1)
+        )
+
+
+def _unpack(row, prefix, kind):
+    """kind built from the prefixed columns of row, or None for an outer-join miss"""
+    if row[f'{prefix}id'] is None:
+        return None
+    return kind(*(row[f'{prefix}{field}'] for field in kind._fields))
+
+
+def _snapshot_cache():
+    return current_app.extensions.setdefault('employee_snapshots', {})
+
+
+def employee_snapshot(employee_id):
+    """Cached dashboard snapshot for an employee, loading it on a miss"""
+    today = date.today()
+    ttl = current_app.config.get('EMPLOYEE_SNAPSHOT_TTL', DEFAULT_SNAPSHOT_TTL)
+    cache = _snapshot_cache()
+    now = time.monotonic()
+    cached = cache.get(employee_id)
+    if cached and cached[1] > now and cached[0].taken_on == today:
+        return cached[0]
+    snapshot = EmployeeSnapshot.load(employee_id, today)
+    cache[employee_id] = (snapshot, now + ttl)
+    return snapshot
+
+
+def invalidate_employee_snapshot(*employee_ids):
+    """Drop cached snapshots so the next dashboard load re-queries"""
+    if not has_app_context():
+        return
+    cache = _snapshot_cache()
+    for employee_id in employee_ids:
+        cache.pop(employee_id, None)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_snapshot_changes(session, flush_context, instances):
+    """Remember employees whose attendance, leave or payroll is being written"""
+    employee_ids = session.info.setdefault(_PENDING_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, (Attendance, LeaveRequest, Payroll)):
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        employee_ids.add(obj.employee_id)
+        if obj not in session.new:
+            employee_ids.add(loaded_value(obj, 'employee_id'))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed(session):
+    """Invalidate once the writes are visible to other requests"""
+    employee_ids = session.info.pop(_PENDING_KEY, None)
+    if employee_ids:
+        invalidate_employee_snapshot(*employee_ids)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_rolled_back(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
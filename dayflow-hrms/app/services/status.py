@@ -0,0 +1,52 @@
+"""
+Workforce status service
+Computes present / on_leave / absent for many employees at once
+"""
+from datetime import date
+from sqlalchemy import func, case, and_
+from app.models import db, Employee
+from app.services.leave_index import LeaveIntervalIndex
+
+STATUSES = ('present', 'on_leave', 'absent')
+
+
+def employees_on_leave(on_date, *criteria):
+    """Ids of employees matching criteria with approved leave on the date"""
+    return LeaveIntervalIndex.load(on_date, on_date, *criteria).employees_on_leave(on_date)
+
+
+def workforce_status(on_date=None, *criteria):
+    """
+    Return {employee_id: status} for every employee matching criteria.
+    Approved leave wins over attendance, as in Employee.status_on; leave comes
+    from the interval index, so this is two SELECTs regardless of headcount.
+    """
+    on_date = on_date or date.today()
+    on_leave = employees_on_leave(on_date, *criteria)
+    rows = db.session.query(Employee.id, Employee.present_on(on_date)).filter(*criteria).all()
+    return {
+        employee_id: 'on_leave' if employee_id in on_leave else 'present' if present else 'absent'
+        for employee_id, present in rows
+    }
+
+
+def workforce_status_counts(on_date=None, *criteria):
+    """
+    Return counts per status plus 'total' for employees matching criteria.
+    The few employees on leave come from the interval index; totals and
+    present are aggregated in SQL with one query.
+    """
+    on_date = on_date or date.today()
+    on_leave = employees_on_leave(on_date, *criteria)
+    present = and_(Employee.present_on(on_date), Employee.id.not_in(on_leave))
+    total, present_count = db.session.query(
+        func.count(Employee.id),
+        func.count(case((present, Employee.id)))
+    ).filter(*criteria).one()
+
+    return {
+        'present': present_count,
+        'on_leave': len(on_leave),
+        'absent': total - present_count - len(on_leave),
+        'total': total
+    }
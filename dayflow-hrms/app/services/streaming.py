@@ -0,0 +1,27 @@
+"""
+Helpers shared by streamed downloads
+"""
+
+
+class ChunkSink:
+    """Write-only, non-seekable file that hands back what was written so far"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
@@ -0,0 +1,38 @@
+"""
+Helpers shared by the ORM listeners that maintain derived tables
+"""
+from sqlalchemy import inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import attributes
+
+_UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def loaded_value(obj, attr):
+    """Value of attr as last loaded from the database (before pending changes)"""
+    history = attributes.get_history(obj, attr)
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    state = inspect(obj)
+    if history.added and state.has_identity and state.session is not None:
+        # Assigned while expired, so the old value was never loaded: read it
+        column = state.mapper.get_property(attr).columns[0]
+        key = zip(state.mapper.primary_key, state.identity)
+        with state.session.no_autoflush:
+            return state.session.execute(
+                select(column).where(*[pk == value for pk, value in key])
+            ).scalar()
+    return getattr(obj, attr)
+
+
+def upsert_insert(connection, table):
+    """
+    INSERT into table that supports ON CONFLICT on the connection's dialect.
+    Only SQLite and PostgreSQL have it; other databases are not supported.
+    """
+    insert = _UPSERT_INSERTS.get(connection.dialect.name)
+    if insert is None:
+        raise NotImplementedError(f"Dayflow supports SQLite and PostgreSQL, not {connection.dialect.name}")
+    return insert(table)
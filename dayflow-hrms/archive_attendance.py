@@ -0,0 +1,49 @@
+"""
+Move attendance older than the hot years into per-year archive tables
+Usage: python archive_attendance.py [--hot-years N] [--batch-size N] [--pause-ms N]
+Runs online: rows move in short chunked transactions, so check-ins keep
+working while it runs, and reads that reach back into archived years
+union the archive tables in. Safe to rerun; a run picks up where an
+interrupted one stopped.
+"""
+import argparse
+import sys
+import os
+
+# Add the project directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.attendance_archive import attendance_horizon, hot_years as configured_hot_years
+from app.services.attendance_archiver import ARCHIVE_BATCH_SIZE, archive_attendance
+
+def report_progress(year, moved):
+    print(f"  ⏳ {year}: {moved} rows archived")
+
+def archive(hot_years=None, batch_size=ARCHIVE_BATCH_SIZE, pause_ms=0):
+    """Archive every year before the horizon and print progress and totals"""
+    app = create_app()
+
+    with app.app_context():
+        if attendance_horizon(years=hot_years) > attendance_horizon():
+            print(f"❌ --hot-years {hot_years} is below ATTENDANCE_HOT_YEARS ({configured_hot_years()})")
+            return False
+        print(f"🗄  Archiving attendance before {attendance_horizon(years=hot_years).isoformat()}...")
+        try:
+            result = archive_attendance(hot_years, batch_size, pause_ms / 1000, progress=report_progress)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Archival failed: {e}")
+            return False
+
+        print(f"✅ {result.summary().capitalize()}")
+        return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Archive attendance older than the hot years')
+    parser.add_argument('--hot-years', type=int, help='calendar years to keep hot (default: ATTENDANCE_HOT_YEARS)')
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='rows moved per transaction')
+    parser.add_argument('--pause-ms', type=int, default=0, help='pause between chunks')
+    args = parser.parse_args()
+
+    sys.exit(0 if archive(args.hot_years, args.batch_size, args.pause_ms) else 1)
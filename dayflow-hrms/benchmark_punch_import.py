@@ -0,0 +1,102 @@
+"""
+Benchmark the bulk punch log import
+Usage: python benchmark_punch_import.py [PUNCHES] [EMPLOYEES] [DAYS]
+Builds a throwaway SQLite database with EMPLOYEES employees, writes a CSV
+punch log of PUNCHES punches spread over DAYS days (default 1,000,000
+punches, 2,000 employees, 25 days) with 0.1% bad lines, imports it and
+prints the time per phase and punches per second. The application
+database is not touched.
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# Add the project directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import insert, func, select
+
+from app import create_app, db
+from app.models import User, Employee, Attendance
+from app.services.punch_import import import_punch_log
+
+DEPARTMENTS = ('IT', 'HR', 'Sales', 'Finance', 'Operations')
+
+def seed_employees(count):
+    """Insert count users and employees with Core, returning their login IDs"""
+    badges = [f'BADGE{i:06d}' for i in range(count)]
+    connection = db.session.connection()
+    connection.execute(insert(User.__table__), [
+        {'employee_id': badge, 'email': f'{badge.lower()}@bench.dayflow', 'password_hash': 'not-used',
+         'role': 'employee', 'is_active': True, 'created_at': datetime.utcnow()}
+        for badge in badges
+    ])
+    user_ids = dict(connection.execute(select(User.employee_id, User.id)).all())
+    connection.execute(insert(Employee.__table__), [
+        {'user_id': user_ids[badge], 'first_name': 'Bench', 'last_name': badge,
+         'department': DEPARTMENTS[i % len(DEPARTMENTS)], 'position': 'Operator',
+         'working_hours_per_day': 8.0}
+        for i, badge in enumerate(badges)
+    ])
+    db.session.commit()
+    return badges
+
+def write_punch_log(path, badges, punches, days):
+    """CSV log with punches punch events, a handful of them unusable"""
+    rng = random.Random(7)
+    first_day = date.today() - timedelta(days=days)
+    per_day = max(1, punches // (len(badges) * days))
+    written = 0
+    with open(path, 'w', newline='') as log:
+        writer = csv.writer(log)
+        writer.writerow(('badge_id', 'timestamp', 'door'))
+        while written < punches:
+            for offset in range(days):
+                start = datetime.combine(first_day + timedelta(days=offset), datetime.min.time())
+                for badge in badges:
+                    for _ in range(per_day):
+                        if written == punches:
+                            return
+                        moment = start + timedelta(seconds=rng.randint(7 * 3600, 19 * 3600))
+                        if written % 1000 == 999:
+                            writer.writerow(('UNKNOWN', moment.isoformat(), 'D1'))
+                        else:
+                            writer.writerow((badge, moment.isoformat(timespec='seconds'), 'D1'))
+                        written += 1
+
+def run_benchmark(punches=1_000_000, employees=2_000, days=25):
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directory, 'bench.db')}"})
+        log_path = os.path.join(directory, 'punches.csv')
+
+        with app.app_context():
+            print(f"🏗  Seeding {employees} employees and writing {punches} punches over {days} days...")
+            badges = seed_employees(employees)
+            write_punch_log(log_path, badges, punches, days)
+            print(f"  📄 Punch log: {os.path.getsize(log_path) / 1e6:.1f} MB")
+
+            started = time.perf_counter()
+            with open(log_path, newline='') as log, open(os.devnull, 'w') as rejects:
+                result = import_punch_log(log, 'csv', rejects=rejects)
+            elapsed = time.perf_counter() - started
+
+            rows = db.session.scalar(select(func.count(Attendance.id)))
+            for phase, seconds in result.timings.items():
+                print(f"  ⏱ {phase}: {seconds:.2f}s")
+            print(f"✅ {result.summary().capitalize()}")
+            print(f"📈 {result.punches / elapsed:,.0f} punches/s end to end, {rows} attendance rows")
+            db.session.remove()
+            db.engine.dispose()
+    return True
+
+if __name__ == '__main__':
+    try:
+        arguments = [int(value) for value in sys.argv[1:4]]
+    except ValueError:
+        print("❌ Usage: python benchmark_punch_import.py [PUNCHES] [EMPLOYEES] [DAYS]")
+        sys.exit(1)
+    sys.exit(0 if run_benchmark(*arguments) else 1)
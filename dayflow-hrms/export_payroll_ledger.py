@@ -0,0 +1,67 @@
+"""
+Export the payroll ledger for spreadsheets and the data warehouse
+Usage: python export_payroll_ledger.py {csv,ndjson,parquet} OUTPUT
+           [--from YYYY-MM] [--to YYYY-MM] [--department DEPARTMENT] [--since-id ID]
+Rows are streamed in payroll id order with flat memory. --since-id resumes
+an export after the last payroll id already written; pass - as OUTPUT to
+write to standard output.
+"""
+import argparse
+import sys
+import os
+from datetime import date
+
+# Add the project directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.ledger_export import LEDGER_FORMATS, export_ledger
+from app.services.payroll_summary import month_bounds
+
+def pay_period(value):
+    """First day of a YYYY-MM argument"""
+    try:
+        year, month = (int(part) for part in value.split('-'))
+        return date(year, month, 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a YYYY-MM pay period")
+
+def export_payroll_ledger(fmt, output, period_start=None, period_to=None, department=None, since_id=None):
+    """Write the filtered ledger to output and report the bytes written"""
+    app = create_app()
+
+    with app.app_context():
+        period_end = month_bounds(period_to)[1] if period_to else None
+        log = sys.stderr if output == '-' else sys.stdout
+        print(f"📤 Exporting payroll ledger as {fmt}...", file=log)
+
+        written = 0
+        try:
+            target = sys.stdout.buffer if output == '-' else open(output, 'wb')
+            try:
+                for chunk in export_ledger(fmt, period_start, period_end, department, since_id):
+                    target.write(chunk)
+                    written += len(chunk)
+            finally:
+                if target is not sys.stdout.buffer:
+                    target.close()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Export failed after {written} bytes: {e}", file=log)
+            return False
+
+        print(f"✅ Wrote {written} bytes to {output}", file=log)
+        return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the payroll ledger')
+    parser.add_argument('format', choices=list(LEDGER_FORMATS))
+    parser.add_argument('output', help='file to write, or - for standard output')
+    parser.add_argument('--from', dest='period_from', type=pay_period, help='first pay period (YYYY-MM)')
+    parser.add_argument('--to', dest='period_to', type=pay_period, help='last pay period (YYYY-MM)')
+    parser.add_argument('--department')
+    parser.add_argument('--since-id', type=int, help='only payroll ids after this one')
+    args = parser.parse_args()
+
+    sys.exit(0 if export_payroll_ledger(args.format, args.output, args.period_from, args.period_to,
+                                        args.department, args.since_id) else 1)
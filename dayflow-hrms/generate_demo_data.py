@@ -16,6 +16,9 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app, db
 from app.models import User, Employee, Attendance, LeaveRequest, Payroll, SalaryComponent
+from app.payroll_kernel import apply_payroll
+from app.salary_structure import salary_plan
+from app.services.leave_index import LeaveIntervalIndex
 
 # Sample data
 FIRST_NAMES = ['Rahul', 'Priya', 'Amit', 'Sneha', 'Vikram', 'Anjali', 'Rohan', 'Kavita', 
@@ -143,30 +146,11 @@ def generate_employees(count=15):
 
 
 def generate_salary_components(employee):
-    """Generate salary components for an employee"""
-    base_salary = float(employee.monthly_wage) * 0.50
-    
-    components = [
-        {'name': 'Basic Salary', 'type': 'earning', 'comp_type': 'fixed', 'value': base_salary},
-        {'name': 'HRA', 'type': 'earning', 'comp_type': 'percentage', 'value': 50, 'base': 'Basic Salary', 'amount': base_salary * 0.50},
-        {'name': 'Transport Allowance', 'type': 'earning', 'comp_type': 'fixed', 'value': 1600},
-        {'name': 'Special Allowance', 'type': 'earning', 'comp_type': 'fixed', 'value': float(employee.monthly_wage) - base_salary - (base_salary * 0.50) - 1600 - 1800},
-        {'name': 'PF Deduction', 'type': 'deduction', 'comp_type': 'percentage', 'value': 12, 'base': 'Basic Salary', 'amount': base_salary * 0.12},
-        {'name': 'Professional Tax', 'type': 'deduction', 'comp_type': 'fixed', 'value': 200},
-    ]
-    
-    for comp in components:
-        component = SalaryComponent(
-            employee_id=employee.id,
-            component_name=comp['name'],
-            component_type=comp['type'],
-            computation_type=comp['comp_type'],
-            value=comp['value'],
-            base_component=comp.get('base'),
-            calculated_amount=comp.get('amount', comp['value']),
-            is_active=True
-        )
-        db.session.add(component)
+    """Generate salary components for an employee from the standard structure"""
+    plan = salary_plan()
+    evaluated = plan.evaluate([employee.monthly_wage])
+    for row in plan.components(evaluated, 0):
+        db.session.add(SalaryComponent(employee_id=employee.id, **row))
 
 
 def generate_attendance_data(employees):
@@ -345,10 +329,18 @@ def generate_payroll_data(employees):
         (date(2025, 12, 1), date(2025, 12, 31), 'December 2025'),
     ]
     
+    # Salary amounts for every employee from the standard structure
+    plan = salary_plan()
+    evaluated = plan.evaluate([employee.monthly_wage for employee in employees])
+    
     for pay_period_start, pay_period_end, month_name in months:
         print(f"\n  📊 Creating payroll for {month_name}...")
         
-        for employee in employees:
+        # Approved leave for the month, loaded once for every employee
+        leave_index = LeaveIntervalIndex.load(pay_period_start, pay_period_end)
+        
+        new_payrolls = []
+        for index, employee in enumerate(employees):
             # Check if payroll already exists
             existing = Payroll.query.filter_by(
                 employee_id=employee.id,
@@ -390,53 +382,32 @@ def generate_payroll_data(employees):
                 days_present = total_working_days  # Default to full month if no attendance data
             
             # Get paid and unpaid leave days
-            paid_leave_days = LeaveRequest.query.filter(
-                LeaveRequest.employee_id == employee.id,
-                LeaveRequest.status == 'approved',
-                LeaveRequest.leave_type.in_(['paid', 'sick']),
-                LeaveRequest.start_date <= pay_period_end,
-                LeaveRequest.end_date >= pay_period_start
-            ).with_entities(db.func.sum(LeaveRequest.days_requested)).scalar() or 0
-            
-            unpaid_leave_days = LeaveRequest.query.filter(
-                LeaveRequest.employee_id == employee.id,
-                LeaveRequest.status == 'approved',
-                LeaveRequest.leave_type == 'unpaid',
-                LeaveRequest.start_date <= pay_period_end,
-                LeaveRequest.end_date >= pay_period_start
-            ).with_entities(db.func.sum(LeaveRequest.days_requested)).scalar() or 0
-            
-            # Calculate salary components
-            base_monthly_salary = float(employee.monthly_wage)
-            basic_salary = base_monthly_salary * 0.50
-            hra = basic_salary * 0.50
-            standard_allowance = 1600.00
-            fixed_allowance = base_monthly_salary - basic_salary - hra - standard_allowance - 1800
+            paid_leave_days, unpaid_leave_days = leave_index.leave_days(
+                employee.id, pay_period_start, pay_period_end
+            )
             
-            # Calculate deductions
-            pf_deduction = basic_salary * 0.12
-            professional_tax = 200.00
+            structure = plan.payroll_fields(evaluated, index)
             
             # Create payroll record
             payroll = Payroll(
                 employee_id=employee.id,
                 pay_period_start=pay_period_start,
                 pay_period_end=pay_period_end,
-                base_monthly_salary=Decimal(str(base_monthly_salary)),
-                basic_salary=Decimal(str(basic_salary)),
-                hra=Decimal(str(hra)),
-                standard_allowance=Decimal(str(standard_allowance)),
-                fixed_allowance=Decimal(str(fixed_allowance)),
+                base_monthly_salary=Decimal(str(employee.monthly_wage)),
+                basic_salary=structure['basic_salary'],
+                hra=structure['hra'],
+                standard_allowance=structure['standard_allowance'],
+                fixed_allowance=structure['fixed_allowance'],
                 allowances=Decimal('0.00'),
-                performance_bonus=Decimal('0.00'),
-                lta=Decimal('0.00'),
+                performance_bonus=structure['performance_bonus'],
+                lta=structure['lta'],
                 increment_amount=Decimal('0.00'),
                 increment_percentage=Decimal('0.00'),
                 special_bonus=Decimal('0.00'),
                 festival_bonus=Decimal('0.00'),
                 other_earnings=Decimal('0.00'),
-                pf_deduction=Decimal(str(pf_deduction)),
-                professional_tax=Decimal(str(professional_tax)),
+                pf_deduction=structure['pf_deduction'],
+                professional_tax=structure['professional_tax'],
                 deductions=Decimal('0.00'),
                 tax_deductions=Decimal('0.00'),
                 unpaid_leave_deduction=Decimal('0.00'),
@@ -450,9 +421,11 @@ def generate_payroll_data(employees):
                 payment_status='paid' if pay_period_end < date.today() else 'pending'
             )
             
-            # Calculate all values
-            payroll.calculate_net_pay()
-            
+            new_payrolls.append((employee, payroll))
+        
+        # Calculate all values for the month in one kernel pass
+        apply_payroll([payroll for _, payroll in new_payrolls])
+        for employee, payroll in new_payrolls:
             db.session.add(payroll)
             print(f"    ✅ Created payroll for {employee.full_name}: ₹{payroll.net_pay:,.2f}")
         
@@ -0,0 +1,65 @@
+"""
+Import a turnstile or biometric punch log as attendance
+Usage: python import_punch_log.py FILE [--format {csv,ndjson}] [--rejects FILE] [--batch-size N]
+The log has badge_id (the employee's login ID) and timestamp columns, as
+CSV or one JSON object per line. Each employee-day keeps its first punch
+as check-in and its last as check-out. Rejected lines are written to
+FILE.rejects.csv unless --rejects says otherwise; pass - as FILE to read
+standard input.
+"""
+import argparse
+import io
+import sys
+import os
+
+# Add the project directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.punch_import import IMPORT_BATCH_SIZE, PUNCH_LOG_FORMATS, import_punch_log, punch_log_format
+
+def report_progress(done, total):
+    if total:
+        print(f"  ⏳ {done}/{total} employee-days written ({done * 100 // total}%)")
+
+def import_punches(path, fmt=None, rejects_path=None, batch_size=IMPORT_BATCH_SIZE):
+    """Import the punch log at path and print progress, rejects and throughput"""
+    app = create_app()
+    fmt = fmt or punch_log_format(path)
+    rejects_path = rejects_path or (f"{path}.rejects.csv" if path != '-' else 'punch-log.rejects.csv')
+
+    with app.app_context():
+        print(f"🕘 Importing punch log {path} ({fmt})...")
+        try:
+            source = (io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='') if path == '-'
+                      else open(path, newline='', encoding='utf-8-sig'))
+            with source, open(rejects_path, 'w', newline='', encoding='utf-8') as rejects:
+                result = import_punch_log(source, fmt, rejects=rejects, batch_size=batch_size,
+                                          progress=report_progress)
+        except (OSError, ValueError) as e:
+            db.session.rollback()
+            print(f"❌ Could not import {path}: {e}")
+            return False
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Punch log import failed: {e}")
+            return False
+
+        for phase, seconds in result.timings.items():
+            print(f"  ⏱ {phase}: {seconds:.2f}s")
+        if result.rejected:
+            print(f"⚠️  Reject report written to {rejects_path}")
+        else:
+            os.remove(rejects_path)
+        print(f"✅ {result.summary().capitalize()}")
+        return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import a punch log as attendance')
+    parser.add_argument('file', help='punch log to import, or - for standard input')
+    parser.add_argument('--format', choices=PUNCH_LOG_FORMATS, help='defaults to the file extension')
+    parser.add_argument('--rejects', help='reject report path (default: FILE.rejects.csv)')
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='employee-days per transaction')
+    args = parser.parse_args()
+
+    sys.exit(0 if import_punches(args.file, args.format, args.rejects, args.batch_size) else 1)
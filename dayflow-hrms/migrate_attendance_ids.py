@@ -0,0 +1,106 @@
+"""
+Migration script to stop SQLite handing out attendance ids again. Without
+AUTOINCREMENT SQLite reuses the highest id once its row is deleted, and
+archived attendance keeps its ids, so a reused id clashes with an archived
+row. The attendance table is rebuilt with AUTOINCREMENT, hot rows that
+already share an id with an archived row are renumbered, and new ids
+start above every id in use. Other databases draw ids from a sequence.
+"""
+import sys
+import os
+
+# Add the project directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.models import Attendance, AttendanceArchive
+from app.services.attendance_archive import archive_table
+from sqlalchemy import text, select, func
+from sqlalchemy.schema import CreateTable
+
+REBUILT = 'attendance_rebuilt'
+
+def autoincrement_attendance_ids():
+    """Rebuild attendance with AUTOINCREMENT and keep its ids clear of archived ones"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            connection = db.session.connection()
+            if connection.dialect.name != 'sqlite':
+                print("✓ Attendance ids come from a sequence; nothing to do")
+                return True
+
+            tables = set(connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+            if 'attendance' not in tables and REBUILT in tables:
+                # An earlier run stopped between dropping the old table and renaming the new one
+                connection.execute(text(f"ALTER TABLE {REBUILT} RENAME TO attendance"))
+            schema = connection.execute(text(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'attendance'"
+            )).scalar()
+            if 'AUTOINCREMENT' not in schema.upper():
+                duplicates = connection.execute(text(
+                    "SELECT COUNT(*) FROM (SELECT 1 FROM attendance GROUP BY employee_id, date HAVING COUNT(*) > 1)"
+                )).scalar()
+                if duplicates:
+                    print(f"✗ {duplicates} employee-days have several attendance rows; "
+                          f"resolve them by hand (migrate_query_indexes.py lists them)")
+                    return False
+
+                # Fill a rebuilt copy first, so the original is only dropped once every row is safe
+                create = str(CreateTable(Attendance.__table__).compile(connection))
+                connection.execute(text(f"DROP TABLE IF EXISTS {REBUILT}"))
+                connection.execute(text(create.replace('CREATE TABLE attendance ', f'CREATE TABLE {REBUILT} ', 1)))
+                columns = ', '.join(column.name for column in Attendance.__table__.columns)
+                copied = connection.execute(text(
+                    f"INSERT INTO {REBUILT} ({columns}) SELECT {columns} FROM attendance"
+                )).rowcount
+                db.session.commit()
+                connection = db.session.connection()
+                if copied != connection.execute(text("SELECT COUNT(*) FROM attendance")).scalar():
+                    raise RuntimeError("attendance changed while it was copied; run the migration again")
+
+                indexes = connection.execute(text(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'attendance' "
+                    "AND sql IS NOT NULL"
+                )).scalars().all()
+                for name in indexes:
+                    connection.execute(text(f"DROP INDEX {name}"))
+                connection.execute(text("DROP TABLE attendance"))
+                connection.execute(text(f"ALTER TABLE {REBUILT} RENAME TO attendance"))
+                for index in Attendance.__table__.indexes:
+                    index.create(bind=connection)
+                print(f"✓ Rebuilt attendance with AUTOINCREMENT ids ({copied} rows)")
+
+            archives = [archive_table(year) for year in db.session.execute(select(AttendanceArchive.year)).scalars()]
+            archived_ids = set()
+            for table in archives:
+                archived_ids.update(connection.execute(select(table.c.id)).scalars())
+            top = max([connection.execute(select(func.max(Attendance.id))).scalar() or 0,
+                       *[connection.execute(select(func.max(table.c.id))).scalar() or 0 for table in archives]])
+
+            clashing = connection.execute(
+                select(Attendance.id).where(Attendance.id.in_(sorted(archived_ids))).order_by(Attendance.id)
+            ).scalars().all() if archived_ids else []
+            for old_id in clashing:
+                top += 1
+                connection.execute(text("UPDATE attendance SET id = :new WHERE id = :old"),
+                                   {'new': top, 'old': old_id})
+            print(f"✓ Renumbered {len(clashing)} attendance rows sharing an id with archived rows")
+
+            connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'attendance'"))
+            connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('attendance', :top)"),
+                               {'top': top})
+            print(f"✓ New attendance ids start after {top}")
+
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Migration failed: {e}")
+            return False
+
+        print("\n✓ Migration completed successfully!")
+        return True
+
+if __name__ == '__main__':
+    sys.exit(0 if autoincrement_attendance_ids() else 1)
@@ -0,0 +1,59 @@
+"""
+Migration script to make created_at required on employees, leave requests
+and payroll, the columns their admin listings page through with (created_at,
+id) cursors. Rows without one are backfilled first.
+"""
+import sys
+import os
+
+# Add the project directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from sqlalchemy import text
+
+# Best stand-in for when each row was created
+BACKFILLS = {
+    'employees': "COALESCE(updated_at, hire_date, CURRENT_TIMESTAMP)",
+    'leave_requests': "COALESCE(updated_at, start_date, CURRENT_TIMESTAMP)",
+    'payroll': "COALESCE(pay_period_end, CURRENT_TIMESTAMP)",
+}
+
+# SQLite cannot add NOT NULL to an existing column, so triggers enforce it there
+SQLITE_GUARD = """
+CREATE TRIGGER IF NOT EXISTS {table}_created_at_{event}
+BEFORE {event} ON {table} WHEN NEW.created_at IS NULL
+BEGIN SELECT RAISE(ABORT, 'NOT NULL constraint failed: {table}.created_at'); END
+"""
+
+def require_created_at():
+    """Backfill NULL created_at values, then forbid new ones"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            connection = db.session.connection()
+            for table, backfill in BACKFILLS.items():
+                filled = connection.execute(text(
+                    f"UPDATE {table} SET created_at = {backfill} WHERE created_at IS NULL"
+                )).rowcount
+                print(f"✓ Backfilled created_at on {filled} {table} rows")
+
+                if connection.dialect.name == 'sqlite':
+                    for event in ('INSERT', 'UPDATE'):
+                        connection.execute(text(SQLITE_GUARD.format(table=table, event=event)))
+                else:
+                    connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL"))
+                print(f"  ✓ {table}.created_at is required")
+
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Migration failed: {e}")
+            return False
+
+        print("\n✓ Migration completed successfully!")
+        return True
+
+if __name__ == '__main__':
+    sys.exit(0 if require_created_at() else 1)
@@ -31,7 +31,10 @@ def migrate_database():
                 'paid_leave_days': 'INTEGER DEFAULT 0',
                 'total_deductions': 'NUMERIC(10, 2) DEFAULT 0.00',
                 'payment_status': "VARCHAR(20) DEFAULT 'pending'",
-                'payment_date': 'DATE'
+                'payment_date': 'DATE',
+                # Existing rows count as entered by hand, so recomputes keep their figures
+                'days_present_derived': 'BOOLEAN DEFAULT FALSE NOT NULL',
+                'overtime_derived': 'BOOLEAN DEFAULT FALSE NOT NULL'
             }
             
             # Add missing columns
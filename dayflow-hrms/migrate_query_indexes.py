@@ -0,0 +1,99 @@
+"""
+Migration script to add the indexes behind the hot attendance, leave and
+payroll lookups, including the one-row-per-employee-per-day guarantee on
+attendance and the one-payroll-per-employee-per-period guarantee on payroll.
+Rows that would break those guarantees are listed, not deleted: the
+migration stops until they are resolved by hand.
+"""
+import sys
+import os
+
+# Add the project directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.models import Employee, Attendance, LeaveRequest, Payroll, SalaryComponent
+from sqlalchemy import text, inspect
+
+INDEXED_MODELS = (Employee, Attendance, LeaveRequest, Payroll, SalaryComponent)
+
+DUPLICATE_ATTENDANCE = """
+SELECT employee_id, date, COUNT(*) FROM attendance
+GROUP BY employee_id, date HAVING COUNT(*) > 1
+ORDER BY employee_id, date
+"""
+
+DUPLICATE_PAYROLL = """
+SELECT employee_id, pay_period_start, COUNT(*) FROM payroll
+GROUP BY employee_id, pay_period_start HAVING COUNT(*) > 1
+ORDER BY employee_id, pay_period_start
+"""
+
+# Duplicates listed in full before giving up
+LISTED_DUPLICATES = 20
+
+# Replaced by unique indexes of the same columns
+RETIRED_INDEXES = ('ix_payroll_employee_period',)
+
+def report_duplicates(connection, query, what):
+    """Print the keys query finds more than once; returns how many there are"""
+    duplicates = connection.execute(text(query)).all()
+    if not duplicates:
+        print(f"✓ No duplicate {what}")
+        return 0
+    print(f"✗ {len(duplicates)} duplicate {what}; resolve them by hand, then run this again:")
+    for *key, count in duplicates[:LISTED_DUPLICATES]:
+        print(f"    {', '.join(str(value) for value in key)}: {count} rows")
+    if len(duplicates) > LISTED_DUPLICATES:
+        print(f"    ... and {len(duplicates) - LISTED_DUPLICATES} more")
+    return len(duplicates)
+
+def add_query_indexes():
+    """Create missing model indexes, or list the rows that would violate them"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            connection = db.session.connection()
+            existing = {
+                index['name']
+                for model in INDEXED_MODELS
+                for index in inspect(connection).get_indexes(model.__tablename__)
+            }
+
+            # Duplicate rows would make the unique indexes fail
+            duplicates = report_duplicates(connection, DUPLICATE_ATTENDANCE, '(employee_id, date) attendance pairs')
+            duplicates += report_duplicates(connection, DUPLICATE_PAYROLL,
+                                            '(employee_id, pay_period_start) payroll pairs')
+            if duplicates:
+                db.session.rollback()
+                return False
+
+            for name in RETIRED_INDEXES:
+                if name in existing:
+                    connection.execute(text(f"DROP INDEX {name}"))
+                    print(f"  ✓ Dropped {name}")
+
+            for model in INDEXED_MODELS:
+                for index in sorted(model.__table__.indexes, key=lambda i: i.name):
+                    if index.name in existing:
+                        print(f"  ✓ {index.name} already exists")
+                        continue
+                    index.create(bind=connection)
+                    print(f"  ✓ Created {index.name}")
+
+            if connection.dialect.name == 'sqlite':
+                # Refresh planner statistics so the new indexes get picked
+                connection.execute(text("ANALYZE"))
+
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Migration failed: {e}")
+            return False
+
+        print("\n✓ Migration completed successfully!")
+        return True
+
+if __name__ == '__main__':
+    sys.exit(0 if add_query_indexes() else 1)
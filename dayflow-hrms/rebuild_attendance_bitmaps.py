@@ -0,0 +1,42 @@
+"""
+Rebuild the packed attendance_bitmaps rows from the attendance table
+Usage: python rebuild_attendance_bitmaps.py [YEAR]
+"""
+import sys
+import os
+import time
+
+# Add the project directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.attendance_bitmaps import rebuild_attendance_bitmaps
+
+def rebuild_bitmaps(year=None):
+    """Backfill the bitmaps for one year (or every year)"""
+    app = create_app()
+
+    with app.app_context():
+        print(f"🗓  Rebuilding attendance bitmaps ({year or 'all years'})...")
+
+        started = time.perf_counter()
+        try:
+            rows = rebuild_attendance_bitmaps(year)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Rebuild failed: {e}")
+            return False
+
+        elapsed = time.perf_counter() - started
+        print(f"✅ Wrote {rows} employee-year bitmaps in {elapsed:.2f}s")
+        return True
+
+if __name__ == '__main__':
+    try:
+        year = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    except ValueError:
+        print("❌ YEAR must be a number, e.g. 2026")
+        sys.exit(1)
+
+    sys.exit(0 if rebuild_bitmaps(year) else 1)
@@ -0,0 +1,48 @@
+"""
+Rebuild the daily_attendance_summary rollup from the attendance table
+Usage: python rebuild_attendance_summary.py [START_DATE] [END_DATE]   (YYYY-MM-DD)
+"""
+import sys
+import os
+import time
+from datetime import datetime
+
+# Add the project directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.attendance_summary import rebuild_daily_attendance_summary
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def rebuild_attendance_summary(start_date=None, end_date=None):
+    """Backfill the rollup for a date range (or the whole table)"""
+    app = create_app()
+
+    with app.app_context():
+        scope = f"{start_date or 'beginning'} to {end_date or 'today'}"
+        print(f"📊 Rebuilding daily attendance summary ({scope})...")
+
+        started = time.perf_counter()
+        try:
+            rows = rebuild_daily_attendance_summary(start_date, end_date)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Rebuild failed: {e}")
+            return False
+
+        elapsed = time.perf_counter() - started
+        print(f"✅ Wrote {rows} summary rows in {elapsed:.2f}s")
+        return True
+
+if __name__ == '__main__':
+    try:
+        start = parse_date(sys.argv[1]) if len(sys.argv) > 1 else None
+        end = parse_date(sys.argv[2]) if len(sys.argv) > 2 else None
+    except ValueError:
+        print("❌ Dates must be in YYYY-MM-DD format")
+        sys.exit(1)
+
+    sys.exit(0 if rebuild_attendance_summary(start, end) else 1)
@@ -0,0 +1,36 @@
+"""
+Rebuild the payroll_period_summary rollup from the payroll table
+Usage: python rebuild_payroll_summary.py
+"""
+import sys
+import os
+import time
+
+# Add the project directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.payroll_summary import rebuild_payroll_period_summary
+
+def rebuild_payroll_summary():
+    """Backfill the payroll rollup for every pay period"""
+    app = create_app()
+
+    with app.app_context():
+        print("💰 Rebuilding payroll period summary...")
+
+        started = time.perf_counter()
+        try:
+            rows = rebuild_payroll_period_summary()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Rebuild failed: {e}")
+            return False
+
+        elapsed = time.perf_counter() - started
+        print(f"✅ Wrote {rows} summary rows in {elapsed:.2f}s")
+        return True
+
+if __name__ == '__main__':
+    sys.exit(0 if rebuild_payroll_summary() else 1)
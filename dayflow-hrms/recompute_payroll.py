@@ -0,0 +1,40 @@
+"""
+Recompute payroll whose inputs changed after it was generated
+Usage: python recompute_payroll.py
+Attendance corrections, late leave approvals and salary changes mark the
+affected unpaid payroll records stale; only those records are recalculated.
+"""
+import sys
+import os
+
+# Add the project directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.payroll_recompute import recompute_stale_payroll
+
+def report_progress(done, total):
+    if total:
+        print(f"  ⏳ {done}/{total} stale payroll records processed ({done * 100 // total}%)")
+
+def recompute_payroll():
+    """Recalculate every stale payroll record and print progress and timings"""
+    app = create_app()
+
+    with app.app_context():
+        print("🔁 Recomputing stale payroll...")
+
+        try:
+            result = recompute_stale_payroll(progress=report_progress)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Payroll recompute failed: {e}")
+            return False
+
+        for phase, seconds in result.timings.items():
+            print(f"  ⏱ {phase}: {seconds:.2f}s")
+        print(f"✅ {result.summary().capitalize()}")
+        return True
+
+if __name__ == '__main__':
+    sys.exit(0 if recompute_payroll() else 1)
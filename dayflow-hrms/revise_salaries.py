@@ -0,0 +1,57 @@
+"""
+Apply a bulk salary revision from a CSV file
+Usage: python revise_salaries.py FILE.csv [YYYY-MM-DD] [REASON]
+The CSV has an employee_id column (the login ID) and either new_wage or
+increment_percentage on each row. Only salary components whose amounts
+change are updated, and every wage change is kept in the revision history.
+"""
+import sys
+import os
+from datetime import datetime
+
+# Add the project directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.salary_revision import parse_revisions, revise_salaries
+
+def report_progress(done, total):
+    if total:
+        print(f"  ⏳ {done}/{total} revisions applied ({done * 100 // total}%)")
+
+def apply_salary_revision(path, effective_date=None, reason=None):
+    """Revise salaries from the CSV at path and print progress and throughput"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as revisions_file:
+                revisions = parse_revisions(revisions_file)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not read {path}: {e}")
+            return False
+
+        print(f"💰 Revising salaries for {len(revisions)} employees...")
+        try:
+            result = revise_salaries(revisions, effective_date=effective_date, reason=reason,
+                                     progress=report_progress)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Salary revision failed: {e}")
+            return False
+
+        for phase, seconds in result.timings.items():
+            print(f"  ⏱ {phase}: {seconds:.2f}s")
+        print(f"✅ {result.summary()}")
+        return not result.missing
+
+if __name__ == '__main__':
+    try:
+        path = sys.argv[1]
+        effective_date = datetime.strptime(sys.argv[2], '%Y-%m-%d').date() if len(sys.argv) > 2 else None
+    except (IndexError, ValueError):
+        print("❌ Usage: python revise_salaries.py FILE.csv [YYYY-MM-DD] [REASON]")
+        sys.exit(1)
+
+    reason = sys.argv[3] if len(sys.argv) > 3 else None
+    sys.exit(0 if apply_salary_revision(path, effective_date, reason) else 1)
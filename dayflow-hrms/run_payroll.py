@@ -0,0 +1,50 @@
+"""
+Run month-end payroll for every active employee
+Usage: python run_payroll.py YYYY-MM [DEPARTMENT]
+Employees who already have payroll for the period are skipped, so the run
+can be repeated safely.
+"""
+import sys
+import os
+
+# Add the project directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.payroll_run import run_payroll
+
+def report_progress(done, total):
+    if total:
+        print(f"  ⏳ {done}/{total} payroll records written ({done * 100 // total}%)")
+
+def run_month_end_payroll(year, month, department=None):
+    """Generate the period's payroll and print progress and timings"""
+    app = create_app()
+
+    with app.app_context():
+        scope = department or 'all departments'
+        print(f"💰 Running payroll for {year}-{month:02d} ({scope})...")
+
+        try:
+            result = run_payroll(month, year, department=department, progress=report_progress)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Payroll run failed: {e}")
+            return False
+
+        for phase, seconds in result.timings.items():
+            print(f"  ⏱ {phase}: {seconds:.2f}s")
+        print(f"✅ {result.summary()}")
+        return True
+
+if __name__ == '__main__':
+    try:
+        year, month = (int(part) for part in sys.argv[1].split('-'))
+        if not 1 <= month <= 12:
+            raise ValueError
+    except (IndexError, ValueError):
+        print("❌ Usage: python run_payroll.py YYYY-MM [DEPARTMENT]")
+        sys.exit(1)
+
+    department = sys.argv[2] if len(sys.argv) > 2 else None
+    sys.exit(0 if run_month_end_payroll(year, month, department) else 1)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Attendance Archive Tests
+Years before the hot horizon move into per-year archive tables in chunks,
+reads that reach back past the horizon union them in while hot reads stay
+on the attendance table, archived years refuse writes, and check-ins keep
+working during an archival run
+"""
+
+import io
+import os
+import sys
+import threading
+from datetime import date, datetime, time as clock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from test_query_counts import create_test_app, seed_workforce
+from test_payslips import admin_client
+
+COLD_YEAR = date.today().year - 2
+OLDEST_YEAR = COLD_YEAR - 1
+
+
+def seed_old_attendance(app, employees=3):
+    """A week in each cold year for every employee, through the ORM; returns the employee ids"""
+    from app.models import db, Employee, Attendance
+
+    with app.app_context():
+        seed_workforce(employees)
+        ids = [employee.id for employee in Employee.query.order_by(Employee.id)]
+        for year in (OLDEST_YEAR, COLD_YEAR):
+            for day in range(2, 9):
+                for index, employee_id in enumerate(ids):
+                    status = ('present', 'absent', 'half_day', 'leave')[(day + index) % 4]
+                    db.session.add(Attendance(employee_id=employee_id, date=date(year, 3, day), status=status,
+                                              hours_worked=8.0 if status == 'present' else 0.0))
+        db.session.commit()
+    return ids
+
+
+def cold_rows(table):
+    from app.models import db
+
+    return db.session.scalar(select(func.count()).select_from(table).where(table.c.date < date(COLD_YEAR + 1, 1, 1)))
+
+
+def test_archival_moves_cold_years_and_reads_union_them(tmp_path):
+    """Payroll inputs, the admin day view, summary and bitmap rebuilds see archived days unchanged"""
+    from app.models import db, Employee, Attendance, AttendanceArchive
+    from app.services.attendance_archive import archive_table, attendance_entity, attendance_horizon
+    from app.services.attendance_archiver import archive_attendance
+    from app.services.attendance_bitmaps import rebuild_attendance_bitmaps
+    from app.services.attendance_summary import attendance_stats_for_day, rebuild_daily_attendance_summary
+    from app.services.payroll_inputs import payroll_inputs
+    from test_attendance_bitmaps import packed_bitmaps
+
+    app = create_test_app()
+    app.instance_path = str(tmp_path)
+    ids = seed_old_attendance(app)
+    old_day = date(COLD_YEAR, 3, 4)
+    with app.app_context():
+        assert attendance_horizon() == date(COLD_YEAR + 1, 1, 1)
+        span = (date(OLDEST_YEAR, 1, 1), date.today())
+        before = {employee_id: inputs.to_dict() for employee_id, inputs in payroll_inputs(*span).items()}
+        stats = attendance_stats_for_day(old_day)
+        bitmaps = packed_bitmaps()
+    page = admin_client(app).get(f'/admin/attendance?date={old_day.isoformat()}').get_data(as_text=True)
+
+    with app.app_context():
+        progress = []
+        result = archive_attendance(batch_size=4, progress=lambda year, moved: progress.append((year, moved)))
+        assert dict(result.moved) == {OLDEST_YEAR: 21, COLD_YEAR: 21}
+        assert result.chunks == 12 and progress[-1] == (COLD_YEAR, 21)
+        assert cold_rows(Attendance.__table__) == 0
+        assert Attendance.query.count() == len(ids)
+        registry = {archive.year: archive for archive in AttendanceArchive.query}
+        assert sorted(registry) == [OLDEST_YEAR, COLD_YEAR]
+        assert all(archive.row_count == 21 and archive.completed_at for archive in registry.values())
+        assert cold_rows(archive_table(COLD_YEAR)) == 21
+
+        # Hot reads stay on the attendance table; crossing reads union the archives in
+        assert attendance_entity(date.today(), date.today()) is Attendance
+        assert attendance_entity(date(COLD_YEAR, 3, 1), date(COLD_YEAR, 3, 31)) is not Attendance
+        assert {employee_id: inputs.to_dict() for employee_id, inputs in payroll_inputs(*span).items()} == before
+        assert payroll_inputs(date(COLD_YEAR, 3, 1), date(COLD_YEAR, 3, 31))[ids[0]].recorded == 7
+
+        rebuild_daily_attendance_summary()
+        rebuild_attendance_bitmaps()
+        db.session.commit()
+        assert attendance_stats_for_day(old_day) == stats
+        assert packed_bitmaps() == bitmaps
+
+        assert archive_attendance().summary().startswith('nothing to archive')
+    assert admin_client(app).get(f'/admin/attendance?date={old_day.isoformat()}').get_data(as_text=True) == page
+
+    with app.app_context():
+        # Deleting an employee removes their archived attendance too
+        db.session.delete(db.session.get(Employee, ids[0]))
+        db.session.commit()
+        table = archive_table(COLD_YEAR)
+        assert db.session.scalar(select(func.count()).select_from(table).where(table.c.employee_id == ids[0])) == 0
+        assert cold_rows(table) == 14
+
+
+def test_archived_years_are_read_only(tmp_path):
+    """Every attendance write path refuses days in an archived year"""
+    from app.models import db, Attendance, LeaveRequest
+    from app.services.attendance_archiver import archive_attendance
+    from app.services.leave_attendance import apply_leave_to_attendance
+    from app.services.punch_import import import_punch_log
+
+    app = create_test_app()
+    app.instance_path = str(tmp_path)
+    ids = seed_old_attendance(app)
+    old_day = date(COLD_YEAR, 3, 9)
+    with app.app_context():
+        archive_attendance()
+
+        db.session.add(Attendance(employee_id=ids[0], date=old_day, status='present'))
+        with pytest.raises(ValueError, match=f'{COLD_YEAR} is archived'):
+            db.session.commit()
+        db.session.rollback()
+
+        leave = LeaveRequest(employee_id=ids[0], leave_type='paid', start_date=old_day,
+                             end_date=date(COLD_YEAR, 3, 15), reason='Late entry', status='approved')
+        db.session.add(leave)
+        db.session.flush()
+        with pytest.raises(ValueError, match=f'{COLD_YEAR} is archived'):
+            apply_leave_to_attendance(leave)
+        db.session.rollback()
+
+        rejects = io.StringIO()
+        result = import_punch_log(io.StringIO(f"badge_id,timestamp\nEMP0000,{old_day.isoformat()}T09:00\n"
+                                              f"EMP0000,{date.today().isoformat()}T09:00\n"), rejects=rejects)
+        assert result.rejected == {'archived date': 1} and result.accepted == 1
+        assert cold_rows(Attendance.__table__) == 0
+
+    response = admin_client(app).post('/admin/update_attendance', data={
+        'employee_id': ids[0], 'date': old_day.isoformat(), 'status': 'present'})
+    assert response.get_json() == {'success': False,
+                                   'message': f'Attendance for {COLD_YEAR} is archived and read-only '
+                                              f'({old_day.isoformat()})'}
+
+
+def test_archived_years_follow_the_registry(tmp_path):
+    """Reads and write checks use the years actually archived, whatever ATTENDANCE_HOT_YEARS says later"""
+    from app.models import db, Attendance
+    from app.services.attendance_archive import attendance_entity
+    from app.services.attendance_archiver import archive_attendance
+
+    app = create_test_app()
+    app.instance_path = str(tmp_path)
+    ids = seed_old_attendance(app)
+    with app.app_context():
+        app.config['ATTENDANCE_HOT_YEARS'] = 5
+        with pytest.raises(ValueError, match='ATTENDANCE_HOT_YEARS keeps it hot'):
+            archive_attendance(hot_years=2)
+        assert cold_rows(Attendance.__table__) == 42
+
+        app.config['ATTENDANCE_HOT_YEARS'] = 2
+        archive_attendance()
+        app.config['ATTENDANCE_HOT_YEARS'] = 5
+        history = attendance_entity(date(COLD_YEAR, 1, 1), date(COLD_YEAR, 12, 31))
+        assert db.session.scalar(select(func.count(history.id))) == 21
+
+        db.session.add(Attendance(employee_id=ids[0], date=date(COLD_YEAR, 3, 9), status='present'))
+        with pytest.raises(ValueError, match=f'{COLD_YEAR} is archived'):
+            db.session.commit()
+        db.session.rollback()
+
+
+def test_hot_duplicates_replace_archived_days_and_ids_stay_unique(tmp_path):
+    """A day written hot after its year was archived replaces the archived copy; freed ids are not reused"""
+    from app.models import db, Employee, Attendance
+    from app.services.attendance_archive import archive_table, attendance_entity
+    from app.services.attendance_archiver import archive_attendance
+    from app.services.attendance_summary import apply_summary_deltas, attendance_stats_for_day
+    from test_attendance_summary import assert_summary_matches_attendance
+
+    app = create_test_app()
+    app.instance_path = str(tmp_path)
+    ids = seed_old_attendance(app)
+    old_day = date(COLD_YEAR, 3, 4)
+    with app.app_context():
+        # The newest row is a cold one, so archiving frees the highest id
+        db.session.add(Attendance(employee_id=ids[0], date=date(COLD_YEAR, 3, 10), status='present'))
+        db.session.commit()
+        archive_attendance()
+        table = archive_table(COLD_YEAR)
+        highest_archived = db.session.scalar(select(func.max(table.c.id)))
+        stats = attendance_stats_for_day(old_day)
+
+        # A write that reached the hot table before archived years refused them
+        archived = db.session.execute(select(table).where(table.c.employee_id == ids[1],
+                                                          table.c.date == old_day)).one()
+        status = 'leave' if archived.status != 'leave' else 'present'
+        now = datetime.utcnow()
+        db.session.execute(insert(Attendance.__table__).values(employee_id=ids[1], date=old_day, status=status,
+                                                               created_at=now, updated_at=now))
+        department = db.session.get(Employee, ids[1]).department
+        apply_summary_deltas(db.session.connection(), {(old_day, department, status): 1})
+        db.session.commit()
+
+        assert archive_attendance().moved[COLD_YEAR] == 1
+        assert cold_rows(Attendance.__table__) == 0 and cold_rows(table) == 22
+        assert db.session.execute(select(table.c.status).where(table.c.employee_id == ids[1],
+                                                               table.c.date == old_day)).scalar_one() == status
+        history = attendance_entity(date(COLD_YEAR, 1, 1), date(COLD_YEAR, 12, 31))
+        assert db.session.scalar(select(func.count(history.id)).where(history.date == old_day)) == len(ids)
+        assert attendance_stats_for_day(old_day)[status] == stats[status] + 1
+        assert attendance_stats_for_day(old_day)[archived.status] == stats[archived.status] - 1
+        assert_summary_matches_attendance()
+
+        db.session.add(Attendance(employee_id=ids[2], date=date.today().replace(month=1, day=1), status='present'))
+        db.session.commit()
+        assert db.session.scalar(select(func.max(Attendance.id))) > highest_archived
+
+
+def test_check_ins_continue_during_archival(tmp_path):
+    """Chunks are short transactions, so punches interleave with a running archival"""
+    from app.models import db, Employee, Attendance
+    from app.services.attendance_archive import archive_table
+    from app.services.attendance_archiver import archive_attendance
+    from app.services.punches import punch_in
+
+    app = create_test_app(f"sqlite:///{tmp_path / 'archive.db'}")
+    app.instance_path = str(tmp_path)
+    with app.app_context():
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('PRAGMA journal_mode=WAL')
+        seed_workforce(20)
+        Attendance.query.delete()
+        db.session.commit()
+        employees = [(employee.id, employee.department) for employee in Employee.query]
+        # Bulk history straight into the table: 20 employees x 200 days
+        db.session.execute(insert(Attendance.__table__), [
+            dict(employee_id=employee_id, date=date.fromordinal(date(COLD_YEAR, 1, 1).toordinal() + day),
+                 status='present', hours_worked=8.0)
+            for employee_id, _ in employees for day in range(200)
+        ])
+        db.session.commit()
+
+    errors, results = [], []
+
+    def archiver():
+        with app.app_context():
+            try:
+                results.append(archive_attendance(batch_size=100))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    thread = threading.Thread(target=archiver)
+    thread.start()
+    today = date.today()
+    with app.app_context():
+        checked_in = [punch_in(employee_id, department, today, clock(9)) for employee_id, department in employees]
+        db.session.remove()
+    thread.join()
+
+    assert errors == [] and all(checked_in)
+    assert results[0].moved[COLD_YEAR] == 4000 and results[0].chunks == 40
+    with app.app_context():
+        assert Attendance.query.filter_by(date=today, status='present').count() == 20
+        assert cold_rows(Attendance.__table__) == 0
+        assert cold_rows(archive_table(COLD_YEAR)) == 4000
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as directory:
+        test_archival_moves_cold_years_and_reads_union_them(Path(directory))
+    with tempfile.TemporaryDirectory() as directory:
+        test_archived_years_are_read_only(Path(directory))
+    with tempfile.TemporaryDirectory() as directory:
+        test_archived_years_follow_the_registry(Path(directory))
+    with tempfile.TemporaryDirectory() as directory:
+        test_hot_duplicates_replace_archived_days_and_ids_stay_unique(Path(directory))
+    with tempfile.TemporaryDirectory() as directory:
+        test_check_ins_continue_during_archival(Path(directory))
+    print("✅ Cold attendance is archived online and still read back")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Attendance Bitmap Tests
+Every attendance write, through the ORM or the bulk Core paths, leaves the
+packed per employee-year bitmaps equal to a rebuild from the attendance
+table, and the calendar and heatmap endpoints read them
+"""
+
+import io
+import os
+import sys
+from datetime import date, datetime, time as clock, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_query_counts import create_test_app, seed_workforce
+
+
+def packed_bitmaps():
+    from app.models import db, AttendanceBitmap
+
+    rows = db.session.execute(db.select(AttendanceBitmap.employee_id, AttendanceBitmap.year,
+                                        AttendanceBitmap.statuses, AttendanceBitmap.recorded))
+    return {(row.employee_id, row.year): (row.statuses, row.recorded) for row in rows if any(row.recorded)}
+
+
+def assert_bitmaps_match_attendance():
+    """The incrementally maintained bitmaps equal a rebuild from attendance"""
+    from app.models import db
+    from app.services.attendance_bitmaps import rebuild_attendance_bitmaps
+
+    maintained = packed_bitmaps()
+    rebuild_attendance_bitmaps()
+    assert packed_bitmaps() == maintained
+    db.session.rollback()
+
+
+def test_codes_round_trip():
+    """Each day's 2-bit code and recorded bit decode back, first and last day included"""
+    from app.services.attendance_bitmaps import STATUS_BYTES, RECORDED_BYTES, decode_days, set_day
+
+    statuses, recorded = bytearray(STATUS_BYTES), bytearray(RECORDED_BYTES)
+    for index, status in ((0, 'present'), (1, 'absent'), (2, 'half_day'), (3, 'leave'),
+                          (4, 'leave'), (364, 'present'), (365, 'half_day')):
+        set_day(statuses, recorded, index, status)
+    set_day(statuses, recorded, 4, None)
+    days = decode_days(statuses, recorded)
+    assert len(days) == 368
+    assert days[:6] == 'PAHL..' and days[364:366] == 'PH'
+    assert days.count('.') == 368 - 6
+
+
+def test_orm_and_core_writes_keep_bitmaps_exact(tmp_path):
+    """Admin marks, check-ins, leave approval and punch imports all patch the bitmaps"""
+    from app.models import db, Employee, Attendance, LeaveRequest
+    from app.services.punch_import import import_punch_log
+    from test_check_in import employee_client
+    from test_payslips import admin_client
+
+    app = create_test_app()
+    app.instance_path = str(tmp_path)
+    today = date.today()
+    with app.app_context():
+        seed_workforce(6)
+        ids = [employee.id for employee in Employee.query.order_by(Employee.id)]
+        assert_bitmaps_match_attendance()
+
+        # ORM update, move to another day, and delete
+        rows = {row.employee_id: row for row in Attendance.query}
+        rows[ids[0]].status = 'half_day'
+        rows[ids[1]].date = date(today.year - 1, 12, 31)
+        db.session.delete(rows[ids[2]])
+        db.session.add(Attendance(employee_id=ids[2], date=date(today.year, 1, 1), status='leave'))
+        db.session.commit()
+        assert_bitmaps_match_attendance()
+
+        leave = LeaveRequest(employee_id=ids[3], leave_type='paid', start_date=date(today.year, 3, 2),
+                             end_date=date(today.year, 3, 13), reason='Trip', status='pending')
+        db.session.add(leave)
+        db.session.commit()
+        leave_id = leave.id
+
+    assert employee_client(app, ids[4]).post('/employee/check_in').get_json()['success']
+    assert admin_client(app).post('/admin/update_leave_status',
+                                  json={'request_id': leave_id, 'status': 'approved'}).get_json()['success']
+    stamp = lambda day, hour: datetime.combine(day, clock(hour)).isoformat()
+    log = ('badge_id,timestamp\n'
+           f'EMP0005,{stamp(today, 9)}\nEMP0005,{stamp(today, 17)}\n'
+           f'EMP0000,{stamp(today - timedelta(days=3), 9)}\n')
+    with app.app_context():
+        import_punch_log(io.StringIO(log), 'csv')
+        assert_bitmaps_match_attendance()
+
+        # Deleting an employee drops their bitmaps with their attendance
+        db.session.delete(db.session.get(Employee, ids[3]))
+        db.session.commit()
+        assert ids[3] not in {employee_id for employee_id, _ in packed_bitmaps()}
+        assert_bitmaps_match_attendance()
+
+
+def test_calendar_and_heatmap_endpoints():
+    """A year for one employee and a month for a department, from the bitmaps"""
+    from app.models import db, Employee, Attendance
+    from test_check_in import employee_client
+    from test_payslips import admin_client
+
+    app = create_test_app()
+    today = date.today()
+    with app.app_context():
+        seed_workforce(6)
+        it = [employee.id for employee in Employee.query.filter_by(department='IT').order_by(Employee.id)]
+        db.session.add(Attendance(employee_id=it[0], date=date(today.year, 1, 2), status='leave'))
+        db.session.commit()
+
+    year = employee_client(app, it[0]).get('/employee/attendance/calendar').get_json()
+    assert year['year'] == today.year and len(year['days']) in (365, 366)
+    assert year['days'][1] == 'L' and year['days'][today.timetuple().tm_yday - 1] == 'A'
+    assert year['totals'] == {'absent': 1, 'present': 0, 'half_day': 0, 'leave': 1}
+    assert year['legend']['.'] == 'unrecorded'
+
+    client = admin_client(app)
+    assert client.get(f'/admin/attendance/calendar/{it[1]}?year=2020').get_json()['days'] == '.' * 366
+    assert client.get('/admin/attendance/calendar/9999').status_code == 404
+
+    month = client.get(f"/admin/attendance/heatmap?department=IT&month={today.strftime('%Y-%m')}").get_json()
+    assert [employee['id'] for employee in month['employees']] == it
+    # EMP0000 is absent today and EMP0003 present
+    assert [employee['days'][today.day - 1] for employee in month['employees']] == ['A', 'P']
+    assert len(month['totals']['present']) == len(month['employees'][0]['days'])
+    assert month['totals']['present'][today.day - 1] == 1
+    assert client.get('/admin/attendance/heatmap?department=IT&month=June').status_code == 400
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_codes_round_trip()
+    with tempfile.TemporaryDirectory() as directory:
+        test_orm_and_core_writes_keep_bitmaps_exact(Path(directory))
+    test_calendar_and_heatmap_endpoints()
+    print("✅ Attendance bitmaps follow every write and serve calendars")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Buffered Attendance Queue Tests
+In buffered mode punches are logged and acknowledged without touching the
+database, applied in batches by the flusher, replayed from the log after a
+restart, and flushed early for the employee who reads their own page
+"""
+
+import os
+import sys
+import time
+from datetime import date, time as clock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_query_counts import create_test_app, seed_workforce
+from test_check_in import employee_client
+
+
+def buffered_app(tmp_path, **config):
+    """App on a file database with punches queued behind tmp_path/events.log"""
+    from app.models import db, Attendance
+    from app.services.attendance_summary import rebuild_daily_attendance_summary
+
+    app = create_test_app(f"sqlite:///{tmp_path / 'queue.db'}")
+    app.config.update({'ATTENDANCE_WRITE_MODE': 'buffered', 'ATTENDANCE_EVENT_LOG': str(tmp_path / 'events.log'),
+                       'ATTENDANCE_FLUSH_INTERVAL_MS': 60000, 'ATTENDANCE_FLUSH_BATCH': 1000, **config})
+    with app.app_context():
+        seed_workforce(4)
+        Attendance.query.delete()
+        rebuild_daily_attendance_summary()
+        db.session.commit()
+    return app
+
+
+def employee_ids(app):
+    from app.models import Employee
+
+    with app.app_context():
+        return [employee.id for employee in Employee.query.order_by(Employee.id)]
+
+
+def recorded(app):
+    from app.models import Attendance
+
+    with app.app_context():
+        return {row.employee_id: row for row in Attendance.query}
+
+
+def test_punches_are_acknowledged_then_applied_in_one_flush(tmp_path):
+    """The employee's own page view flushes the queue before reading"""
+    from app.services.attendance_queue import attendance_queue, attendance_queue_metrics
+    from app.services.attendance_summary import attendance_stats_for_day
+    from test_payslips import admin_client
+
+    app = buffered_app(tmp_path)
+    first, second, third, _ = employee_ids(app)
+    clients = {employee_id: employee_client(app, employee_id) for employee_id in (first, second, third)}
+    for client in clients.values():
+        assert client.post('/employee/check_in').get_json()['success']
+    assert clients[first].post('/employee/check_in').get_json()['message'] == 'Already checked in today'
+    assert clients[third].post('/employee/check_out').get_json()['success']
+    assert clients[third].post('/employee/check_out').get_json()['message'] == 'Already checked out today'
+
+    assert recorded(app) == {}
+    with open(tmp_path / 'events.log') as log:
+        assert len(log.readlines()) == 4
+    metrics = admin_client(app).get('/admin/attendance/queue').get_json()
+    assert (metrics['mode'], metrics['depth'], metrics['enqueued'], metrics['flushes']) == ('buffered', 4, 4, 0)
+
+    # Reading their own dashboard applies the waiting punches first
+    assert clients[first].get('/employee_dashboard').status_code == 200
+    rows = recorded(app)
+    assert set(rows) == {first, second, third}
+    assert rows[third].check_out_time is not None and rows[first].check_out_time is None
+    assert os.path.getsize(tmp_path / 'events.log') == 0
+    with app.app_context():
+        assert attendance_stats_for_day(date.today())['present'] == 3
+        metrics = attendance_queue_metrics()
+        assert (metrics['depth'], metrics['applied'], metrics['flushes'], metrics['last_batch']) == (0, 4, 1, 4)
+        assert metrics['last_flush_ms'] > 0
+        attendance_queue().close()
+
+
+def test_flusher_applies_full_batches_in_the_background(tmp_path):
+    """Reaching the batch size wakes the flusher without waiting for the interval"""
+    from app.services.attendance_queue import attendance_queue
+    from app.services.punches import Punch
+
+    app = buffered_app(tmp_path, ATTENDANCE_FLUSH_BATCH=3)
+    ids = employee_ids(app)
+    with app.app_context():
+        queue = attendance_queue()
+        for employee_id in ids[:3]:
+            queue.append(Punch(employee_id, 'IT', date.today(), 'in', clock(9)))
+        deadline = time.monotonic() + 10
+        while queue.metrics()['applied'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert queue.metrics()['applied'] == 3
+        queue.close()
+    assert set(recorded(app)) == set(ids[:3])
+
+
+def test_logged_punches_are_replayed_after_a_restart(tmp_path):
+    """Events left in the log are applied once; a torn last line is skipped"""
+    from app.services.attendance_queue import attendance_queue, _encode
+    from app.services.punches import Punch
+
+    app = buffered_app(tmp_path)
+    first, second, _, _ = employee_ids(app)
+    today = date.today()
+    with open(tmp_path / 'events.log', 'w') as log:
+        log.write(_encode(Punch(first, 'IT', today, 'in', clock(9))))
+        log.write(_encode(Punch(first, 'IT', today, 'in', clock(9, 30))))
+        log.write(_encode(Punch(first, None, today, 'out', clock(17, 30))))
+        log.write(_encode(Punch(second, 'HR', today, 'in', clock(10)))[:20])
+
+    with app.app_context():
+        queue = attendance_queue()
+        assert queue.metrics()['replayed'] == 3
+        queue.close()
+    rows = recorded(app)
+    assert set(rows) == {first}
+    assert (rows[first].check_in_time, rows[first].check_out_time) == (clock(9), clock(17, 30))
+    assert rows[first].hours_worked == 8.5
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    for test in (test_punches_are_acknowledged_then_applied_in_one_flush,
+                 test_flusher_applies_full_batches_in_the_background,
+                 test_logged_punches_are_replayed_after_a_restart):
+        with tempfile.TemporaryDirectory() as directory:
+            test(Path(directory))
+    print("✅ Buffered punches are logged, batched and replayed")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Daily Attendance Summary Tests
+The rollup follows attendance writes and department changes, so it always
+equals a rebuild from the attendance table
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_query_counts import create_test_app, seed_workforce
+
+
+def summary_cells():
+    from app.models import db, DailyAttendanceSummary
+
+    rows = db.session.execute(db.select(DailyAttendanceSummary.date, DailyAttendanceSummary.department,
+                                        DailyAttendanceSummary.status, DailyAttendanceSummary.headcount))
+    return {(row.date, row.department, row.status): row.headcount for row in rows if row.headcount}
+
+
+def assert_summary_matches_attendance():
+    """The incrementally maintained rollup equals a rebuild from attendance"""
+    from app.models import db
+    from app.services.attendance_summary import rebuild_daily_attendance_summary
+
+    maintained = summary_cells()
+    rebuild_daily_attendance_summary()
+    assert summary_cells() == maintained
+    db.session.rollback()
+
+
+def test_department_change_moves_past_days():
+    """Days recorded before a transfer count under the new department, and later edits stay there"""
+    from app.models import db, Employee, Attendance
+    from app.services.attendance_summary import attendance_stats_for_day
+
+    app = create_test_app()
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    with app.app_context():
+        seed_workforce(3)
+        moved = Employee.query.filter_by(department='IT').one()
+        db.session.add(Attendance(employee_id=moved.id, date=yesterday, status='present'))
+        db.session.commit()
+        assert attendance_stats_for_day(yesterday, 'IT')['present'] == 1
+
+        moved.department = 'Sales'
+        # A same-flush edit of an existing day is keyed by the new department too
+        Attendance.query.filter_by(employee_id=moved.id, date=today).one().status = 'leave'
+        db.session.commit()
+        assert attendance_stats_for_day(yesterday, 'IT')['present'] == 0
+        assert attendance_stats_for_day(yesterday, 'Sales')['present'] == 1
+        assert attendance_stats_for_day(today, 'Sales')['leave'] == 1
+        assert_summary_matches_attendance()
+
+        # Deleting a day recorded before the transfer never drives a cell negative
+        db.session.delete(Attendance.query.filter_by(employee_id=moved.id, date=yesterday).one())
+        moved.department = None
+        db.session.commit()
+        assert all(headcount >= 0 for headcount in summary_cells().values())
+        assert attendance_stats_for_day(today, '')['leave'] == 1
+        assert_summary_matches_attendance()
+
+
+if __name__ == "__main__":
+    test_department_change_moves_past_days()
+    print("✅ Daily attendance summary follows department changes")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Check-in Tests
+Check-in is one atomic upsert per employee and day: racing requests never
+create duplicate attendance rows, and a burst of concurrent check-ins is
+absorbed with busy retries
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, time as clock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import func, text
+
+from test_query_counts import create_test_app, seed_workforce
+
+LOAD_EMPLOYEES = 120
+LOAD_THREADS = 8
+
+
+def employee_client(app, employee_id):
+    from app.models import db, Employee
+
+    with app.app_context():
+        user_id = db.session.get(Employee, employee_id).user_id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def test_check_in_and_out_update_one_row():
+    """Punches upsert today's row and keep the daily summary exact"""
+    from app.models import db, Employee, Attendance, StalePayroll
+    from app.services.attendance_summary import attendance_stats_for_day
+
+    app = create_test_app()
+    today = date.today()
+    with app.app_context():
+        seed_workforce(3)
+        # Employee 0 was marked absent earlier today; employee 2 has no row yet
+        absent, _, unmarked = [e.id for e in Employee.query.order_by(Employee.id)]
+        db.session.delete(Attendance.query.filter_by(employee_id=unmarked).one())
+        db.session.commit()
+        StalePayroll.query.delete()
+        db.session.commit()
+
+    for employee_id in (absent, unmarked):
+        client = employee_client(app, employee_id)
+        assert client.post('/employee/check_out').get_json()['message'] == 'Please check in first'
+        assert client.post('/employee/check_in').get_json()['success']
+        assert client.post('/employee/check_in').get_json()['message'] == 'Already checked in today'
+        response = client.post('/employee/check_out').get_json()
+        assert response['success'] and response['hours_worked'] >= 0
+        assert client.post('/employee/check_out').get_json()['message'] == 'Already checked out today'
+
+    with app.app_context():
+        rows = Attendance.query.filter(Attendance.employee_id.in_([absent, unmarked])).all()
+        assert len(rows) == 2
+        assert all(row.status == 'present' and row.check_in_time and row.check_out_time for row in rows)
+        stats = attendance_stats_for_day(today)
+        assert (stats['present'], stats['absent']) == (3, 0)
+        # Both employees' payroll for the month now needs recomputing
+        assert StalePayroll.query.count() == 2
+
+
+def test_concurrent_check_ins_never_duplicate(tmp_path):
+    """Every thread checks in every employee; exactly one wins per employee"""
+    from app.models import db, Employee, Attendance
+    from app.services.attendance_summary import attendance_stats_for_day, rebuild_daily_attendance_summary
+    from app.services.punches import punch_in
+
+    app = create_test_app(f"sqlite:///{tmp_path / 'check_in.db'}")
+    today = date.today()
+    with app.app_context():
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('PRAGMA journal_mode=WAL')
+        seed_workforce(LOAD_EMPLOYEES)
+        Attendance.query.delete()
+        rebuild_daily_attendance_summary()
+        db.session.commit()
+        employees = [(e.id, e.department) for e in Employee.query]
+
+    successes, errors = [], []
+    barrier = threading.Barrier(LOAD_THREADS)
+
+    def worker(seed):
+        order = list(employees)
+        random.Random(seed).shuffle(order)
+        with app.app_context():
+            barrier.wait()
+            try:
+                for employee_id, department in order:
+                    if punch_in(employee_id, department, today, clock(9, seed)):
+                        successes.append(employee_id)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(LOAD_THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    assert errors == []
+    assert sorted(successes) == sorted(employee_id for employee_id, _ in employees)
+    with app.app_context():
+        duplicates = db.session.execute(text(
+            'SELECT COUNT(*) FROM (SELECT employee_id FROM attendance GROUP BY employee_id, date '
+            'HAVING COUNT(*) > 1)')).scalar()
+        assert duplicates == 0
+        assert db.session.scalar(func.count(Attendance.id).select()) == LOAD_EMPLOYEES
+        assert attendance_stats_for_day(today)['present'] == LOAD_EMPLOYEES
+
+    attempts = LOAD_EMPLOYEES * LOAD_THREADS
+    print(f"{attempts} check-in attempts from {LOAD_THREADS} threads in {elapsed:.2f}s "
+          f"({attempts / elapsed:.0f}/s), {LOAD_EMPLOYEES} rows, 0 duplicates")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_check_in_and_out_update_one_row()
+    with tempfile.TemporaryDirectory() as directory:
+        test_concurrent_check_ins_never_duplicate(Path(directory))
+    print("✅ Check-ins are atomic under concurrency")
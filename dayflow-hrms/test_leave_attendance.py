@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Leave Attendance Tests
+Approving leave marks every working day of the range as leave in one bulk
+upsert, whatever its length, skipping weekends and holidays unless the
+calendar policy is configured
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+
+from test_query_counts import create_test_app, seed_workforce
+
+
+def leave_app(**config):
+    """One employee, present on a Monday, with a pending 30-day leave starting that day"""
+    from app.models import db, Employee, Attendance, LeaveRequest, StalePayroll
+    from app.services.attendance_summary import rebuild_daily_attendance_summary
+
+    app = create_test_app()
+    app.config.update(config)
+    monday = date(2026, 3, 2)
+    with app.app_context():
+        seed_workforce(2)
+        employee = Employee.query.order_by(Employee.id).all()[1]
+        db.session.add(Attendance(employee_id=employee.id, date=monday, status='present'))
+        leave = LeaveRequest(employee_id=employee.id, leave_type='paid', start_date=monday,
+                             end_date=monday + timedelta(days=29), reason='Sabbatical', status='pending')
+        db.session.add(leave)
+        db.session.commit()
+        rebuild_daily_attendance_summary()
+        db.session.commit()
+        StalePayroll.query.delete()
+        db.session.commit()
+        return app, employee.id, leave.id, monday
+
+
+def leave_days(employee_id):
+    from app.models import Attendance
+
+    return {row.date: row for row in Attendance.query.filter_by(employee_id=employee_id, status='leave')}
+
+
+def leave_status(leave_id):
+    from app.models import db, LeaveRequest
+
+    return db.session.get(LeaveRequest, leave_id).status
+
+
+def test_approval_marks_working_days_in_one_upsert():
+    """A 30-day leave costs a handful of statements, not two per day"""
+    from app.models import db, Attendance
+    from app.services.attendance_summary import attendance_stats_for_day
+    from test_payslips import admin_client
+
+    app, employee_id, leave_id, monday = leave_app(HOLIDAYS=['2026-03-04'])
+    client = admin_client(app)
+    with app.app_context():
+        engine = db.engine
+
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.post('/admin/update_leave_status', json={'request_id': leave_id, 'status': 'approved'})
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert response.get_json()['success']
+    assert sum(statement.startswith('INSERT INTO attendance (') for statement in statements) == 1
+    assert len(statements) <= 12
+
+    with app.app_context():
+        days = leave_days(employee_id)
+        # 22 weekdays from Monday 2 March to Tuesday 31 March, less the holiday
+        assert len(days) == 21
+        assert date(2026, 3, 4) not in days and date(2026, 3, 7) not in days
+        assert days[monday].remarks == 'Approved leave: paid'
+        assert Attendance.query.filter_by(employee_id=employee_id, date=monday).one().status == 'leave'
+        assert attendance_stats_for_day(monday)['leave'] == 1
+        assert attendance_stats_for_day(monday)['present'] == 0
+        assert attendance_stats_for_day(date(2026, 3, 31))['leave'] == 1
+
+
+def test_approve_route_and_calendar_policy():
+    """The approve form action shares the service; 'calendar' marks every day"""
+    from test_payslips import admin_client
+
+    app, employee_id, leave_id, monday = leave_app(LEAVE_ATTENDANCE_DAYS='calendar')
+    response = admin_client(app).post(f'/admin/leave_request/{leave_id}/approve',
+                                      data={'admin_comment': 'Enjoy'})
+    assert response.get_json()['success']
+    with app.app_context():
+        assert leave_status(leave_id) == 'approved'
+        days = leave_days(employee_id)
+        assert sorted(days) == [monday + timedelta(days=offset) for offset in range(30)]
+
+
+def test_leave_day_policy():
+    from app.services.leave_attendance import leave_attendance_days
+
+    friday = date(2026, 3, 6)
+    assert leave_attendance_days(friday, friday + timedelta(days=3)) == [friday, friday + timedelta(days=3)]
+    assert len(leave_attendance_days(friday, friday + timedelta(days=3), days_per_week=6)) == 3
+    assert leave_attendance_days(friday, friday, skip={friday}) == []
+
+
+if __name__ == "__main__":
+    test_approval_marks_working_days_in_one_upsert()
+    test_approve_route_and_calendar_policy()
+    test_leave_day_policy()
+    print("✅ Approved leave is marked in one bulk upsert")
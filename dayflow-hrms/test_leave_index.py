@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Leave Interval Index Tests
+Leave days per period and "on leave" checks from the index match a
+day-by-day count, and workforce status agrees with Employee.status_on
+"""
+
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_query_counts import create_test_app, seed_workforce
+
+
+def test_day_ranges_match_brute_force():
+    """Merged ranges count each covered day once for any query window"""
+    from app.services.leave_index import DayRanges
+
+    rng = random.Random(15)
+    for _ in range(200):
+        ranges = []
+        for _ in range(rng.randint(0, 8)):
+            start = rng.randint(0, 60)
+            ranges.append((start, start + rng.randint(0, 10)))
+        covered = {day for start, end in ranges for day in range(start, end + 1)}
+        index = DayRanges(ranges)
+        for _ in range(20):
+            start = rng.randint(-5, 75)
+            end = start + rng.randint(0, 30)
+            assert index.days(start, end) == len([d for d in covered if start <= d <= end])
+        assert all((day in index) == (day in covered) for day in range(-2, 80))
+
+
+def test_index_drives_payroll_and_status():
+    """Leave days are clipped to the period and split paid / unpaid"""
+    from app.models import db, Employee, LeaveRequest
+    from app.services.leave_index import LeaveIntervalIndex
+    from app.services.status import workforce_status, workforce_status_counts
+
+    app = create_test_app()
+    with app.app_context():
+        seed_workforce(6)
+        ids = [employee.id for employee in Employee.query.order_by(Employee.id)]
+        today = date.today()
+        start, end = date(2026, 3, 1), date(2026, 3, 31)
+        leave = [
+            (ids[0], 'paid', date(2026, 2, 25), date(2026, 3, 3), 'approved'),
+            (ids[0], 'sick', date(2026, 3, 2), date(2026, 3, 5), 'approved'),
+            (ids[0], 'unpaid', date(2026, 3, 30), date(2026, 4, 4), 'approved'),
+            (ids[1], 'unpaid', date(2026, 3, 10), date(2026, 3, 12), 'rejected'),
+            (ids[2], 'paid', today, today, 'approved'),
+            (ids[3], 'unpaid', today - timedelta(days=1), today + timedelta(days=1), 'approved'),
+        ]
+        for employee_id, leave_type, first, last, status in leave:
+            db.session.add(LeaveRequest(employee_id=employee_id, leave_type=leave_type,
+                                        start_date=first, end_date=last, reason='Test', status=status))
+        db.session.commit()
+
+        index = LeaveIntervalIndex.load(start, end)
+        assert index.leave_days(ids[0], start, end) == (5, 2)
+        assert index.leave_days(ids[0], date(2026, 3, 4), date(2026, 3, 30)) == (2, 1)
+        assert index.leave_days(ids[1], start, end) == (0, 0)
+        assert index.on_leave(ids[0], date(2026, 3, 31))
+        assert not index.on_leave(ids[0], date(2026, 3, 6))
+
+        expected = dict(db.session.query(Employee.id, Employee.status_on(today)).all())
+        assert workforce_status(today) == expected
+        counts = workforce_status_counts(today)
+        assert counts['on_leave'] == 2 and counts['total'] == 6
+        assert all(counts[status] == list(expected.values()).count(status)
+                   for status in ('present', 'absent', 'on_leave'))
+        it_counts = workforce_status_counts(today, Employee.department == 'IT')
+        assert it_counts['total'] == 2 and it_counts['on_leave'] == 1
+
+
+if __name__ == "__main__":
+    test_day_ranges_match_brute_force()
+    test_index_drives_payroll_and_status()
+    print("✅ Leave interval index matches day-by-day counts")
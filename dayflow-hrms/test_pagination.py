@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Keyset Pagination Tests
+Cursors round-trip and tampered ones fall back to the first page, paging
+forward and back stops cleanly at both ends, and cached listing totals
+stay bounded
+"""
+
+import base64
+import json
+import os
+import sys
+from collections import namedtuple
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_query_counts import create_test_app, seed_workforce
+
+Row = namedtuple('Row', 'created_at id')
+
+
+def token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def test_cursors_round_trip_and_reject_tampering():
+    """Tokens decode to what was encoded; anything else decodes to None"""
+    from app.services.pagination import encode_cursor, decode_cursor
+
+    created = datetime(2026, 2, 3, 4, 5, 6, 789)
+    for direction in ('next', 'prev'):
+        assert decode_cursor(encode_cursor(Row(created, 42), direction)) == (created, 42, direction)
+
+    valid = encode_cursor(Row(created, 42), 'next')
+    for tampered in (valid[:-3], valid + '!!', '', '%%%', token(['2026-02-03', 42, 'sideways']),
+                     token(['not a date', 42, 'next']), token(['2026-02-03', 'x', 'next']),
+                     token(['2026-02-03', 42]), token({'id': 42}), token([5, [42], 'next'])):
+        assert decode_cursor(tampered) is None, tampered
+
+
+def test_keyset_pages_stop_at_both_ends():
+    """Following next then prev visits every row once and ends without dangling cursors"""
+    from app.models import Employee
+    from app.services.pagination import keyset_paginate
+
+    app = create_test_app()
+    with app.app_context():
+        seed_workforce(25)
+        newest_first = [employee.id for employee in
+                        Employee.query.order_by(Employee.created_at.desc(), Employee.id.desc())]
+
+        pages = [keyset_paginate(Employee.query, Employee, per_page=10)]
+        assert not pages[0].has_prev and pages[0].prev_cursor is None
+        while pages[-1].has_next:
+            pages.append(keyset_paginate(Employee.query, Employee, pages[-1].next_cursor, per_page=10))
+        assert [len(page.items) for page in pages] == [10, 10, 5]
+        assert [employee.id for page in pages for employee in page] == newest_first
+        assert pages[-1].has_prev and pages[-1].next_cursor is None
+
+        back = [pages[-1]]
+        while back[-1].has_prev:
+            back.append(keyset_paginate(Employee.query, Employee, back[-1].prev_cursor, per_page=10))
+        ids = lambda walked: [[employee.id for employee in page] for page in walked]
+        assert ids(reversed(back)) == ids(pages)
+        assert back[-1].prev_cursor is None and back[-1].has_next
+
+        # A tampered cursor starts over at the first page
+        first = keyset_paginate(Employee.query, Employee, 'tampered', per_page=10)
+        assert [employee.id for employee in first] == newest_first[:10] and not first.has_prev
+
+
+def test_count_cache_is_bounded():
+    """Totals expire after their ttl and the least recently used are dropped past the size limit"""
+    from app.models import db, Employee
+    from app.services.pagination import CountCache, approximate_count
+
+    cache = CountCache(2)
+    cache.put('a', 1, expires=10)
+    cache.put('b', 2, expires=10)
+    assert cache.get('a', now=5) == 1
+    cache.put('c', 3, expires=10)
+    assert (cache.get('a', now=5), cache.get('b', now=5), cache.get('c', now=5)) == (1, None, 3)
+    assert cache.get('a', now=10) is None and len(cache) == 1
+
+    app = create_test_app()
+    app.config['APPROX_COUNT_CACHE_SIZE'] = 3
+    with app.app_context():
+        seed_workforce(2)
+        for term in range(10):
+            assert approximate_count(Employee.query, ('employees', str(term))) == 2
+        assert len(app.extensions['approximate_counts']) == 3
+        db.session.rollback()
+
+
+if __name__ == "__main__":
+    test_cursors_round_trip_and_reject_tampering()
+    test_keyset_pages_stop_at_both_ends()
+    test_count_cache_is_bounded()
+    print("✅ Keyset pagination round-trips cursors and bounds its count cache")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Payroll Input Tests
+Days present, half days, leave days, hours and overtime for a pay period
+come from one aggregate query over attendance, and both the payroll form
+and month-end runs use them
+"""
+
+import os
+import sys
+from collections import namedtuple
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+
+from test_query_counts import create_test_app, seed_workforce
+from test_payslips import admin_client
+
+# Last month: always within the hot years, and clear of seed_workforce's current month
+PERIOD_END = date.today().replace(day=1) - timedelta(days=1)
+PERIOD_START = PERIOD_END.replace(day=1)
+PERIOD = PERIOD_START.strftime('%B %Y')
+
+
+def seed_period_attendance(app):
+    """Attendance last month for two of three employees; returns their ids"""
+    from app.models import db, Employee, Attendance
+
+    with app.app_context():
+        seed_workforce(3)
+        first, second, third = Employee.query.order_by(Employee.id).all()
+        for employee in (first, second, third):
+            employee.hire_date = PERIOD_START - timedelta(days=365)
+        second.working_hours_per_day = 6.0
+        for day, status, hours in ((3, 'present', 10.0), (4, 'present', 8.0), (5, 'present', 9.0),
+                                   (6, 'half_day', 4.0), (7, 'leave', 0.0)):
+            db.session.add(Attendance(employee_id=first.id, date=PERIOD_START.replace(day=day), status=status,
+                                      hours_worked=hours))
+        for day in (3, 4):
+            db.session.add(Attendance(employee_id=second.id, date=PERIOD_START.replace(day=day), status='present',
+                                      check_in_time=time(9), check_out_time=time(16), hours_worked=7.0))
+        # Outside the period
+        db.session.add(Attendance(employee_id=second.id, date=PERIOD_START - timedelta(days=1), status='present',
+                                  hours_worked=12.0))
+        db.session.commit()
+        return first.id, second.id, third.id
+
+
+def test_inputs_aggregate_attendance_in_one_query():
+    """Overtime counts hours beyond each employee's own working day"""
+    from app.models import db
+    from app.services.payroll_inputs import payroll_inputs
+
+    app = create_test_app()
+    first, second, third = seed_period_attendance(app)
+    with app.app_context():
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            inputs = payroll_inputs(PERIOD_START, PERIOD_END)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert len(statements) == 1
+        assert inputs[first].to_dict() == {'days_present': 3, 'half_days': 1, 'leave_days': 1,
+                                           'hours_worked': 31.0, 'overtime_hours': 3.0, 'recorded': 5}
+        assert (inputs[second].days_present, inputs[second].overtime_hours) == (2, 2.0)
+        assert third not in inputs
+        assert payroll_inputs(PERIOD_START, PERIOD_END, employee_ids=[second]).keys() == {second}
+
+
+def test_payroll_run_and_form_use_attendance_inputs():
+    """Blank form fields and bulk runs take attendance figures; recorded edits are recomputed"""
+    from app.models import db, Attendance, Payroll
+    from app.services.payroll_recompute import recompute_stale_payroll
+    from app.services.payroll_run import run_payroll, working_days_in_period
+
+    app = create_test_app()
+    first, second, third = seed_period_attendance(app)
+    working_days = working_days_in_period(PERIOD_START, PERIOD_END)
+    month = f'month={PERIOD_START.month}&year={PERIOD_START.year}'
+    with app.app_context():
+        run_payroll(PERIOD_START.month, PERIOD_START.year, employee_ids=[first, third])
+        runs = {p.employee_id: p for p in Payroll.query.filter_by(pay_period_start=PERIOD_START)}
+        assert (runs[first].days_present, runs[first].overtime_hours) == (3, 3.0)
+        # No attendance recorded: paid for every working day
+        assert (runs[third].days_present, runs[third].total_working_days,
+                runs[third].overtime_hours) == (working_days, working_days, 0.0)
+
+    client = admin_client(app)
+    prefill = client.get(f'/admin/payroll/inputs?employee_id={second}&{month}').get_json()
+    assert (prefill['working_days'], prefill['payroll_days_present'],
+            prefill['overtime_hours']) == (working_days, 2, 2.0)
+    assert prefill['base_monthly_salary'] == 50000.0
+    assert client.get(f'/admin/payroll/inputs?employee_id=0&{month}').status_code == 404
+    assert client.get(f'/admin/payroll/inputs?employee_id={second}').status_code == 400
+
+    response = client.post('/admin/payroll/create', data={
+        'employee_id': second, 'month': PERIOD_START.month, 'year': PERIOD_START.year,
+        'base_monthly_salary': '50000', 'working_days': '', 'days_present': '', 'overtime_hours': '',
+        'overtime_rate': '100'})
+    assert response.status_code == 302
+    with app.app_context():
+        payroll = Payroll.query.filter_by(employee_id=second, pay_period_start=PERIOD_START).one()
+        assert (payroll.total_working_days, payroll.days_present, payroll.overtime_hours) == (working_days, 2, 2.0)
+        assert payroll.gross_pay == payroll.basic_salary + payroll.hra + Decimal('200.00')
+
+        # Correcting the hours worked refreshes the run's overtime
+        attendance = Attendance.query.filter_by(employee_id=first, date=PERIOD_START.replace(day=4)).one()
+        attendance.hours_worked = 11.5
+        db.session.commit()
+        recompute_stale_payroll()
+        assert db.session.get(Payroll, runs[first].id).overtime_hours == 6.5
+
+
+def test_payroll_runs_never_duplicate_a_period():
+    """A run that read before another run inserted skips the rows the index already holds"""
+    from app.models import Payroll
+    from app.services import payroll_run
+
+    app = create_test_app()
+    first, second, third = seed_period_attendance(app)
+    with app.app_context():
+        assert payroll_run.run_payroll(PERIOD_START.month, PERIOD_START.year, employee_ids=[first]).created == 1
+
+        # Both runs saw no payroll for the period before either inserted
+        eligible = payroll_run._eligible_employees
+        unpaid = namedtuple('Eligible', 'id department monthly_wage working_days_per_week has_payroll')
+        payroll_run._eligible_employees = lambda *args: [unpaid(*row[:-1], False) for row in eligible(*args)]
+        try:
+            result = payroll_run.run_payroll(PERIOD_START.month, PERIOD_START.year, employee_ids=[first, second])
+        finally:
+            payroll_run._eligible_employees = eligible
+        assert (result.created, result.skipped) == (1, 1)
+        assert Payroll.query.filter_by(pay_period_start=PERIOD_START).count() == 2
+
+    client = admin_client(app)
+    response = client.post('/admin/payroll/create', data={
+        'employee_id': second, 'month': PERIOD_START.month, 'year': PERIOD_START.year,
+        'base_monthly_salary': '50000'})
+    assert f'already has payroll for {PERIOD}' in response.get_data(as_text=True)
+    with app.app_context():
+        assert Payroll.query.filter_by(employee_id=second, pay_period_start=PERIOD_START).count() == 1
+
+
+if __name__ == "__main__":
+    test_inputs_aggregate_attendance_in_one_query()
+    test_payroll_run_and_form_use_attendance_inputs()
+    test_payroll_runs_never_duplicate_a_period()
+    print("✅ Payroll inputs are derived from attendance")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Payroll Kernel Tests
+The columnar kernel must reproduce the original per-record payroll
+arithmetic bit for bit, and the Payroll calculate_* methods must agree
+with a batch calculation
+"""
+
+import os
+import random
+import sys
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.payroll_kernel import PayrollColumns, compute_payroll, apply_payroll, EARNING_FIELDS
+
+DEDUCTIONS = ('pf_deduction', 'professional_tax', 'deductions', 'tax_deductions')
+
+
+def reference_pay(record):
+    """The per-record float arithmetic Payroll used before the kernel"""
+    overtime_pay = float(record['overtime_hours']) * float(record['overtime_rate'])
+    gross = float(record[EARNING_FIELDS[0]])
+    for field in EARNING_FIELDS[1:]:
+        gross = gross + float(record[field])
+    gross = gross + overtime_pay
+
+    if record['total_working_days'] > 0 and record['unpaid_leave_days'] > 0:
+        per_day_salary = float(record['base_monthly_salary']) / record['total_working_days']
+        unpaid = per_day_salary * record['unpaid_leave_days']
+    else:
+        unpaid = 0.00
+
+    total = float(record[DEDUCTIONS[0]])
+    for field in DEDUCTIONS[1:]:
+        total = total + float(record[field])
+    total = total + float(unpaid)
+    return {'gross_pay': gross, 'unpaid_leave_deduction': unpaid,
+            'total_deductions': total, 'net_pay': float(gross) - float(total)}
+
+
+def money(rng, high):
+    return Decimal(rng.randint(0, high * 100)) / 100
+
+
+def random_records(count, seed=7):
+    """Payroll inputs shaped like the Numeric/Integer/Float payroll columns"""
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        wage = money(rng, 250000)
+        record = {field: money(rng, 60000) for field in EARNING_FIELDS + DEDUCTIONS}
+        record.update(
+            base_monthly_salary=wage,
+            basic_salary=wage / 2,
+            overtime_hours=rng.choice([0.0, rng.random() * 40]),
+            overtime_rate=money(rng, 900),
+            total_working_days=rng.choice([0, 20, 22, 26, 31]),
+            unpaid_leave_days=rng.choice([0, 0, 1, 3, 7]),
+            unpaid_leave_deduction=Decimal('0')
+        )
+        records.append(record)
+    return records
+
+
+def test_kernel_matches_reference_bit_for_bit():
+    """Every output of the batch kernel equals the scalar arithmetic exactly"""
+    records = random_records(2000)
+    results = compute_payroll(PayrollColumns.from_records(records))
+    for i, record in enumerate(records):
+        expected = reference_pay(record)
+        actual = results.row(i)
+        for field, value in expected.items():
+            assert actual[field].hex() == value.hex(), (i, field, actual[field], value)
+
+
+def test_payroll_methods_wrap_the_kernel():
+    """Payroll.calculate_net_pay on one record equals the same record in a batch"""
+    from app.models import Payroll
+
+    records = random_records(50, seed=11)
+    batch = compute_payroll(PayrollColumns.from_records(records))
+    for i, record in enumerate(records):
+        payroll = Payroll(**record)
+        assert payroll.calculate_net_pay() == batch.net_pay[i]
+        assert payroll.gross_pay == batch.gross_pay[i]
+        assert payroll.unpaid_leave_deduction == batch.unpaid_leave_deduction[i]
+        assert payroll.total_deductions == batch.total_deductions[i]
+
+        # calculate_deductions uses the stored unpaid leave deduction as before
+        payroll.unpaid_leave_deduction = Decimal('123.45')
+        expected = float(record[DEDUCTIONS[0]])
+        for field in DEDUCTIONS[1:]:
+            expected = expected + float(record[field])
+        assert payroll.calculate_deductions() == expected + 123.45
+        assert payroll.calculate_gross_pay() == batch.gross_pay[i]
+        assert payroll.calculate_unpaid_leave_deduction() == batch.unpaid_leave_deduction[i]
+
+
+def test_unset_amounts_count_as_zero():
+    """Amounts not yet defaulted by an INSERT are treated as 0, not an error"""
+    record = {'basic_salary': Decimal('1000'), 'base_monthly_salary': Decimal('2000'),
+              'total_working_days': 20, 'unpaid_leave_days': 2}
+    apply_payroll([record])
+    assert record['gross_pay'] == 1000.0
+    assert record['unpaid_leave_deduction'] == 200.0
+    assert record['net_pay'] == 800.0
+
+
+if __name__ == "__main__":
+    test_kernel_matches_reference_bit_for_bit()
+    test_payroll_methods_wrap_the_kernel()
+    test_unset_amounts_count_as_zero()
+    print("✅ Payroll kernel matches the scalar calculation")
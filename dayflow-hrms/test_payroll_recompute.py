@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Stale Payroll Recompute Tests
+Attendance corrections, late leave approvals and salary changes mark only
+the dependent unpaid payroll rows, and a recompute refreshes just those
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_query_counts import create_test_app, seed_workforce
+
+
+def stale_marks():
+    from app.models import StalePayroll
+
+    return sorted((mark.payroll_id, mark.source) for mark in StalePayroll.query)
+
+
+def test_input_changes_mark_and_recompute_only_dependent_payroll():
+    """Each input kind marks its payroll row; the recompute clears the marks"""
+    from app.models import (db, Employee, Attendance, LeaveRequest, Payroll, PayrollPeriodSummary,
+                            create_salary_components_for_employee)
+    from app.salary_structure import salary_plan
+    from app.services.payroll_recompute import recompute_stale_payroll
+    from app.services.payroll_summary import rebuild_payroll_period_summary
+    from app.services.salary_revision import sync_salary_components
+
+    app = create_test_app()
+    with app.app_context():
+        seed_workforce(5)
+        # Seeded attendance was written alongside the payroll
+        recompute_stale_payroll()
+        employees = Employee.query.order_by(Employee.id).all()
+        payrolls = {payroll.employee_id: payroll for payroll in Payroll.query}
+        for payroll in payrolls.values():
+            payroll.total_working_days = payroll.days_present = 20
+            # As run_payroll leaves them: attendance figures follow attendance
+            payroll.days_present_derived = payroll.overtime_derived = True
+            payroll.calculate_net_pay()
+        payrolls[employees[4].id].payment_status = 'paid'
+        db.session.commit()
+        rebuild_payroll_period_summary()
+        db.session.commit()
+        period_start = payrolls[employees[0].id].pay_period_start
+        assert stale_marks() == []
+
+        # Attendance correction, late unpaid leave approval, new salary components
+        day = period_start + timedelta(days=2)
+        db.session.add(Attendance(employee_id=employees[0].id, date=day, status='present'))
+        leave = LeaveRequest(employee_id=employees[1].id, leave_type='unpaid', start_date=day,
+                             end_date=day + timedelta(days=1), reason='Late', status='pending')
+        db.session.add(leave)
+        db.session.commit()
+        leave.status = 'approved'
+        create_salary_components_for_employee(employees[2].id, employees[2].monthly_wage)
+        # Paid payroll and other periods are left alone
+        db.session.add(Attendance(employee_id=employees[4].id, date=day, status='present'))
+        db.session.add(Attendance(employee_id=employees[3].id, date=period_start - timedelta(days=3),
+                                  status='present'))
+        db.session.commit()
+
+        assert stale_marks() == sorted([
+            (payrolls[employees[0].id].id, 'attendance'),
+            (payrolls[employees[1].id].id, 'leave'),
+            (payrolls[employees[2].id].id, 'salary'),
+        ])
+        before = {e.id: (payrolls[e.id].basic_salary, payrolls[e.id].net_pay) for e in employees}
+
+        result = recompute_stale_payroll(batch_size=2)
+        assert (result.stale, result.recomputed, result.skipped) == (3, 3, 0)
+        assert stale_marks() == []
+        db.session.expire_all()
+
+        first = db.session.get(Payroll, payrolls[employees[0].id].id)
+        present = Attendance.query.filter(Attendance.employee_id == employees[0].id,
+                                          Attendance.date >= first.pay_period_start,
+                                          Attendance.date <= first.pay_period_end,
+                                          Attendance.status == 'present').count()
+        assert first.days_present == present
+        # Amounts entered on the row are kept when only attendance changed
+        assert first.basic_salary == Decimal('25000.00')
+
+        second = db.session.get(Payroll, payrolls[employees[1].id].id)
+        assert (second.paid_leave_days, second.unpaid_leave_days) == (0, 2)
+        assert second.unpaid_leave_deduction == Decimal('5000.00')
+        assert second.net_pay == before[employees[1].id][1] - Decimal('5000.00')
+
+        third = db.session.get(Payroll, payrolls[employees[2].id].id)
+        expected = salary_plan().payroll_fields(salary_plan().evaluate([Decimal('50000')]), 0)
+        assert third.hra == expected['hra'] and third.pf_deduction == expected['pf_deduction']
+        assert third.net_pay == third.gross_pay - third.total_deductions
+
+        for employee in employees[3:]:
+            payroll = db.session.get(Payroll, payrolls[employee.id].id)
+            assert (payroll.basic_salary, payroll.net_pay) == before[employee.id]
+        summary_total = sum(cell.net_total for cell in PayrollPeriodSummary.query)
+        assert summary_total == sum(payroll.net_pay for payroll in Payroll.query)
+
+        # Bulk salary sync marks through Core; nothing changed means no marks
+        assert sync_salary_components([(employees[2].id, Decimal('50000'))]) == (0, 0)
+        sync_salary_components([(employees[2].id, Decimal('60000'))])
+        db.session.commit()
+        assert stale_marks() == [(third.id, 'salary')]
+        assert recompute_stale_payroll().recomputed == 1
+        assert recompute_stale_payroll().stale == 0
+
+
+def test_salary_revisions_reprice_only_periods_from_their_effective_date():
+    """A future raise leaves earlier unpaid payroll alone; a backdated one reprices at the wage then in force"""
+    from app.models import db, Employee, Payroll, StalePayroll
+    from app.salary_structure import salary_plan
+    from app.services.payroll_recompute import recompute_stale_payroll
+    from app.services.payroll_run import run_payroll
+    from app.services.salary_revision import parse_revisions, revise_salaries
+
+    app = create_test_app()
+    with app.app_context():
+        seed_workforce(1)
+        employee = Employee.query.one()
+        employee.hire_date = date(2020, 1, 1)
+        db.session.commit()
+        recompute_stale_payroll()
+        today = date.today()
+        past = (today.replace(day=1) - timedelta(days=70)).replace(day=1)
+        run_payroll(past.month, past.year)
+        payroll = Payroll.query.filter_by(pay_period_start=past).one()
+        assert payroll.base_monthly_salary == Decimal('50000.00')
+
+        next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+        revise_salaries(parse_revisions("employee_id,new_wage\nEMP0000,90000\n"), effective_date=next_month)
+        assert stale_marks() == []
+
+        # A stale mark left from before the raise still prices the period at its own wage
+        db.session.add(StalePayroll(payroll_id=payroll.id, source='salary'))
+        db.session.commit()
+        recompute_stale_payroll()
+        db.session.expire_all()
+        payroll = db.session.get(Payroll, payroll.id)
+        expected = salary_plan().payroll_fields(salary_plan().evaluate([Decimal('50000')]), 0)
+        assert (payroll.base_monthly_salary, payroll.basic_salary) == (Decimal('50000.00'), expected['basic_salary'])
+
+        # Backdated to the past period: it and the current month are repriced, at 60000
+        revise_salaries(parse_revisions("employee_id,new_wage\nEMP0000,60000\n"), effective_date=past)
+        assert len(stale_marks()) == 2
+        recompute_stale_payroll()
+        db.session.expire_all()
+        payroll = db.session.get(Payroll, payroll.id)
+        expected = salary_plan().payroll_fields(salary_plan().evaluate([Decimal('60000')]), 0)
+        assert (payroll.base_monthly_salary, payroll.basic_salary) == (Decimal('60000.00'), expected['basic_salary'])
+        current = Payroll.query.filter(Payroll.pay_period_start <= today, Payroll.pay_period_end >= today).one()
+        assert current.base_monthly_salary == Decimal('60000.00')
+
+
+def test_recompute_keeps_attendance_figures_entered_by_hand():
+    """Days and overtime typed into the payroll form survive attendance changes; blank ones follow them"""
+    from app.models import db, Employee, Attendance, Payroll
+    from app.services.payroll_recompute import recompute_stale_payroll
+    from test_payslips import admin_client
+
+    app = create_test_app()
+    today = date.today()
+    with app.app_context():
+        seed_workforce(2)
+        first, second = [employee.id for employee in Employee.query.order_by(Employee.id)]
+        Payroll.query.delete()
+        db.session.commit()
+
+    client = admin_client(app)
+    for employee_id, days_present, overtime in ((first, '22', '10'), (second, '', '')):
+        assert client.post('/admin/payroll/create', data={
+            'employee_id': employee_id, 'month': today.month, 'year': today.year,
+            'base_monthly_salary': '50000', 'working_days': '22', 'days_present': days_present,
+            'overtime_hours': overtime, 'overtime_rate': '100'}).status_code == 302
+
+    with app.app_context():
+        entered = Payroll.query.filter_by(employee_id=first).one()
+        gross = entered.gross_pay
+        for employee_id in (first, second):
+            Attendance.query.filter_by(employee_id=employee_id, date=today).delete()
+            db.session.add(Attendance(employee_id=employee_id, date=today, status='present', hours_worked=9.5))
+        db.session.commit()
+        assert recompute_stale_payroll().recomputed == 2
+        db.session.expire_all()
+
+        entered = Payroll.query.filter_by(employee_id=first).one()
+        assert (entered.days_present, entered.overtime_hours, entered.gross_pay) == (22, 10.0, gross)
+        derived = Payroll.query.filter_by(employee_id=second).one()
+        assert (derived.days_present, derived.overtime_hours) == (1, 1.5)
+
+
+if __name__ == "__main__":
+    test_input_changes_mark_and_recompute_only_dependent_payroll()
+    test_salary_revisions_reprice_only_periods_from_their_effective_date()
+    test_recompute_keeps_attendance_figures_entered_by_hand()
+    print("✅ Only payroll with changed inputs is recomputed")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Payroll Period Summary Tests
+The rollup follows payroll writes and department changes, so it always
+equals a rebuild from the payroll table
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_query_counts import create_test_app, seed_workforce
+
+
+def summary_cells():
+    from app.models import db, PayrollPeriodSummary
+
+    summary = PayrollPeriodSummary.__table__
+    columns = [column for column in summary.c if column.name not in ('id', 'updated_at')]
+    rows = db.session.execute(db.select(*columns))
+    return {(row.period_start, row.department): tuple(row[2:]) for row in rows}
+
+
+def assert_summary_matches_payroll():
+    """The incrementally maintained rollup equals a rebuild from payroll"""
+    from app.models import db
+    from app.services.payroll_summary import rebuild_payroll_period_summary
+
+    maintained = summary_cells()
+    rebuild_payroll_period_summary()
+    assert summary_cells() == maintained
+    db.session.rollback()
+
+
+def test_rollup_follows_payroll_writes_and_department_moves():
+    """Creating, paying, moving an employee between departments and deleting keep the rollup exact"""
+    from app.models import db, Employee, Payroll
+
+    app = create_test_app()
+    period = date.today().replace(day=1)
+    last_period = (period - timedelta(days=1)).replace(day=1)
+    with app.app_context():
+        seed_workforce(3)
+        moved = Employee.query.filter_by(department='HR').one()
+        db.session.add(Payroll(employee_id=moved.id, pay_period_start=last_period,
+                               pay_period_end=period - timedelta(days=1),
+                               base_monthly_salary=Decimal('50000'), basic_salary=Decimal('25000'),
+                               gross_pay=Decimal('50000'), total_deductions=Decimal('3200'),
+                               net_pay=Decimal('46800'), payment_status='pending'))
+        db.session.commit()
+        assert_summary_matches_payroll()
+
+        Payroll.query.filter_by(employee_id=moved.id, pay_period_start=last_period).one().payment_status = 'paid'
+        db.session.commit()
+        assert summary_cells()[(last_period, 'HR')][-2:] == (1, 0)
+        assert_summary_matches_payroll()
+
+        moved.department = 'Sales'
+        db.session.commit()
+        cells = summary_cells()
+        assert (period, 'HR') not in cells and (last_period, 'HR') not in cells
+        assert cells[(period, 'Sales')][:2] == (2, 2)
+        assert_summary_matches_payroll()
+
+        db.session.delete(Payroll.query.filter_by(employee_id=moved.id, pay_period_start=period).one())
+        db.session.commit()
+        assert summary_cells()[(period, 'Sales')][:2] == (1, 1)
+        assert_summary_matches_payroll()
+
+
+if __name__ == "__main__":
+    test_rollup_follows_payroll_writes_and_department_moves()
+    print("✅ Payroll period summary follows payroll writes and department changes")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Payslip PDF Tests
+Payslips are rendered once into the on-disk cache, served with ETag and
+Last-Modified validators, re-rendered only after the payroll changes, and
+streamed as a per-period ZIP
+"""
+
+import io
+import os
+import re
+import sys
+import tempfile
+import zipfile
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_query_counts import create_test_app, seed_workforce
+
+
+def admin_client(app):
+    from app.models import User
+
+    with app.app_context():
+        admin_id = User.query.filter_by(role='admin').first().id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+        session['_fresh'] = True
+    return client
+
+
+def assert_valid_pdf(data):
+    """Cross-reference offsets and the compressed page content are consistent"""
+    assert data.startswith(b'%PDF-1.4') and data.rstrip().endswith(b'%%EOF')
+    start = int(re.search(rb'startxref\n(\d+)', data).group(1))
+    assert data[start:start + 4] == b'xref'
+    for number, offset in enumerate(re.findall(rb'(\d{10}) 00000 n ', data), start=1):
+        assert data[int(offset):].startswith(b'%d 0 obj' % number)
+    stream = re.search(rb'/Length (\d+) /Filter /FlateDecode >>\nstream\n', data)
+    content = data[stream.end():stream.end() + int(stream.group(1))]
+    return zlib.decompress(content).decode('latin-1')
+
+
+def test_payslip_pdf_is_cached_and_revalidated():
+    """Second download comes from the cache; validators give 304 until the row changes"""
+    from app.models import db, Payroll
+
+    app = create_test_app()
+    app.config['PAYSLIP_CACHE_DIR'] = cache_dir = tempfile.mkdtemp()
+    with app.app_context():
+        seed_workforce(3)
+        payroll_id = Payroll.query.first().id
+    client = admin_client(app)
+    url = f'/admin/payroll/payslip/{payroll_id}'
+
+    first = client.get(url)
+    assert first.status_code == 200 and first.mimetype == 'application/pdf'
+    content = assert_valid_pdf(first.data)
+    assert '(Net Salary \\(Take Home\\)) Tj' in content
+    etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+    cached = os.path.join(cache_dir, str(payroll_id), f'{etag.strip(chr(34))}.pdf')
+    assert os.listdir(os.path.dirname(cached)) == [os.path.basename(cached)]
+    mtime = os.path.getmtime(cached)
+
+    again = client.get(url)
+    assert again.data == first.data
+    assert os.path.getmtime(cached) == mtime
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    assert client.get(url, headers={'If-Modified-Since': last_modified}).status_code == 304
+
+    # Changing the row drops the cached file and changes the ETag
+    with app.app_context():
+        db.session.get(Payroll, payroll_id).payment_status = 'paid'
+        db.session.commit()
+    assert os.listdir(cache_dir) == []
+    changed = client.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert '(\\(Paid\\)) Tj' in assert_valid_pdf(changed.data)
+
+    assert client.get('/admin/payroll/payslip/999999').status_code == 404
+    assert client.get(f'{url}?format=html').status_code == 200
+
+
+def test_period_archive_streams_cached_and_new_payslips():
+    """The ZIP streams one chunk per payslip and reuses already cached PDFs"""
+    from app.models import Payroll
+
+    app = create_test_app()
+    app.config['PAYSLIP_CACHE_DIR'] = cache_dir = tempfile.mkdtemp()
+    with app.app_context():
+        seed_workforce(9)
+        payroll = Payroll.query.first()
+        period = payroll.pay_period_start.strftime('%Y-%m')
+        payroll_id = payroll.id
+    client = admin_client(app)
+
+    client.get(f'/admin/payroll/payslip/{payroll_id}')
+    (cached_name,) = os.listdir(os.path.join(cache_dir, str(payroll_id)))
+    cached = os.path.join(cache_dir, str(payroll_id), cached_name)
+    mtime = os.path.getmtime(cached)
+
+    response = client.get(f'/admin/payroll/payslips.zip?pay_period={period}', buffered=False)
+    assert response.status_code == 200 and response.is_streamed
+    chunks = list(response.response)
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+    assert len(archive.namelist()) == 9 and len(chunks) == 10
+    assert archive.testzip() is None
+    for name in archive.namelist():
+        assert_valid_pdf(archive.read(name))
+    assert os.path.getmtime(cached) == mtime
+    assert len(os.listdir(cache_dir)) == 9
+
+    it_only = client.get(f'/admin/payroll/payslips.zip?pay_period={period}&department=IT')
+    assert len(zipfile.ZipFile(io.BytesIO(it_only.data)).namelist()) == 3
+    assert client.get('/admin/payroll/payslips.zip?pay_period=1999-01').status_code == 302
+
+
+if __name__ == "__main__":
+    test_payslip_pdf_is_cached_and_revalidated()
+    test_period_archive_streams_cached_and_new_payslips()
+    print("✅ Payslip PDFs are cached, revalidated and archived")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Punch Log Import Tests
+A turnstile or biometric export is streamed, collapsed to the first and
+last punch per employee and day, merged into recorded attendance, and
+every line that cannot be imported is reported with its reason
+"""
+
+import io
+import json
+import os
+import sys
+from datetime import date, datetime, time as clock, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from test_query_counts import create_test_app, seed_workforce
+
+
+def punch_log_app():
+    """
+    Three employees; EMP0000 was marked absent today, EMP0001 checked in at
+    09:00. Each has payroll for this month, and EMP0002 for last month too,
+    so yesterday is inside one of EMP0002's pay periods on any day.
+    """
+    from app.models import db, Employee, Attendance, Payroll, StalePayroll
+    from app.services.attendance_summary import rebuild_daily_attendance_summary
+
+    app = create_test_app()
+    with app.app_context():
+        seed_workforce(3)
+        employees = Employee.query.order_by(Employee.id).all()
+        last_month_end = date.today().replace(day=1) - timedelta(days=1)
+        db.session.add(Payroll(employee_id=employees[2].id, pay_period_start=last_month_end.replace(day=1),
+                               pay_period_end=last_month_end, base_monthly_salary=Decimal('50000'),
+                               basic_salary=Decimal('25000'), gross_pay=Decimal('50000'),
+                               net_pay=Decimal('46800'), payment_status='pending'))
+        checked_in = employees[1]
+        Attendance.query.filter_by(employee_id=checked_in.id).one().check_in_time = clock(9)
+        rebuild_daily_attendance_summary()
+        db.session.commit()
+        StalePayroll.query.delete()
+        db.session.commit()
+    return app
+
+
+def attendance_by_badge():
+    from app.models import User, Employee, Attendance
+
+    rows = (Attendance.query.join(Employee).join(User, User.id == Employee.user_id)
+            .with_entities(User.employee_id, Attendance).all())
+    return {(badge, row.date): row for badge, row in rows}
+
+
+def test_csv_log_collapses_to_first_and_last_punch():
+    """Punches merge with today's rows; rejects name the line and reason"""
+    from app.models import StalePayroll
+    from app.services.attendance_summary import attendance_stats_for_day
+    from app.services.punch_import import import_punch_log
+
+    app = punch_log_app()
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    at = lambda day, hour, minute=0: datetime.combine(day, clock(hour, minute)).isoformat()
+    log = '\n'.join([
+        'badge_id,timestamp,door',
+        f'EMP0000,{at(today, 12)},D1',
+        f'EMP0000,{at(today, 9)},D2',
+        f'EMP0000,{at(today, 17, 30)},D1',
+        f'EMP0001,{at(today, 9, 30)},D1',
+        f'EMP0001,{at(today, 18)},D1',
+        f'EMP0002,{at(yesterday, 8)},D1',
+        f'NOBODY,{at(today, 9)},D1',
+        f'EMP0002,yesterday,D1',
+        f',{at(today, 9)},D1',
+        'EMP0002,too,many,columns',
+    ]) + '\n'
+
+    rejects = io.StringIO()
+    with app.app_context():
+        result = import_punch_log(io.StringIO(log), 'csv', rejects=rejects, batch_size=2)
+        assert (result.punches, result.accepted, result.employee_days) == (10, 6, 3)
+        assert dict(result.rejected) == {'unknown badge': 1, 'bad timestamp': 1,
+                                         'missing badge_id': 1, 'malformed record': 1}
+
+        rows = attendance_by_badge()
+        absent_before = rows[('EMP0000', today)]
+        assert (absent_before.status, absent_before.check_in_time, absent_before.check_out_time) == (
+            'present', clock(9), clock(17, 30))
+        assert absent_before.hours_worked == 8.5
+        # The earlier recorded check-in is kept
+        earlier = rows[('EMP0001', today)]
+        assert (earlier.check_in_time, earlier.check_out_time, earlier.hours_worked) == (
+            clock(9), clock(18), 9.0)
+        # A single punch is a check-in without a check-out
+        single = rows[('EMP0002', yesterday)]
+        assert (single.check_in_time, single.check_out_time, single.hours_worked) == (clock(8), None, 0.0)
+
+        assert attendance_stats_for_day(today)['present'] == 2
+        assert attendance_stats_for_day(yesterday)['present'] == 1
+        assert StalePayroll.query.count() == 3
+
+    lines = rejects.getvalue().splitlines()
+    assert lines[0] == 'line,reason,record'
+    assert lines[1] == f'8,unknown badge,"NOBODY,{at(today, 9)},D1"'
+    assert [line.split(',')[1] for line in lines[1:]] == [
+        'unknown badge', 'bad timestamp', 'missing badge_id', 'malformed record']
+
+
+def test_ndjson_log_and_header_check():
+    """NDJSON lines are read the same way; a CSV without the columns is refused"""
+    from app.services.punch_import import import_punch_log
+
+    app = punch_log_app()
+    today = date.today()
+    events = [{'badge_id': 'EMP0002', 'timestamp': datetime.combine(today, clock(hour)).isoformat()}
+              for hour in (8, 12, 16)]
+    log = ''.join(json.dumps(event) + '\n' for event in events) + '{"badge_id": "EMP0002"\n'
+
+    with app.app_context():
+        result = import_punch_log(log.encode(), 'ndjson')
+        assert (result.accepted, dict(result.rejected)) == (3, {'malformed record': 1})
+        row = attendance_by_badge()[('EMP0002', today)]
+        assert (row.check_in_time, row.check_out_time, row.hours_worked) == (clock(8), clock(16), 8.0)
+
+        with pytest.raises(ValueError):
+            import_punch_log(io.StringIO('badge,time\nEMP0002,2024-01-01T09:00\n'), 'csv')
+        with pytest.raises(ValueError):
+            import_punch_log(io.StringIO(''), 'xml')
+
+
+def test_upload_reports_rejects_for_download(tmp_path):
+    """The admin upload imports the file and links the reject report"""
+    from test_payslips import admin_client
+
+    app = punch_log_app()
+    app.instance_path = str(tmp_path)
+    client = admin_client(app)
+    stamp = datetime.combine(date.today(), clock(9)).isoformat()
+    log = f'badge_id,timestamp\nEMP0000,{stamp}\nGHOST,{stamp}\n'.encode()
+
+    response = client.post('/admin/attendance/import',
+                           data={'punch_log': (io.BytesIO(log), 'turnstile.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 302
+    assert 'rejects=punch-rejects-' in response.headers['Location']
+    name = response.headers['Location'].split('rejects=')[1]
+    report = client.get(f'/admin/attendance/import/rejects/{name}')
+    assert report.status_code == 200
+    assert report.data.decode().splitlines()[1] == f'3,unknown badge,"GHOST,{stamp}"'
+    report.close()
+
+    with app.app_context():
+        assert attendance_by_badge()[('EMP0000', date.today())].check_in_time == clock(9)
+
+    clean = client.post('/admin/attendance/import',
+                        data={'punch_log': (io.BytesIO(log.replace(b'GHOST', b'EMP0001')), 'turnstile.csv')},
+                        content_type='multipart/form-data')
+    assert clean.headers['Location'].endswith('/admin/attendance')
+    assert os.listdir(tmp_path / 'punch-rejects') == [name]
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_csv_log_collapses_to_first_and_last_punch()
+    test_ndjson_log_and_header_check()
+    with tempfile.TemporaryDirectory() as directory:
+        test_upload_reports_rejects_for_download(Path(directory))
+    print("✅ Punch logs import with first-in/last-out and a reject report")
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Query Count Regression Tests
+Admin list pages must issue a fixed number of SQL statements no matter
+how many rows they render, the employee dashboard must load from a
+single cached snapshot query, and the aggregated status counts must agree
+with each employee's own status
+"""
+
+import os
+import sys
+from calendar import monthrange
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from flask_login import LoginManager
+from sqlalchemy import event
+
+# Statement budget per page, including the Flask-Login user lookup, the
+# current user's profile loaded by base.html and, on paginated listings,
+# the approximate total sampled on first load; the dashboard also loads
+# today's approved leave into the leave interval index
+ROUTE_BUDGETS = {
+    '/admin_dashboard': 7,
+    '/admin/employees': 6,
+    '/admin/attendance': 5,
+    '/admin/leave_requests': 7,
+    '/admin/payroll': 9,
+}
+
+# User lookup, profile lookup and the single dashboard snapshot query
+EMPLOYEE_DASHBOARD_BUDGET = 3
+
+
+def create_test_app(database_uri='sqlite:///:memory:'):
+    """Flask app backed by a private database, in memory unless database_uri is given"""
+    from app.models import db, User
+
+    app = Flask(__name__, template_folder='app/templates', static_folder='app/static')
+    app.config['SECRET_KEY'] = 'test-secret-key'
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['TESTING'] = True
+
+    db.init_app(app)
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return db.session.get(User, int(user_id))
+
+    from app.routes.auth import auth_bp
+    from app.routes.main import main_bp
+    from app.routes.employee import employee_bp
+    from app.routes.admin import admin_bp
+
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(main_bp)
+    app.register_blueprint(employee_bp, url_prefix='/employee')
+    app.register_blueprint(admin_bp, url_prefix='/admin')
+
+    with app.app_context():
+        db.create_all()
+
+    return app
+
+
+def seed_workforce(employee_count):
+    """Admin plus employee_count employees with attendance, leave and payroll"""
+    from app.models import db, User, Employee, Attendance, LeaveRequest, Payroll
+
+    today = date.today()
+    admin = User(employee_id='ADMIN0001', email='admin@dayflow.com', role='admin')
+    admin.set_password('AdminPassword123!')
+    db.session.add(admin)
+
+    for i in range(employee_count):
+        user = User(employee_id=f'EMP{i:04d}', email=f'emp{i}@dayflow.com', role='employee')
+        user.password_hash = 'not-used'
+        db.session.add(user)
+        db.session.flush()
+
+        employee = Employee(user_id=user.id, first_name=f'First{i}', last_name=f'Last{i}',
+                            department=['IT', 'HR', 'Sales'][i % 3], position='Engineer',
+                            monthly_wage=Decimal('50000'))
+        db.session.add(employee)
+        db.session.flush()
+
+        db.session.add(Attendance(employee_id=employee.id, date=today,
+                                  status='present' if i % 2 else 'absent'))
+        db.session.add(LeaveRequest(employee_id=employee.id, leave_type='paid',
+                                    start_date=today + timedelta(days=7),
+                                    end_date=today + timedelta(days=8),
+                                    reason='Family event', status='pending'))
+        db.session.add(Payroll(employee_id=employee.id,
+                               pay_period_start=today.replace(day=1),
+                               pay_period_end=today.replace(day=monthrange(today.year, today.month)[1]),
+                               base_monthly_salary=Decimal('50000'),
+                               basic_salary=Decimal('25000'),
+                               gross_pay=Decimal('50000'),
+                               total_deductions=Decimal('3200'),
+                               net_pay=Decimal('46800'),
+                               payment_status='pending'))
+
+    db.session.commit()
+    return admin.id
+
+
+def count_statements(employee_count):
+    """Statements issued by each admin list page for a seeded workforce"""
+    from app.models import db
+
+    app = create_test_app()
+    with app.app_context():
+        admin_id = seed_workforce(employee_count)
+        engine = db.engine
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+        session['_fresh'] = True
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    counts = {}
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for route in ROUTE_BUDGETS:
+            statements.clear()
+            response = client.get(route)
+            assert response.status_code == 200, f"{route} returned {response.status_code}"
+            counts[route] = len(statements)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return counts
+
+
+def count_employee_dashboard_statements():
+    """Statements for a cold dashboard load, a cached reload and a reload after check-in"""
+    from app.models import db, User
+
+    app = create_test_app()
+    with app.app_context():
+        seed_workforce(3)
+        user_id = User.query.filter_by(employee_id='EMP0000').first().id
+        engine = db.engine
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    counts = []
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for checks_in in (False, False, True):
+            if checks_in:
+                assert client.post('/employee/check_in').get_json()['success']
+            statements.clear()
+            assert client.get('/employee_dashboard').status_code == 200
+            counts.append(len(statements))
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return counts
+
+
+def test_employee_dashboard_is_one_cached_snapshot_query():
+    """The dashboard costs one query, none while cached, and re-queries after a check-in"""
+    cold, cached, after_check_in = count_employee_dashboard_statements()
+    assert cold <= EMPLOYEE_DASHBOARD_BUDGET, f"{cold} statements (budget {EMPLOYEE_DASHBOARD_BUDGET})"
+    assert cached == cold - 1, f"cached reload issued {cached} statements"
+    assert after_check_in == cold, "check-in did not invalidate the snapshot"
+
+
+def test_list_pages_statement_count_is_independent_of_page_size():
+    """A nearly empty page and a full page cost the same number of statements"""
+    small = count_statements(2)
+    full = count_statements(15)
+    assert small == full, f"statement counts grew with rows: {small} -> {full}"
+
+
+def test_employee_list_joins_users_once():
+    """The employee list loads each user through its own join, not a second eager one"""
+    from app.models import db
+
+    app = create_test_app()
+    with app.app_context():
+        admin_id = seed_workforce(15)
+        engine = db.engine
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+        session['_fresh'] = True
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        for route in ('/admin/employees', '/admin/employees?page=2', '/admin/employees?search=emp'):
+            assert client.get(route).status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    listings = [statement for statement in statements if 'FROM employees' in statement and 'users' in statement]
+    assert listings
+    assert all(statement.count('JOIN users') == 1 for statement in listings), listings
+
+
+def test_status_counts_match_a_per_employee_count():
+    """Aggregated status counts equal counting each employee's own status, on every filtered subset"""
+    from collections import Counter
+    from app.models import db, Employee, Attendance, LeaveRequest
+    from app.services.status import STATUSES, workforce_status_counts
+
+    app = create_test_app()
+    today = date.today()
+    with app.app_context():
+        seed_workforce(9)
+        employees = Employee.query.order_by(Employee.id).all()
+        # Approved leave today for a present and an absent employee; pending and past leave do not count
+        yesterday = today - timedelta(days=1)
+        leave = [(1, 'approved', today, today), (2, 'approved', yesterday, today),
+                 (4, 'pending', today, today), (5, 'approved', yesterday - timedelta(days=2), yesterday)]
+        for i, status, start, end in leave:
+            db.session.add(LeaveRequest(employee_id=employees[i].id, leave_type='paid', start_date=start,
+                                        end_date=end, reason='Test', status=status))
+        # No attendance recorded today
+        for i in (6, 7):
+            db.session.delete(Attendance.query.filter_by(employee_id=employees[i].id, date=today).one())
+        db.session.commit()
+
+        subsets = [(), (Employee.department == 'IT',), (Employee.department == 'HR',),
+                   (Employee.department == 'Sales',), (Employee.department == 'Finance',),
+                   (Employee.id.in_([employees[i].id for i in (1, 2, 6, 7)]),),
+                   (Employee.department == 'HR', Employee.id != employees[1].id)]
+        for criteria in subsets:
+            naive = Counter(employee.current_status for employee in Employee.query.filter(*criteria))
+            expected = {status: naive[status] for status in STATUSES}
+            expected['total'] = sum(naive.values())
+            assert workforce_status_counts(today, *criteria) == expected, criteria
+        assert workforce_status_counts(today) == {'present': 2, 'on_leave': 2, 'absent': 5, 'total': 9}
+
+
+def test_list_pages_stay_within_statement_budget():
+    """Each page stays within its statement budget"""
+    counts = count_statements(15)
+    over_budget = {route: count for route, count in counts.items()
+                   if count > ROUTE_BUDGETS[route]}
+    assert not over_budget, f"over budget: {over_budget} (budgets: {ROUTE_BUDGETS})"
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    for route, count in count_statements(15).items():
+        print(f"{route}: {count} statements (budget {ROUTE_BUDGETS[route]})")
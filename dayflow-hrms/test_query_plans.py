@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Query Plan Regression Tests
+Every statement the admin and employee routes issue against the hot tables
+must be answered through an index; EXPLAIN QUERY PLAN must never report a
+full scan of attendance, leave_requests or payroll
+"""
+
+import os
+import re
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+
+from test_query_counts import create_test_app, seed_workforce
+
+HOT_TABLES = ('attendance', 'leave_requests', 'payroll')
+
+# "SCAN payroll" is a full table scan; "SCAN payroll USING INDEX ..." walks an index
+_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(.*)$')
+
+
+def admin_requests(employee_id, leave_request_id, payroll_id):
+    """(method, url, request options) for the admin pages and actions"""
+    period = date.today().strftime('%Y-%m')
+    return [
+        ('GET', '/admin_dashboard', {}),
+        ('GET', '/admin/employees', {}),
+        ('GET', '/admin/employees?search=First1&department=IT', {}),
+        ('GET', '/admin/employees/autocomplete?q=Fir', {}),
+        ('GET', f'/admin/employee/{employee_id}', {}),
+        ('GET', '/admin/attendance', {}),
+        ('GET', '/admin/leave_requests', {}),
+        ('GET', '/admin/leave_requests?status=pending', {}),
+        ('GET', f'/admin/leave_request/{leave_request_id}', {}),
+        ('GET', '/admin/payroll', {}),
+        ('GET', f'/admin/payroll?employee_id={employee_id}', {}),
+        ('GET', f'/admin/payroll?pay_period={period}', {}),
+        ('GET', f'/admin/payroll?year={date.today().year}', {}),
+        ('POST', '/admin/payroll/mark_paid', {'json': {'payroll_id': payroll_id}}),
+        ('POST', '/admin/update_leave_status',
+         {'json': {'request_id': leave_request_id, 'status': 'approved'}}),
+        ('POST', '/admin/payroll/generate', {'data': {'pay_period': '2030-01'}}),
+    ]
+
+
+def employee_requests():
+    """(method, url, request options) for the employee self-service pages and actions"""
+    return [
+        ('GET', '/employee_dashboard', {}),
+        ('GET', '/employee/attendance', {}),
+        ('GET', '/employee/leave_requests', {}),
+        ('GET', '/employee/payroll', {}),
+        ('POST', '/employee/check_in', {}),
+        ('POST', '/employee/check_out', {}),
+    ]
+
+
+def collect_plans(employee_count=15):
+    """{statement: plan detail lines} for every statement the routes issue"""
+    from app.models import db, User, LeaveRequest, Payroll
+
+    app = create_test_app()
+    with app.app_context():
+        admin_id = seed_workforce(employee_count)
+        user = User.query.filter_by(employee_id='EMP0001').first()
+        user_id, employee_id = user.id, user.employee_profile.id
+        leave_request_id = LeaveRequest.query.filter_by(employee_id=employee_id).first().id
+        payroll_id = Payroll.query.filter_by(employee_id=employee_id).first().id
+        engine = db.engine
+
+    statements = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.setdefault(statement, parameters)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for login_id, calls in ((admin_id, admin_requests(employee_id, leave_request_id, payroll_id)),
+                                (user_id, employee_requests())):
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(login_id)
+                session['_fresh'] = True
+            for method, url, options in calls:
+                response = client.open(url, method=method, **options)
+                assert response.status_code in (200, 302), f"{method} {url} returned {response.status_code}"
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    plans = {}
+    with app.app_context():
+        connection = db.session.connection()
+        for statement, parameters in statements.items():
+            rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+            plans[statement] = [row[-1] for row in rows]
+    return plans
+
+
+def full_scans(plan):
+    """Hot tables a plan reads without any index"""
+    scanned = []
+    for detail in plan:
+        match = _SCAN.match(detail)
+        if match and match.group(1) in HOT_TABLES and 'INDEX' not in match.group(2):
+            scanned.append(match.group(1))
+    return scanned
+
+
+def test_plan_checker_flags_full_scans():
+    """The checker tells table scans from index scans and searches"""
+    assert full_scans(['SCAN payroll']) == ['payroll']
+    assert full_scans(['SCAN TABLE attendance']) == ['attendance']
+    assert full_scans(['SCAN leave_requests USING INDEX ix_leave_requests_created_at']) == []
+    assert full_scans(['SEARCH attendance USING INDEX uq_attendance_employee_date (employee_id=? AND date=?)']) == []
+    assert full_scans(['SCAN employees']) == []
+
+
+def test_route_queries_use_indexes_on_hot_tables():
+    """No route statement falls back to a full scan of a hot table"""
+    plans = collect_plans()
+    assert any(table in statement for statement in plans for table in HOT_TABLES)
+    regressions = {statement: plan for statement, plan in plans.items() if full_scans(plan)}
+    assert not regressions, "full table scans:\n" + "\n\n".join(
+        f"{statement}\n  -> " + "\n  -> ".join(plan) for statement, plan in regressions.items()
+    )
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    for statement, plan in collect_plans().items():
+        flag = '❌' if full_scans(plan) else '✅'
+        print(f"{flag} {' '.join(statement.split())[:100]}")
+        for detail in plan:
+            print(f"     {detail}")
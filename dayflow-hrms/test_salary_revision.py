@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Bulk Salary Revision Tests
+A revision writes only the salary components that change, keeps each
+employee's own rule values, and records one history row per wage change
+"""
+
+import os
+import sys
+from decimal import Decimal
+
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_query_counts import create_test_app, seed_workforce
+
+
+def component_rows(employee_id):
+    from app.models import SalaryComponent
+
+    return {c.component_name: (c.computation_type, c.value, c.calculated_amount, c.is_active)
+            for c in SalaryComponent.query.filter_by(employee_id=employee_id)}
+
+
+def test_revision_updates_only_changed_components():
+    """Changed amounts are updated in bulk and an identical rerun writes nothing"""
+    from app.models import db, Employee, SalaryRevision, create_salary_components_for_employee
+    from app.salary_structure import salary_plan
+    from app.services.salary_revision import parse_revisions, revise_salaries, sync_salary_components
+
+    app = create_test_app()
+    with app.app_context():
+        seed_workforce(12)
+        employees = Employee.query.order_by(Employee.id).all()
+        for employee in employees:
+            create_salary_components_for_employee(employee.id, employee.monthly_wage,
+                                                  values={'pf': 10} if employee.id == employees[0].id else None)
+        codes = [employee.user.employee_id for employee in employees]
+
+        csv_text = "employee_id,new_wage,increment_percentage\n" + "".join(
+            f"{code},,10\n" if i % 2 else f"{code},60000,\n" for i, code in enumerate(codes)
+        ) + "NOBODY,1000,\n"
+        revisions = parse_revisions(csv_text)
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            result = revise_salaries(revisions, reason='Appraisal', chunk_size=5)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert result.revised == 12 and result.missing == ['NOBODY']
+        assert result.components_inserted == 0
+        assert result.throughput > 0
+        # Bulk statements per chunk, never one per component
+        assert len([s for s in statements if s.startswith('UPDATE salary_components')]) <= 2 * 3
+
+        db.session.expire_all()
+        plan = salary_plan()
+        for i, employee in enumerate(employees):
+            assert employee.monthly_wage == (Decimal('55000.00') if i % 2 else Decimal('60000.00'))
+            overrides = {'pf': 10} if i == 0 else None
+            evaluated = plan.evaluate([employee.monthly_wage], values=overrides)
+            expected = {row['component_name']: row['calculated_amount']
+                        for row in plan.components(evaluated, 0, values=overrides)}
+            assert {name: row[2] for name, row in component_rows(employee.id).items() if row[3]} == expected
+
+        history = SalaryRevision.query.order_by(SalaryRevision.employee_id).all()
+        assert len(history) == 12
+        assert history[1].previous_wage == Decimal('50000.00')
+        assert history[1].increment_percentage == Decimal('10.00')
+        assert history[0].reason == 'Appraisal'
+
+        # Same wages again: nothing to update, no new history
+        rerun = revise_salaries(parse_revisions(csv_text.replace(',,10', ',55000,')))
+        assert rerun.revised == 0 and rerun.unchanged == 12
+        assert rerun.components_updated == 0
+        assert SalaryRevision.query.count() == 12
+
+        before = {employee.id: component_rows(employee.id) for employee in employees}
+        updated, inserted = sync_salary_components([(e.id, e.monthly_wage) for e in employees])
+        assert (updated, inserted) == (0, 0)
+        db.session.commit()
+        assert {employee.id: component_rows(employee.id) for employee in employees} == before
+
+
+def test_invalid_revision_files_are_rejected():
+    """Each bad line is reported by number"""
+    from app.services.salary_revision import parse_revisions
+
+    for text in ("name,new_wage\nA,1\n",
+                 "employee_id,new_wage,increment_percentage\nEMP1,,\n",
+                 "employee_id,new_wage,increment_percentage\nEMP1,100,5\n",
+                 "employee_id,new_wage\nEMP1,lots\n",
+                 "employee_id,new_wage\nEMP1,-5\n",
+                 "employee_id,new_wage\nEMP1,NaN\n",
+                 "employee_id,increment_percentage\nEMP1,-100\n",
+                 "employee_id,increment_percentage\nEMP0000,-150\n"):
+        try:
+            parse_revisions(text)
+        except ValueError:
+            continue
+        raise AssertionError(f"{text!r} parsed")
+
+    try:
+        parse_revisions("employee_id,increment_percentage\nEMP1,5\nEMP2,-150\n")
+    except ValueError as e:
+        assert str(e).startswith('Line 3:')
+    else:
+        raise AssertionError("negative wage increment parsed")
+
+
+def test_revision_never_leaves_a_wage_at_zero():
+    """An increment that rounds the wage away is refused before anything is written"""
+    from app.models import db, Employee, SalaryRevision
+    from app.services.salary_revision import parse_revisions, revise_salaries
+
+    app = create_test_app()
+    with app.app_context():
+        seed_workforce(2)
+        employee = Employee.query.order_by(Employee.id).first()
+        employee.monthly_wage = Decimal('0.01')
+        db.session.commit()
+
+        revisions = parse_revisions("employee_id,increment_percentage\nEMP0001,5\nEMP0000,-99.9\n")
+        try:
+            revise_salaries(revisions)
+        except ValueError as e:
+            assert str(e).startswith('Line 3:')
+        else:
+            raise AssertionError("wage revised to zero")
+        db.session.rollback()
+        assert db.session.get(Employee, employee.id).monthly_wage == Decimal('0.01')
+        assert SalaryRevision.query.count() == 0
+
+
+if __name__ == "__main__":
+    test_revision_updates_only_changed_components()
+    test_invalid_revision_files_are_rejected()
+    test_revision_never_leaves_a_wage_at_zero()
+    print("✅ Salary revisions write only what changed")
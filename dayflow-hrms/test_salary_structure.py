@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Salary Structure Tests
+Structures compile into dependency order, bad structures are rejected, and
+a batch evaluation matches evaluating each wage on its own
+"""
+
+import os
+import sys
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.salary_structure import (
+    ComponentRule, SalaryStructure, compile_structure, salary_plan, WAGE
+)
+
+
+def test_rules_are_ordered_after_their_bases():
+    """A component declared before its base is evaluated after it"""
+    structure = SalaryStructure('reordered', [
+        ComponentRule('pf', 'Provident Fund', 'deduction', 'percentage', 12, base='basic'),
+        ComponentRule('rest', 'Fixed Allowance', 'earning', 'remainder'),
+        ComponentRule('hra', 'House Rent Allowance', 'earning', 'percentage', 50, base='basic'),
+        ComponentRule('basic', 'Basic Salary', 'earning', 'percentage', 50, base=WAGE),
+    ])
+    order = [rule.key for rule in compile_structure(structure).steps]
+    assert order.index('basic') < order.index('pf')
+    assert order.index('basic') < order.index('hra') < order.index('rest')
+
+
+def test_invalid_structures_are_rejected():
+    """Cycles, unknown bases and a second remainder fail at compile time"""
+    broken = [
+        [ComponentRule('a', 'A', 'earning', 'percentage', 10, base='b'),
+         ComponentRule('b', 'B', 'earning', 'percentage', 10, base='a')],
+        [ComponentRule('a', 'A', 'earning', 'percentage', 10, base='missing')],
+        [ComponentRule('a', 'A', 'earning', 'remainder'),
+         ComponentRule('b', 'B', 'earning', 'remainder')],
+    ]
+    for rules in broken:
+        try:
+            compile_structure(SalaryStructure('broken', rules))
+        except ValueError:
+            continue
+        raise AssertionError(f"{rules} compiled")
+
+
+def test_batch_evaluation_matches_single_wages():
+    """One call for many wages gives the same components as one call per wage"""
+    plan = salary_plan()
+    wages = [Decimal('0'), Decimal('15000'), Decimal('52340.50'), Decimal('250000')]
+    batch = plan.evaluate(wages)
+    for i, wage in enumerate(wages):
+        single = plan.evaluate([wage])
+        assert plan.components(batch, i) == plan.components(single, 0)
+
+        # Earnings never exceed the wage and make it up exactly when there is a remainder
+        earnings = sum(row['calculated_amount'] for row in plan.components(batch, i)
+                       if row['component_type'] == 'earning')
+        assert earnings <= wage or batch['fixed_allowance'][i] == 0
+        if batch['fixed_allowance'][i] > 0:
+            assert earnings == wage
+
+
+def test_overrides_apply_per_row():
+    """Rule values can be overridden for all wages or one value per wage"""
+    plan = salary_plan()
+    evaluated = plan.evaluate([Decimal('40000'), Decimal('40000')], values={'pf': [12, 10]})
+    assert evaluated['pf'] == [Decimal('2400.00'), Decimal('2000.00')]
+    pinned = plan.evaluate([Decimal('40000')], amounts={'basic': Decimal('30000')})
+    assert pinned['hra'] == [Decimal('15000.00')]
+
+
+if __name__ == "__main__":
+    test_rules_are_ordered_after_their_bases()
+    test_invalid_structures_are_rejected()
+    test_batch_evaluation_matches_single_wages()
+    test_overrides_apply_per_row()
+    print("✅ Salary structures compile and evaluate consistently")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Employee Search Tests
+The FTS5 directory index follows employee and user edits and deletes,
+autocomplete ranks the best matches first, and databases without the
+index fall back to prefix LIKE matching
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_query_counts import create_test_app, seed_workforce
+
+
+def matching_names(term):
+    """First names of employees the search filter lets through for term"""
+    from app.models import db, User, Employee
+    from app.services.search import employee_search_filter
+
+    query = db.session.query(Employee.first_name).join(User).filter(employee_search_filter(term))
+    return sorted(name for name, in query)
+
+
+def autocomplete_names(term):
+    from app.services.search import autocomplete_employees
+
+    return [employee.first_name for employee, _ in autocomplete_employees(term)]
+
+
+def seed_directory():
+    """Three employees whose names, codes and skills overlap on 'ana'"""
+    from app.models import db, Employee
+
+    seed_workforce(3)
+    first, second, third = Employee.query.order_by(Employee.id).all()
+    first.first_name, first.last_name, first.skills = 'Anaya', 'Rao', 'analytics, sql'
+    second.first_name, second.last_name, second.skills = 'Bruno', 'Anand', 'java'
+    third.first_name, third.skills = 'Chen', 'kotlin, spring, gradle, docker, kubernetes, analysis'
+    db.session.commit()
+
+
+def test_index_follows_employee_and_user_edits_and_deletes():
+    """Renames, e-mail changes and deletes show up in the very next search"""
+    from app.models import db, User, Employee
+    from app.services.search import fts_enabled
+
+    app = create_test_app()
+    with app.app_context():
+        assert fts_enabled(db.session.connection())
+        seed_directory()
+        assert matching_names('ana') == ['Anaya', 'Bruno', 'Chen']
+        assert matching_names('ana rao') == ['Anaya']
+
+        renamed = Employee.query.filter_by(first_name='Bruno').one()
+        renamed.last_name = 'Okafor'
+        db.session.commit()
+        assert matching_names('anand') == []
+        assert matching_names('okafor') == ['Bruno']
+
+        user = db.session.get(User, renamed.user_id)
+        user.email = 'bruno.okafor@dayflow.com'
+        db.session.commit()
+        assert matching_names('bruno.okafor') == ['Bruno']
+        assert matching_names('emp1') == []
+
+        db.session.delete(Employee.query.filter_by(first_name='Chen').one())
+        db.session.commit()
+        assert matching_names('ana') == ['Anaya']
+        assert autocomplete_names('chen') == []
+
+
+def test_autocomplete_ranks_best_matches_first():
+    """An employee matching in several short fields beats one matching deep in a long skills list"""
+    from app.models import db
+
+    app = create_test_app()
+    with app.app_context():
+        seed_directory()
+        ranked = autocomplete_names('ana')
+        assert ranked[0] == 'Anaya' and sorted(ranked) == ['Anaya', 'Bruno', 'Chen']
+        assert autocomplete_names('') == [] and autocomplete_names('"*') == []
+        db.session.rollback()
+
+
+def test_prefix_like_fallback_without_fts():
+    """Without the FTS index prefix LIKE matching finds employees and ranks name matches first"""
+    from app.models import db
+    from app.services import search
+
+    app = create_test_app()
+    with app.app_context():
+        seed_directory()
+        search._fts_engines[db.engine] = False
+        try:
+            assert not search.fts_enabled(db.session.connection())
+            # Prefixes of whole column values, so words later in a skills list are not reached
+            assert matching_names('ana') == ['Anaya', 'Bruno']
+            assert matching_names('ana rao') == ['Anaya']
+            assert matching_names('emp0001') == ['Bruno']
+            assert matching_names('nalytics') == []
+            # First names, then last names, then login IDs
+            assert autocomplete_names('ana') == ['Anaya', 'Bruno']
+            assert autocomplete_names('emp') == ['Anaya', 'Bruno', 'Chen']
+        finally:
+            search._fts_engines.pop(db.engine, None)
+
+
+if __name__ == "__main__":
+    test_index_follows_employee_and_user_edits_and_deletes()
+    test_autocomplete_ranks_best_matches_first()
+    test_prefix_like_fallback_without_fts()
+    print("✅ Employee search stays in sync and ranks its matches")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Dayflow HRMS - Detail API Tests
+Payroll and leave request details come from one joined query, keep the
+payload the modals read, and answer repeat opens with 304 Not Modified
+"""
+
+import json
+import os
+import sys
+
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_query_counts import create_test_app, seed_workforce
+from test_payslips import admin_client
+
+
+def fetch_counting_statements(app, client, url, **kwargs):
+    from app.models import db
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = client.get(url, **kwargs)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+    return response, statements
+
+
+def test_payroll_detail_is_one_query_with_conditional_get():
+    """Details match the row; an unchanged record revalidates with 304"""
+    from app.models import db, Payroll
+
+    app = create_test_app()
+    with app.app_context():
+        seed_workforce(3)
+        payroll = Payroll.query.first()
+        payroll.overtime_hours = 4.0
+        payroll.overtime_rate = 250
+        db.session.commit()
+        payroll_id, code = payroll.id, payroll.employee.user.employee_id
+        period_end = payroll.pay_period_end.isoformat()
+    client = admin_client(app)
+    url = f'/admin/payroll/{payroll_id}'
+
+    response, statements = fetch_counting_statements(app, client, url)
+    assert response.status_code == 200 and response.mimetype == 'application/json'
+    # Flask-Login's user lookup plus the single joined detail query
+    assert len(statements) == 2
+    data = json.loads(response.data)
+    assert data['employee_id'] == code and data['department'] == 'IT'
+    assert data['net_pay'] == 46800.0 and data['overtime_pay'] == 1000.0
+    assert data['pay_period'].endswith(period_end) and data['payment_status'] == 'pending'
+
+    etag = response.headers['ETag']
+    assert not etag.startswith('W/')
+    assert 'no-cache' in response.headers['Cache-Control']
+    again = client.get(url, headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+
+    with app.app_context():
+        db.session.get(Payroll, payroll_id).payment_status = 'paid'
+        db.session.commit()
+    changed = client.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and json.loads(changed.data)['payment_status'] == 'paid'
+
+    assert client.get('/admin/payroll/999999').status_code == 404
+
+
+def test_leave_request_detail_revalidates():
+    """Leave request details carry the certificate name and a strong ETag"""
+    from app.models import db, LeaveRequest
+
+    app = create_test_app()
+    with app.app_context():
+        seed_workforce(2)
+        leave_request = LeaveRequest.query.first()
+        leave_request.certificate_path = 'uploads/medical_certificates/note.pdf'
+        db.session.commit()
+        request_id = leave_request.id
+    client = admin_client(app)
+    url = f'/admin/leave_request/{request_id}'
+
+    response, statements = fetch_counting_statements(app, client, url)
+    assert response.status_code == 200 and len(statements) == 2
+    data = json.loads(response.data)
+    assert data['certificate_filename'] == 'note.pdf'
+    assert data['status'] == 'pending' and data['start_date'] < data['end_date']
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get('/admin/leave_request/999999').status_code == 404
+
+
+if __name__ == "__main__":
+    test_payroll_detail_is_one_query_with_conditional_get()
+    test_leave_request_detail_revalidates()
+    print("✅ Detail APIs are single-query and revalidate with ETags")